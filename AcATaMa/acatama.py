@@ -26,6 +26,8 @@ from qgis.PyQt.QtGui import QIcon
 from qgis.PyQt.QtWidgets import QAction, QMessageBox
 
 from AcATaMa.core.analysis import AccuracyAssessmentWindow
+from AcATaMa.core.neighbor_homogeneity import clear_neighbor_homogeneity_cache
+from AcATaMa.core.sampling_queue import SamplingJobQueue
 from AcATaMa.gui.about_dialog import AboutDialog
 from AcATaMa.gui.acatama_dockwidget import AcATaMaDockWidget
 from AcATaMa.gui.response_design_window import ResponseDesignWindow
@@ -153,6 +155,7 @@ class AcATaMa:
         if SamplingReport.instance_opened:
             SamplingReport.instance_opened.close()
 
+        self.cancel_sampling_jobs()
         self.removes_temporary_files()
 
         # disconnects
@@ -175,6 +178,7 @@ class AcATaMa:
 
     def unload(self):
         """Removes the plugin menu item and icon from QGIS GUI."""
+        self.cancel_sampling_jobs()
         self.removes_temporary_files()
         # Remove the plugin menu item and icon
         self.iface.removePluginMenu(self.menu_name_plugin, self.dockable_action)
@@ -204,6 +208,12 @@ class AcATaMa:
 
         plugins["AcATaMa"].run()
 
+    @staticmethod
+    def cancel_sampling_jobs():
+        """Cancel the sampling jobs queued and running, they must not report to the windows closed"""
+        if SamplingJobQueue.inst is not None:
+            SamplingJobQueue.inst.cancel_all_jobs(report=False)
+
     def removes_temporary_files(self):
         if not self.dockwidget:
             return
@@ -221,6 +231,8 @@ class AcATaMa:
         if self.dockwidget.tmp_dir and os.path.isdir(self.dockwidget.tmp_dir):
             shutil.rmtree(self.dockwidget.tmp_dir, ignore_errors=True)
         self.dockwidget.tmp_dir = None
+        # remove the neighbor homogeneity rasters computed
+        clear_neighbor_homogeneity_cache()
 
         # clear qgis main canvas
         self.iface.mapCanvas().clearCache()
@@ -20,6 +20,7 @@
 
 import os
 
+import numpy as np
 from qgis.core import Qgis, QgsUnitTypes
 from qgis.PyQt import uic
 from qgis.PyQt.QtWidgets import QApplication, QDialog, QDialogButtonBox
@@ -28,15 +29,13 @@ from qgis.utils import iface
 from AcATaMa.core.map import Map
 from AcATaMa.core.response_design import ResponseDesign
 from AcATaMa.gui import accuracy_assessment_results
-from AcATaMa.utils.others_utils import get_nodata_format
+from AcATaMa.utils.others_utils import count_pixels_in_background, get_nodata_format
 from AcATaMa.utils.qgis_utils import get_source_from
 from AcATaMa.utils.system_utils import get_save_file_name, output_file_is_OK, wait_process
 
 
 class Analysis:
-    def __init__(self, response_design):
-        from AcATaMa.gui.acatama_dockwidget import AcATaMaDockWidget as AcATaMa
-
+    def __init__(self, response_design, thematic_map=None):
         self.values = None
         self.labels = None
         self.error_matrix = None
@@ -46,13 +45,18 @@ class Analysis:
         self.pixel_area_unit = None
 
         self.response_design = response_design
-        self.thematic_map = Map(
-            file_selected_combo_box=AcATaMa.dockwidget.QCBox_ThematicMap,
-            band=int(AcATaMa.dockwidget.QCBox_band_ThematicMap.currentText())
-            if AcATaMa.dockwidget.QCBox_band_ThematicMap.currentText()
-            else None,
-            nodata=get_nodata_format(AcATaMa.dockwidget.nodata_ThematicMap.text()),
-        )
+        # the thematic map selected in the plugin, if it is not given (e.g. without the gui)
+        if thematic_map is None:
+            from AcATaMa.gui.acatama_dockwidget import AcATaMaDockWidget as AcATaMa
+
+            thematic_map = Map(
+                file_selected_combo_box=AcATaMa.dockwidget.QCBox_ThematicMap,
+                band=int(AcATaMa.dockwidget.QCBox_band_ThematicMap.currentText())
+                if AcATaMa.dockwidget.QCBox_band_ThematicMap.currentText()
+                else None,
+                nodata=get_nodata_format(AcATaMa.dockwidget.nodata_ThematicMap.text()),
+            )
+        self.thematic_map = thematic_map
         self.thematic_pixels_count = {}
         # dialog settings
         self.area_unit = None
@@ -74,6 +78,10 @@ class Analysis:
         AcATaMa.dockwidget.QPBtn_ComputeTheAccurasyAssessment.setText("Processing, please wait ...")
         QApplication.processEvents()
 
+        self.compute_error_matrix()
+
+    def compute_error_matrix(self):
+        """Compute the error matrix and the values needed for the results, without the gui"""
         # get labels from labeling buttons
         labels = {}
         for button_config in self.response_design.buttons_config.values():
@@ -85,10 +93,12 @@ class Analysis:
         samples_outside_the_thematic = []
         points_labeled = [point for point in self.response_design.points if point.is_labeled]
         points_ordered = sorted(points_labeled, key=lambda p: p.sample_id)
-        for point in points_ordered:
-            # response design labeling from the pixel values in the thematic map
-            thematic_map_in_sample = self.thematic_map.get_pixel_value_from_pnt(point.QgsPnt)
-            if thematic_map_in_sample is None:
+        # response design labeling from the pixel values in the thematic map
+        thematic_map_in_samples = self.thematic_map.read_values(
+            [point.QgsPnt.x() for point in points_ordered], [point.QgsPnt.y() for point in points_ordered]
+        )
+        for point, thematic_map_in_sample in zip(points_ordered, thematic_map_in_samples, strict=True):
+            if np.isnan(thematic_map_in_sample):
                 samples_outside_the_thematic.append(point)
                 continue
             thematic_map.append(int(thematic_map_in_sample))
@@ -221,6 +231,22 @@ class AccuracyAssessmentWindow(QDialog, FORM_CLASS):
             )
             return
 
+        # the pixel count of the thematic map is needed for the areas, it is counted in background
+        # the first time and the accuracy assessment is opened when it finishes
+        thematic_map = self.analysis.thematic_map
+        if (
+            count_pixels_in_background(
+                [(thematic_map.qgs_layer, thematic_map.band, thematic_map.nodata)],
+                on_finished=self.thematic_pixels_counted,
+            )
+            is not None
+        ):
+            AcATaMa.dockwidget.QPBtn_ComputeTheAccurasyAssessment.setText(
+                "Counting the pixels of the thematic map, please wait ..."
+            )
+            AcATaMa.dockwidget.QPBtn_ComputeTheAccurasyAssessment.setDisabled(True)
+            return
+
         AccuracyAssessmentWindow.is_opened = True
         # first, set the estimator for accuracy assessment from dropdown selected
         self.analysis.estimator = AcATaMa.dockwidget.QCBox_SamplingEstimator.currentText()
@@ -235,6 +261,16 @@ class AccuracyAssessmentWindow(QDialog, FORM_CLASS):
         AcATaMa.dockwidget.QPBtn_ComputeTheAccurasyAssessment.setText("Accuracy assessment is opened, click to show")
         super().show()
 
+    def thematic_pixels_counted(self, pixel_counts):
+        from AcATaMa.gui.acatama_dockwidget import AcATaMaDockWidget as AcATaMa
+
+        AcATaMa.dockwidget.QPBtn_ComputeTheAccurasyAssessment.setEnabled(True)
+        if pixel_counts is None:
+            # canceled or failed
+            AcATaMa.dockwidget.QPBtn_ComputeTheAccurasyAssessment.setText("Compute the accuracy assessment")
+            return
+        self.show()
+
     def reload(self, msg_bar=True):
         from AcATaMa.gui.acatama_dockwidget import AcATaMaDockWidget as AcATaMa
 
@@ -0,0 +1,162 @@
+"""
+/***************************************************************************
+ AcATaMa
+                                 A QGIS plugin
+ AcATaMa is a Qgis plugin for Accuracy Assessment of Thematic Maps
+                              -------------------
+        copyright            : (C) 2017-2026 by Xavier C. Llano, SMByC
+        email                : xavier.corredor.llano@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+import json
+import os
+import re
+
+from qgis.core import Qgis, QgsUnitTypes, QgsVectorLayer
+
+from AcATaMa.core.analysis import Analysis
+from AcATaMa.core.response_design import ResponseDesign
+from AcATaMa.core.sampling_runner import count_map_pixels, get_config_path, get_map_from_config, load_config
+from AcATaMa.gui import accuracy_assessment_results
+
+# estimators by the index saved in the old format of the config file
+ESTIMATORS = ("Simple/systematic estimator", "Simple/systematic post-stratified estimator", "Stratified estimator")
+
+
+def load_analysis(yml_file_path, yaml_config=None):
+    """Restore the thematic map, the labels of the response design and the analysis settings of the
+    AcATaMa configuration file, the same as restoring it in the plugin but without the gui
+
+    Returns:
+        Analysis: the analysis ready to compute
+    """
+    if yaml_config is None:
+        yaml_config = load_config(yml_file_path)
+
+    sampling_file = get_config_path(yaml_config.get("sampling_layer"), yml_file_path)
+    if not sampling_file or "samples" not in yaml_config:
+        raise ValueError("The AcATaMa configuration file has no response design")
+    sampling_layer = QgsVectorLayer(sampling_file, os.path.splitext(os.path.basename(sampling_file))[0], "ogr")
+    if not sampling_layer.isValid():
+        raise ValueError(f"The sampling file is not a valid vector: {sampling_file}")
+
+    # restore the labels of the response design
+    response_design = ResponseDesign(sampling_layer)
+    response_design.buttons_config = yaml_config["labeling_buttons"]
+    for sample in yaml_config["samples"].values():
+        # support the old format of config file
+        sample_id = sample["sample_id"] if "sample_id" in sample else sample["shape_id"]
+        label_id = sample["label_id"] if "label_id" in sample else sample["classif_id"]
+        if sample_id in response_design.sample_idx_by_id and label_id is not None:
+            sample_to_restore = response_design.points[response_design.sample_idx_by_id[sample_id]]
+            sample_to_restore.label_id = label_id
+            sample_to_restore.is_labeled = True
+    response_design.reload_labeling_status()
+    if response_design.total_labeled == 0:
+        raise ValueError("The accuracy assessment needs at least one sample labeled")
+
+    # the estimator
+    analysis_config = yaml_config.get("analysis") or {}
+    estimator = analysis_config.get("estimator")
+    if estimator is None and yaml_config.get("accuracy_assessment_estimator", -1) in range(len(ESTIMATORS)):
+        estimator = ESTIMATORS[yaml_config["accuracy_assessment_estimator"]]
+    if estimator not in ESTIMATORS:
+        raise ValueError("The estimator of the accuracy assessment is not configured")
+
+    thematic_map = get_map_from_config(
+        yaml_config["thematic_map"]["path"],
+        yaml_config["thematic_map"].get("band", 1),
+        yaml_config["thematic_map"].get("nodata"),
+        yml_file_path,
+    )
+    # the pixels of the thematic map for the error matrix, counted in one pass without the gui (no progress dialogs)
+    count_map_pixels(thematic_map, thematic_map.nodata)
+    analysis = Analysis(response_design, thematic_map=thematic_map)
+    analysis.estimator = estimator
+
+    # the accuracy assessment settings, or the defaults of the accuracy assessment window
+    aa_cfg = analysis_config.get("accuracy_assessment") or yaml_config.get("accuracy_assessment_dialog")
+    if aa_cfg:
+        if aa_cfg["area_unit"] in [e.value for e in Qgis.AreaUnit]:
+            analysis.area_unit = Qgis.AreaUnit(aa_cfg["area_unit"])
+        else:  # old format
+            area_unit, success = QgsUnitTypes.stringToAreaUnit(aa_cfg["area_unit"])
+            analysis.area_unit = area_unit if success else Qgis.AreaUnit.SquareMeters
+        analysis.z_score = aa_cfg["z_score"]
+        analysis.csv_separator = aa_cfg["csv_separator"]
+        analysis.csv_decimal = aa_cfg["csv_decimal"]
+    else:
+        analysis.area_unit = QgsUnitTypes.distanceToAreaUnit(analysis.dist_unit)
+
+    return analysis
+
+
+def get_results(analysis, csv_rows=None):
+    """The accuracy assessment results computed as a dict, with the tables of the csv by section, from
+    the csv rows already computed (see get_csv_rows) or computed here if not given
+    """
+    if csv_rows is None:
+        csv_rows = accuracy_assessment_results.get_csv_rows(analysis)
+    sections = {}
+    section_rows = None
+    for row in csv_rows:
+        if len(row) == 1 and re.match(r"^\d+[a-z]?\) ", str(row[0])):
+            section_rows = sections[row[0].rstrip(":")] = []
+        elif section_rows is not None and row:
+            section_rows.append(row)
+
+    return {
+        "thematic_map": analysis.thematic_map.file_path,
+        "sampling_file": analysis.response_design.sampling_layer.source(),
+        "estimator": analysis.estimator,
+        "samples_labeled": analysis.response_design.total_labeled,
+        "total_samples": analysis.response_design.num_points,
+        "samples_outside_the_thematic": [sample.sample_id for sample in analysis.samples_outside_the_thematic],
+        "classes": analysis.values,
+        "labels": {str(value): analysis.labels.get(str(value)) for value in analysis.values},
+        "error_matrix": analysis.error_matrix,
+        "thematic_pixels_count": {str(value): analysis.thematic_pixels_count[value] for value in analysis.values},
+        "pixel_area": analysis.pixel_area_value,
+        "area_unit": analysis.pixel_area_unit,
+        "z_score": analysis.z_score,
+        "results": sections,
+    }
+
+
+def run_analysis(yml_file_path, output_dir=None):
+    """Compute the accuracy assessment of the AcATaMa configuration file and save the results in csv
+    and json files, named as the configuration file, in the output dir (by default next to it)
+
+    Returns:
+        (str, str, dict): the csv file, the json file and the results
+    """
+    analysis = load_analysis(yml_file_path)
+    try:
+        analysis.compute_error_matrix()
+        csv_rows = accuracy_assessment_results.get_csv_rows(analysis)
+        results = get_results(analysis, csv_rows)
+
+        output_dir = output_dir or os.path.dirname(os.path.abspath(yml_file_path))
+        file_name = os.path.splitext(os.path.basename(yml_file_path))[0] + " - results"
+        csv_file = os.path.join(output_dir, file_name + ".csv")
+        json_file = os.path.join(output_dir, file_name + ".json")
+        accuracy_assessment_results.write_csv(
+            analysis, csv_file, analysis.csv_separator, analysis.csv_decimal, csv_rows
+        )
+        with open(json_file, "w", encoding="utf-8") as json_output:
+            # numpy numbers as python numbers
+            json.dump(results, json_output, indent=2, default=lambda value: value.item())
+    finally:
+        ResponseDesign.instances.pop(analysis.response_design.sampling_layer, None)
+
+    return csv_file, json_file, results
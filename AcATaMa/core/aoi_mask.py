@@ -0,0 +1,137 @@
+"""
+/***************************************************************************
+ AcATaMa
+                                 A QGIS plugin
+ AcATaMa is a Qgis plugin for Accuracy Assessment of Thematic Maps
+                              -------------------
+        copyright            : (C) 2017-2026 by Xavier C. Llano, SMByC
+        email                : xavier.corredor.llano@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+import numpy as np
+from osgeo import gdal, ogr
+from qgis.core import QgsCoordinateTransform, QgsExpression, QgsFeatureRequest, QgsProject
+
+from AcATaMa.core.map import ComputedCache
+
+# AOI masks rasterized by polygon layer, feature filter and pixel grid of the map
+AOI_MASK_CACHE = ComputedCache()
+
+
+class AOIMask:
+    """Bitmask of the pixels of the map with the center inside the polygons of the area of interest,
+    packed by rows (8 pixels by byte), to check the points with a lookup as the nodata check
+    """
+
+    def __init__(self, pixel_grid, packed_mask, name=None):
+        self.pixel_grid = pixel_grid
+        self.packed_mask = packed_mask
+        self.name = name
+        self._tiles_with_data = {}
+
+    @property
+    def nbytes(self):
+        return self.packed_mask.nbytes
+
+    @classmethod
+    def rasterize(cls, aoi_layer, grid_map, feature_filter=None, max_pixels=2**24):
+        """Rasterize the polygons of the layer onto the pixel grid of the map, by chunks of rows
+
+        Args:
+            aoi_layer (QgsVectorLayer): the polygon layer of the area of interest
+            grid_map (Map): the map that defines the pixel grid
+            feature_filter (str): QGIS expression to select the features of the layer, all by default
+            max_pixels (int): maximum number of pixels rasterized by chunk
+
+        Returns:
+            AOIMask: the mask of the area of interest
+        """
+        request = QgsFeatureRequest()
+        if feature_filter:
+            expression = QgsExpression(feature_filter)
+            if expression.hasParserError():
+                raise ValueError(f"Invalid feature filter for the area of interest: {expression.parserErrorString()}")
+            request.setFilterExpression(feature_filter)
+
+        # the polygons in the crs of the map, in a memory layer for gdal
+        transform = QgsCoordinateTransform(aoi_layer.crs(), grid_map.qgs_layer.crs(), QgsProject.instance())
+        ogr_dataset = ogr.GetDriverByName("Memory").CreateDataSource("aoi")
+        ogr_layer = ogr_dataset.CreateLayer("aoi", geom_type=ogr.wkbUnknown)
+        for feature in aoi_layer.getFeatures(request):
+            geometry = feature.geometry()
+            if geometry.isNull() or geometry.isEmpty():
+                continue
+            geometry.transform(transform)
+            ogr_feature = ogr.Feature(ogr_layer.GetLayerDefn())
+            ogr_feature.SetGeometry(ogr.CreateGeometryFromWkb(bytes(geometry.asWkb())))
+            ogr_layer.CreateFeature(ogr_feature)
+
+        x_min, _, _, y_max, x_res, y_res, width, height = grid_map.get_pixel_grid()
+        packed_mask = np.zeros((height, -(-width // 8)), dtype=np.uint8)
+        rows_per_chunk = max(1, max_pixels // width)
+        for yoff in range(0, height, rows_per_chunk):
+            rows_in_chunk = min(rows_per_chunk, height - yoff)
+            chunk = gdal.GetDriverByName("MEM").Create("", width, rows_in_chunk, 1, gdal.GDT_Byte)
+            chunk.SetGeoTransform((x_min, x_res, 0.0, y_max - yoff * y_res, 0.0, -y_res))
+            gdal.RasterizeLayer(chunk, [1], ogr_layer, burn_values=[1])
+            packed_mask[yoff : yoff + rows_in_chunk] = np.packbits(chunk.GetRasterBand(1).ReadAsArray() > 0, axis=1)
+            del chunk
+
+        name = aoi_layer.name() + (f" ({feature_filter})" if feature_filter else "")
+        return cls(grid_map.get_pixel_grid(), packed_mask, name)
+
+    def contains(self, xs, ys):
+        """Boolean mask of the points (arrays of coordinates) in pixels inside the area of interest"""
+        x_min, _, _, y_max, x_res, y_res, width, height = self.pixel_grid
+        cols = np.floor((np.asarray(xs, dtype=np.float64) - x_min) / x_res).astype(np.int64)
+        rows = np.floor((y_max - np.asarray(ys, dtype=np.float64)) / y_res).astype(np.int64)
+        inside = (cols >= 0) & (cols < width) & (rows >= 0) & (rows < height)
+        cols, rows = cols[inside], rows[inside]
+        in_aoi = np.zeros(inside.shape, dtype=bool)
+        in_aoi[inside] = (self.packed_mask[rows, cols >> 3] >> (7 - (cols & 7))) & 1
+        return in_aoi
+
+    def read_rows(self, yoff, num_rows):
+        """Mask of the complete rows from yoff"""
+        width = self.pixel_grid[6]
+        return np.unpackbits(self.packed_mask[yoff : yoff + num_rows], axis=1, count=width).astype(bool)
+
+    def tiles_with_data(self, tile_size):
+        """Boolean mask of the square tiles of the pixel grid (by rows of tiles from the top left) with
+        pixels inside the area of interest
+        """
+        if tile_size not in self._tiles_with_data:
+            width, height = self.pixel_grid[6], self.pixel_grid[7]
+            tiles_x = -(-width // tile_size)
+            tiles_with_data = []
+            for yoff in range(0, height, tile_size):
+                cols_with_data = np.zeros(tiles_x * tile_size, dtype=bool)
+                cols_with_data[:width] = self.read_rows(yoff, tile_size).any(axis=0)
+                tiles_with_data.append(cols_with_data.reshape(tiles_x, tile_size).any(axis=1))
+            self._tiles_with_data[tile_size] = np.concatenate(tiles_with_data)
+        return self._tiles_with_data[tile_size]
+
+
+def get_aoi_mask(aoi_layer, grid_map, feature_filter=None):
+    """Get the mask of the area of interest rasterized only once by the polygon layer (while its features
+    are not changed), the feature filter and the pixel grid of the map
+    """
+    key = (aoi_layer.id(), feature_filter or "", grid_map.get_pixel_grid(), grid_map.qgs_layer.crs().toWkt())
+    # the features of the layer
+    version = (
+        aoi_layer.source(),
+        aoi_layer.subsetString(),
+        aoi_layer.featureCount(),
+        aoi_layer.extent().toString(),
+    )
+    return AOI_MASK_CACHE.get(key, version, lambda: AOIMask.rasterize(aoi_layer, grid_map, feature_filter))
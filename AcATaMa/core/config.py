@@ -43,6 +43,51 @@ from AcATaMa.utils.system_utils import LegacyLoader, block_signals_to, load_yaml
 CONFIG_FILE_VERSION = None
 
 
+def update_legacy_config(yaml_config):
+    """Rename the items of the old format of the config file to the current ones"""
+    # TODO: deprecated, legacy config input
+    if "thematic_raster" in yaml_config:
+        yaml_config["thematic_map"] = yaml_config.pop("thematic_raster")
+    if "classification_buttons" in yaml_config:
+        yaml_config["labeling_buttons"] = yaml_config.pop("classification_buttons")
+    if "points" in yaml_config:
+        yaml_config["samples"] = yaml_config.pop("points")
+    if "points_order" in yaml_config:
+        yaml_config["samples_order"] = yaml_config.pop("points_order")
+    if "accuracy_assessment" in yaml_config:
+        yaml_config["analysis"] = yaml_config.pop("accuracy_assessment")
+    if "analysis" in yaml_config and "dialog" in yaml_config["analysis"]:
+        yaml_config["analysis"]["accuracy_assessment"] = yaml_config["analysis"].pop("dialog")
+    if "sampling_design" in yaml_config:
+        srs_simp = yaml_config["sampling_design"]["simple_random_sampling"]
+        srs_stra = yaml_config["sampling_design"]["stratified_random_sampling"]
+        if "pixel_values_categ_map" in srs_simp:
+            srs_simp["classes_selected_for_sampling"] = srs_simp.pop("pixel_values_categ_map")
+        # old post stratification section
+        if "post_stratify" in srs_simp:
+            srs_simp["post_stratification"] = srs_simp.pop("post_stratify")
+        # old post stratification map path
+        if "categ_map_path" in srs_simp:
+            srs_simp["post_stratification_map_path"] = srs_simp.pop("categ_map_path")
+        # old post stratification map band
+        if "categ_map_band" in srs_simp:
+            srs_simp["post_stratification_map_band"] = srs_simp.pop("categ_map_band")
+        if "systematic_sampling" in yaml_config["sampling_design"]:
+            srs_syst = yaml_config["sampling_design"]["systematic_sampling"]
+            if "post_stratify" in srs_syst:
+                srs_syst["post_stratification"] = srs_syst.pop("post_stratify")
+            if "categ_map_path" in srs_syst:
+                srs_syst["post_stratification_map_path"] = srs_syst.pop("categ_map_path")
+            if "categ_map_band" in srs_syst:
+                srs_syst["post_stratification_map_band"] = srs_syst.pop("categ_map_band")
+        if "categ_map_path" in srs_stra:
+            srs_stra["stratification_map_path"] = srs_stra.pop("categ_map_path")
+        if "categ_map_band" in srs_stra:
+            srs_stra["stratification_map_band"] = srs_stra.pop("categ_map_band")
+        if "categ_map_nodata" in srs_stra:
+            srs_stra["stratification_map_nodata"] = srs_stra.pop("categ_map_nodata")
+
+
 @wait_process
 def save(file_out):
     from AcATaMa.gui.acatama_dockwidget import VERSION
@@ -130,6 +175,7 @@ def save(file_out):
         "automatic_random_seed": sampling_design.automatic_random_seed_SimpRS.isChecked(),
         "with_random_seed_by_user": sampling_design.with_random_seed_by_user_SimpRS.isChecked(),
         "random_seed_by_user": sampling_design.random_seed_by_user_SimpRS.text(),
+        "sampling_engine": sampling_design.QCBox_SamplingEngine_SimpRS.currentData(),
     }
     # stratified random sampling
     srs_method = (
@@ -161,6 +207,7 @@ def save(file_out):
         "automatic_random_seed": sampling_design.automatic_random_seed_StraRS.isChecked(),
         "with_random_seed_by_user": sampling_design.with_random_seed_by_user_StraRS.isChecked(),
         "random_seed_by_user": sampling_design.random_seed_by_user_StraRS.text(),
+        "sampling_engine": sampling_design.QCBox_SamplingEngine_StraRS.currentData(),
     }
     # systematic sampling
     sd_data["systematic_sampling"] = {
@@ -191,6 +238,12 @@ def save(file_out):
         "with_random_seed_by_user": sampling_design.with_random_seed_by_user_SystS.isChecked(),
         "random_seed_by_user": sampling_design.random_seed_by_user_SystS.text(),
     }
+    # area of interest
+    sd_data["area_of_interest"] = {
+        "enabled": sampling_design.QGBox_AreaOfInterest.isChecked(),
+        "layer_path": setup_path(get_source_from(sampling_design.QCBox_AreaOfInterest)),
+        "feature_filter": sampling_design.AreaOfInterest_FeatureFilter.text(),
+    }
 
     # ######### sampling report configuration ######### #
     from AcATaMa.gui.sampling_report import SamplingReport
@@ -347,47 +400,8 @@ def restore(yml_file_path):
     else:
         CONFIG_FILE_VERSION = 191121  # v19.11.21
 
-    # support load the old format of config file TODO: deprecated, legacy config input
-    if "thematic_raster" in yaml_config:
-        yaml_config["thematic_map"] = yaml_config.pop("thematic_raster")
-    if "classification_buttons" in yaml_config:
-        yaml_config["labeling_buttons"] = yaml_config.pop("classification_buttons")
-    if "points" in yaml_config:
-        yaml_config["samples"] = yaml_config.pop("points")
-    if "points_order" in yaml_config:
-        yaml_config["samples_order"] = yaml_config.pop("points_order")
-    if "accuracy_assessment" in yaml_config:
-        yaml_config["analysis"] = yaml_config.pop("accuracy_assessment")
-    if "analysis" in yaml_config and "dialog" in yaml_config["analysis"]:
-        yaml_config["analysis"]["accuracy_assessment"] = yaml_config["analysis"].pop("dialog")
-    if "sampling_design" in yaml_config:
-        srs_simp = yaml_config["sampling_design"]["simple_random_sampling"]
-        srs_stra = yaml_config["sampling_design"]["stratified_random_sampling"]
-        if "pixel_values_categ_map" in srs_simp:
-            srs_simp["classes_selected_for_sampling"] = srs_simp.pop("pixel_values_categ_map")
-        # old post stratification section
-        if "post_stratify" in srs_simp:
-            srs_simp["post_stratification"] = srs_simp.pop("post_stratify")
-        # old post stratification map path
-        if "categ_map_path" in srs_simp:
-            srs_simp["post_stratification_map_path"] = srs_simp.pop("categ_map_path")
-        # old post stratification map band
-        if "categ_map_band" in srs_simp:
-            srs_simp["post_stratification_map_band"] = srs_simp.pop("categ_map_band")
-        if "systematic_sampling" in yaml_config["sampling_design"]:
-            srs_syst = yaml_config["sampling_design"]["systematic_sampling"]
-            if "post_stratify" in srs_syst:
-                srs_syst["post_stratification"] = srs_syst.pop("post_stratify")
-            if "categ_map_path" in srs_syst:
-                srs_syst["post_stratification_map_path"] = srs_syst.pop("categ_map_path")
-            if "categ_map_band" in srs_syst:
-                srs_syst["post_stratification_map_band"] = srs_syst.pop("categ_map_band")
-        if "categ_map_path" in srs_stra:
-            srs_stra["stratification_map_path"] = srs_stra.pop("categ_map_path")
-        if "categ_map_band" in srs_stra:
-            srs_stra["stratification_map_band"] = srs_stra.pop("categ_map_band")
-        if "categ_map_nodata" in srs_stra:
-            srs_stra["stratification_map_nodata"] = srs_stra.pop("categ_map_nodata")
+    # support load the old format of config file
+    update_legacy_config(yaml_config)
 
     # restore the thematic map
     if yaml_config["thematic_map"]["path"] and get_restore_path(yaml_config["thematic_map"]["path"]):
@@ -464,6 +478,9 @@ def restore(yml_file_path):
         sampling_design.automatic_random_seed_SimpRS.setChecked(srs_simp["automatic_random_seed"])
         sampling_design.with_random_seed_by_user_SimpRS.setChecked(srs_simp["with_random_seed_by_user"])
         sampling_design.random_seed_by_user_SimpRS.setText(srs_simp["random_seed_by_user"])
+        sampling_design.QCBox_SamplingEngine_SimpRS.setCurrentIndex(
+            max(sampling_design.QCBox_SamplingEngine_SimpRS.findData(srs_simp.get("sampling_engine", "rejection")), 0)
+        )
 
         # stratified random sampling
         source = get_restore_path(srs_stra["stratification_map_path"])
@@ -515,13 +532,15 @@ def restore(yml_file_path):
         if srs_table and "pixel_count" in srs_table:
             from AcATaMa.utils.others_utils import storage_pixel_count_by_pixel_values
 
-            storage_pixel_count_by_pixel_values[
+            # only in memory, it was computed when the config was saved, not from the current file
+            storage_pixel_count_by_pixel_values.set_in_memory(
                 (
                     sampling_design.QCBox_SamplingMap_StraRS.currentLayer(),
                     int(sampling_design.QCBox_band_SamplingMap_StraRS.currentText()),
                     get_nodata_format(sampling_design.nodata_SamplingMap_StraRS.text()),
-                )
-            ] = dict(zip(srs_table["values_and_colors_table"]["Pixel Value"], srs_table["pixel_count"], strict=True))
+                ),
+                dict(zip(srs_table["values_and_colors_table"]["Pixel Value"], srs_table["pixel_count"], strict=True)),
+            )
 
         # TODO:
         # restore the values color table of the QCBox_SamplingMap_StraRS saved
@@ -536,6 +555,9 @@ def restore(yml_file_path):
         sampling_design.automatic_random_seed_StraRS.setChecked(srs_stra["automatic_random_seed"])
         sampling_design.with_random_seed_by_user_StraRS.setChecked(srs_stra["with_random_seed_by_user"])
         sampling_design.random_seed_by_user_StraRS.setText(srs_stra["random_seed_by_user"])
+        sampling_design.QCBox_SamplingEngine_StraRS.setCurrentIndex(
+            max(sampling_design.QCBox_SamplingEngine_StraRS.findData(srs_stra.get("sampling_engine", "rejection")), 0)
+        )
 
         # systematic sampling
         if "systematic_sampling" in sd_cfg:
@@ -597,6 +619,16 @@ def restore(yml_file_path):
             sampling_design.automatic_random_seed_SystS.setChecked(srs_syst["automatic_random_seed"])
             sampling_design.with_random_seed_by_user_SystS.setChecked(srs_syst["with_random_seed_by_user"])
             sampling_design.random_seed_by_user_SystS.setText(srs_syst["random_seed_by_user"])
+        if "area_of_interest" in sd_cfg:
+            aoi_cfg = sd_cfg["area_of_interest"]
+            source = get_restore_path(aoi_cfg["layer_path"])
+            aoi_qgslayer = load_and_select_layer_in(source, sampling_design.QCBox_AreaOfInterest)
+            if source and not aoi_qgslayer:
+                iface.messageBar().pushMessage(
+                    "AcATaMa", f"Failed to restore the area of interest: {source}", level=Qgis.MessageLevel.Warning
+                )
+            sampling_design.AreaOfInterest_FeatureFilter.setText(aoi_cfg["feature_filter"] or "")
+            sampling_design.QGBox_AreaOfInterest.setChecked(aoi_cfg["enabled"])
 
     # ######### response_design configuration ######### #
     # restore the response_design settings
@@ -661,20 +693,22 @@ def restore(yml_file_path):
             x["render_file_path"] = get_restore_path(x["render_file_path"])
 
         # restore the samples order
-        samples_ordered = []
-        for sample_id in yaml_config["samples_order"]:
-            # point saved exist in shape file
-            if sample_id in [p.sample_id for p in response_design.points]:
-                samples_ordered.append(next(p for p in response_design.points if p.sample_id == sample_id))
+        sample_idx_by_id = response_design.sample_idx_by_id
+        samples_saved = set(yaml_config["samples_order"])
+        # point saved exist in shape file
+        samples_ordered = [
+            sample_idx_by_id[sample_id] for sample_id in yaml_config["samples_order"] if sample_id in sample_idx_by_id
+        ]
         # added new point inside shape file that not exists in yaml config
-        for new_point_id in {p.sample_id for p in response_design.points} - set(yaml_config["samples_order"]):
-            samples_ordered.append(next(p for p in response_design.points if p.sample_id == new_point_id))
+        samples_ordered += [
+            sample_idx for sample_id, sample_idx in sample_idx_by_id.items() if sample_id not in samples_saved
+        ]
         # reassign points loaded and ordered
-        response_design.points = samples_ordered
+        response_design.points = response_design.points.take(samples_ordered)
         # restore sample state response_design
         for sample in yaml_config["samples"].values():
-            if sample["sample_id"] in [p.sample_id for p in response_design.points]:
-                sample_to_restore = next(p for p in response_design.points if p.sample_id == sample["sample_id"])
+            if sample["sample_id"] in response_design.sample_idx_by_id:
+                sample_to_restore = response_design.points[response_design.sample_idx_by_id[sample["sample_id"]]]
                 sample_to_restore.label_id = sample["label_id"]
                 if sample_to_restore.label_id is not None:
                     sample_to_restore.is_labeled = True
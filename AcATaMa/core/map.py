@@ -18,11 +18,19 @@
  ***************************************************************************/
 """
 
+import copy
+import os
+import threading
 import xml.etree.ElementTree as ET  # nosec B405 - parses only QGIS-generated style XML, not untrusted input
+from collections import OrderedDict
+from math import floor
 from random import randrange
 
 import numpy as np
-from qgis.core import Qgis, QgsPalettedRasterRenderer, QgsPointXY
+from osgeo import gdal
+from qgis.core import Qgis, QgsPalettedRasterRenderer, QgsPointXY, QgsRasterLayer
+from qgis.gui import QgsMapLayerComboBox
+from qgis.PyQt.QtCore import QSettings
 from qgis.PyQt.QtGui import QColor
 from qgis.PyQt.QtWidgets import QMessageBox
 
@@ -117,27 +125,363 @@ def get_values_and_colors_table(layer, band=1, nodata=None):
     return values_and_colors_table
 
 
+def get_block_cache_memory_limit():
+    """Memory limit in bytes of the raster block cache for each map, it can be tuned per
+    machine with the QGIS setting "AcATaMa/block_cache_memory_limit" (in MB)
+    """
+    return QSettings().value("AcATaMa/block_cache_memory_limit", 256, type=int) * 1024**2
+
+
+class RasterBlockCache:
+    """Read a raster band by its native gdal blocks on demand, keeping the blocks read in
+    a LRU cache bounded by a memory limit in bytes
+    """
+
+    def __init__(self, gdal_band, memory_limit=None):
+        self.gdal_band = gdal_band
+        self.block_x_size, self.block_y_size = gdal_band.GetBlockSize()
+        self.width = gdal_band.XSize
+        self.height = gdal_band.YSize
+        self.blocks_per_row = (self.width + self.block_x_size - 1) // self.block_x_size
+        self.memory_limit = get_block_cache_memory_limit() if memory_limit is None else memory_limit
+        self.memory_used = 0
+        self.blocks = OrderedDict()
+        # counters of the blocks requested that were in memory or read from the file
+        self.hits = 0
+        self.misses = 0
+
+    def get_block(self, block_col, block_row):
+        key = (block_col, block_row)
+        block = self.blocks.get(key)
+        if block is not None:
+            self.hits += 1
+            self.blocks.move_to_end(key)
+            return block
+
+        self.misses += 1
+        xoff = block_col * self.block_x_size
+        yoff = block_row * self.block_y_size
+        block = self.gdal_band.ReadAsArray(
+            xoff, yoff, min(self.block_x_size, self.width - xoff), min(self.block_y_size, self.height - yoff)
+        )
+        self.blocks[key] = block
+        self.memory_used += block.nbytes
+        # free the least recently used blocks, always keeping the current one
+        while self.memory_used > self.memory_limit and len(self.blocks) > 1:
+            _, old_block = self.blocks.popitem(last=False)
+            self.memory_used -= old_block.nbytes
+        return block
+
+    def read_pixel(self, col, row):
+        block = self.get_block(col // self.block_x_size, row // self.block_y_size)
+        return block[row % self.block_y_size, col % self.block_x_size]
+
+    def read_pixels(self, cols, rows):
+        """Read the pixels for the arrays of cols and rows (inside the raster) block by block"""
+        values = np.empty(cols.shape, dtype=np.float64)
+        if not cols.size:
+            return values
+        block_ids = (rows // self.block_y_size) * self.blocks_per_row + cols // self.block_x_size
+        order = np.argsort(block_ids, kind="stable")
+        unique_block_ids, starts = np.unique(block_ids[order], return_index=True)
+        for block_id, in_block in zip(unique_block_ids, np.split(order, starts[1:]), strict=True):
+            block = self.get_block(int(block_id % self.blocks_per_row), int(block_id // self.blocks_per_row))
+            values[in_block] = block[rows[in_block] % self.block_y_size, cols[in_block] % self.block_x_size]
+        return values
+
+    def clear(self):
+        self.blocks.clear()
+        self.memory_used = 0
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "blocks": len(self.blocks),
+            "memory_used": self.memory_used,
+            "memory_limit": self.memory_limit,
+        }
+
+
+class ComputedCache:
+    """Cache of the rasters computed from a source (e.g. a map file), keeping only the last version of
+    each source (e.g. while its file is not modified) and the last ones used while their size in memory
+    (nbytes) is under the memory limit, by default the memory limit of the block cache
+    """
+
+    def __init__(self, memory_limit=None, on_evict=None):
+        self.memory_limit = memory_limit
+        self.on_evict = on_evict
+        self.items = OrderedDict()  # {key: (version, computed)}
+        self.memory_used = 0
+        self.lock = threading.Lock()
+
+    def get(self, key, version, compute):
+        """The computed for the key and version of the source, computed (compute()) only if it is not cached"""
+        with self.lock:
+            if key in self.items:
+                cached_version, computed = self.items[key]
+                if cached_version == version:
+                    self.items.move_to_end(key)
+                    return computed
+                # the source changed
+                self.evict(key)
+            computed = compute()
+            self.items[key] = (version, computed)
+            self.memory_used += computed.nbytes
+            # free the least recently used, always keeping the current one
+            memory_limit = get_block_cache_memory_limit() if self.memory_limit is None else self.memory_limit
+            while self.memory_used > memory_limit and len(self.items) > 1:
+                self.evict(next(iter(self.items)))
+            return computed
+
+    def evict(self, key):
+        _, computed = self.items.pop(key)
+        self.memory_used -= computed.nbytes
+        if self.on_evict is not None:
+            self.on_evict(computed)
+
+    def clear(self):
+        with self.lock:
+            for key in list(self.items):
+                self.evict(key)
+
+    def __len__(self):
+        return len(self.items)
+
+
 class Map:
-    def __init__(self, file_selected_combo_box, band=1, nodata=None):
+    def __init__(self, file_selected_combo_box, band=1, nodata=None, cache_memory_limit=None):
+        """
+        Args:
+            file_selected_combo_box (QgsMapLayerComboBox or QgsRasterLayer): the map layer or the combobox with it
+            band (int): band of the map
+            nodata (int): nodata value, None if not set
+            cache_memory_limit (int): memory limit of the block cache, by default the QGIS setting
+        """
         from AcATaMa.utils.qgis_utils import get_source_from
 
         self.file_path = get_source_from(file_selected_combo_box)
-        self.qgs_layer = file_selected_combo_box.currentLayer()
+        self.qgs_layer = (
+            file_selected_combo_box.currentLayer()
+            if isinstance(file_selected_combo_box, QgsMapLayerComboBox)
+            else file_selected_combo_box
+        )
         self.band = band
         self.nodata = nodata
+        # gdal band and block cache opened on demand for the pixel reads
+        self.cache_memory_limit = cache_memory_limit
+        self._gdal_dataset = None
+        self._gdal_band = None
+        self._block_cache = None
+        self._pixel_grid = None
+        self._neighbor_homogeneity = {}
+
+    @classmethod
+    def from_file(cls, file_path, band=1, nodata=None):
+        """Map from a raster file without the layer loaded in QGIS, for the processing without the gui"""
+        qgs_layer = QgsRasterLayer(file_path, os.path.splitext(os.path.basename(file_path))[0])
+        if not qgs_layer.isValid():
+            raise ValueError(f"The map file is not a valid raster: {file_path}")
+        return cls(qgs_layer, band=band, nodata=nodata)
 
     def extent(self):
         return self.qgs_layer.extent()
 
+    def clone(self):
+        """Copy of the map with its own gdal handle and block cache, to read it from other threads"""
+        self.get_pixel_grid()
+        map_clone = copy.copy(self)
+        map_clone._gdal_dataset = None
+        map_clone._gdal_band = None
+        map_clone._block_cache = None
+        map_clone._neighbor_homogeneity = {}
+        return map_clone
+
+    def get_gdal_band(self):
+        """Open (only once) the raster band with gdal, return None if the source can't be read by gdal"""
+        if self._gdal_band is None and self._gdal_dataset is None:
+            try:
+                self._gdal_dataset = gdal.Open(self.file_path, gdal.GA_ReadOnly)
+                self._gdal_band = self._gdal_dataset.GetRasterBand(self.band)
+            except Exception:
+                self._gdal_dataset = False
+                self._gdal_band = None
+        return self._gdal_band
+
+    def get_block_cache(self):
+        """The block cache of the raster band, None if the source can't be read by gdal"""
+        if self._block_cache is None and self.get_gdal_band() is not None:
+            self._block_cache = RasterBlockCache(self._gdal_band, self.cache_memory_limit)
+        return self._block_cache
+
+    def get_pixel_grid(self):
+        """Extent, resolution and size of the raster computed once, the same used by the qgis identify"""
+        if self._pixel_grid is None:
+            data_provider = self.qgs_layer.dataProvider()
+            extent = data_provider.extent()
+            width, height = data_provider.xSize(), data_provider.ySize()
+            self._pixel_grid = (
+                extent.xMinimum(),
+                extent.xMaximum(),
+                extent.yMinimum(),
+                extent.yMaximum(),
+                extent.width() / width,
+                extent.height() / height,
+                width,
+                height,
+            )
+        return self._pixel_grid
+
+    @property
+    def geotransform(self):
+        """Geotransform of the raster in the gdal order"""
+        x_min, _, _, y_max, x_res, y_res, _, _ = self.get_pixel_grid()
+        return x_min, x_res, 0.0, y_max, 0.0, -y_res
+
+    def world_to_pixel(self, xs, ys):
+        """Column and row of the pixels for the arrays of coordinates, without checking the raster bounds"""
+        x_min, _, _, y_max, x_res, y_res, _, _ = self.get_pixel_grid()
+        cols = np.floor((np.asarray(xs, dtype=np.float64) - x_min) / x_res).astype(np.int64)
+        rows = np.floor((y_max - np.asarray(ys, dtype=np.float64)) / y_res).astype(np.int64)
+        return cols, rows
+
+    def pixel_to_world(self, cols, rows):
+        """Coordinates of the upper left corner of the pixels for the arrays of columns and rows"""
+        x_min, _, _, y_max, x_res, y_res, _, _ = self.get_pixel_grid()
+        xs = x_min + np.asarray(cols) * x_res
+        ys = y_max - np.asarray(rows) * y_res
+        return xs, ys
+
+    def pixel_centroids(self, xs, ys):
+        """Vectorized get_pixel_centroid, the coordinates outside the raster extent are returned as nan"""
+        x_min, x_max, y_min, y_max, x_res, y_res, _, _ = self.get_pixel_grid()
+        xs = np.asarray(xs, dtype=np.float64)
+        ys = np.asarray(ys, dtype=np.float64)
+        inside = (xs >= x_min) & (xs <= x_max) & (ys >= y_min) & (ys <= y_max)
+        cols, rows = self.world_to_pixel(xs, ys)
+        x_centroids = np.where(inside, x_min + (cols + 0.5) * x_res, np.nan)
+        y_centroids = np.where(inside, y_max - (rows + 0.5) * y_res, np.nan)
+        return x_centroids, y_centroids
+
+    def read_values(self, xs, ys):
+        """Get the pixel values for the arrays of coordinates xs and ys in one pass, reading only
+        the gdal blocks involved, same as get_pixel_value_from_xy but nodata or points outside the
+        raster are returned as nan
+        """
+        xs = np.asarray(xs, dtype=np.float64)
+        ys = np.asarray(ys, dtype=np.float64)
+        values = np.full(xs.shape, np.nan)
+
+        block_cache = self.get_block_cache()
+        if block_cache is None:
+            # fallback for sources not readable by gdal
+            for idx, (x, y) in enumerate(zip(xs.flat, ys.flat, strict=True)):
+                value = self.get_pixel_value_from_xy(float(x), float(y))
+                if value is not None:
+                    values.flat[idx] = value
+            return values
+
+        x_min, x_max, y_min, y_max, _, _, width, height = self.get_pixel_grid()
+        inside = (xs >= x_min) & (xs <= x_max) & (ys >= y_min) & (ys <= y_max)
+        cols, rows = self.world_to_pixel(xs[inside], ys[inside])
+        inside_values = block_cache.read_pixels(np.clip(cols, 0, width - 1), np.clip(rows, 0, height - 1))
+
+        # the source nodata is returned as empty by the qgis identify
+        source_nodata = self._gdal_band.GetNoDataValue()
+        if source_nodata is not None:
+            inside_values[inside_values == source_nodata] = np.nan
+
+        values[inside] = inside_values
+        return values
+
+    def read_rows(self, yoff, num_rows):
+        """Values of the complete rows from yoff as float with the source nodata as nan, to read the
+        same rows of other maps with the same pixel grid but a different gdal block size
+        """
+        gdal_band = self.get_gdal_band()
+        values = gdal_band.ReadAsArray(0, yoff, gdal_band.XSize, num_rows).astype(np.float64)
+        source_nodata = gdal_band.GetNoDataValue()
+        if source_nodata is not None:
+            values[values == source_nodata] = np.nan
+        return values
+
+    def read_rows_by_chunks(self, max_pixels=2**22, halo=0):
+        """Read the full raster by chunks of complete rows aligned to the gdal blocks, yield the
+        first row of the chunk and its values as float with the source nodata as nan. With halo,
+        the values include also the halo rows above and below the chunk (nan outside the raster)
+        """
+        gdal_band = self.get_gdal_band()
+        width, height = gdal_band.XSize, gdal_band.YSize
+        block_y_size = gdal_band.GetBlockSize()[1]
+        rows_per_chunk = max(block_y_size, (max_pixels // width) // block_y_size * block_y_size)
+        for yoff in range(0, height, rows_per_chunk):
+            rows_in_chunk = min(rows_per_chunk, height - yoff)
+            top, bottom = max(yoff - halo, 0), min(yoff + rows_in_chunk + halo, height)
+            values = self.read_rows(top, bottom - top)
+            if halo:
+                values = np.pad(
+                    values,
+                    ((top - (yoff - halo), yoff + rows_in_chunk + halo - bottom), (0, 0)),
+                    constant_values=np.nan,
+                )
+            yield yoff, values
+
+    def get_neighbor_homogeneity(self, num_neighbors):
+        """The raster with the number of neighbors with the same class of each pixel, computed once
+        for the map file, band and number of neighbors, None if the source can't be read by gdal
+        """
+        from AcATaMa.core.neighbor_homogeneity import get_neighbor_homogeneity
+
+        if num_neighbors not in self._neighbor_homogeneity:
+            neighbor_homogeneity = get_neighbor_homogeneity(self, num_neighbors)
+            # own gdal handle for this map
+            self._neighbor_homogeneity[num_neighbors] = neighbor_homogeneity and neighbor_homogeneity.clone()
+        return self._neighbor_homogeneity[num_neighbors]
+
+    def read_same_class_neighbors(self, xs, ys, num_neighbors):
+        """Number of neighbors with the same class (the pixel included) for the arrays of coordinates
+        inside the raster, None if the source can't be read by gdal
+        """
+        neighbor_homogeneity = self.get_neighbor_homogeneity(num_neighbors)
+        if neighbor_homogeneity is None:
+            return None
+        _, _, _, _, _, _, width, height = self.get_pixel_grid()
+        cols, rows = self.world_to_pixel(xs, ys)
+        return neighbor_homogeneity.read_counts(np.clip(cols, 0, width - 1), np.clip(rows, 0, height - 1))
+
+    def valid_data_mask(self, values):
+        """Mask of the values that are valid data, same as the in_valid_data check"""
+        valid = ~np.isnan(values)
+        if self.nodata is not None:
+            valid[valid] = np.trunc(values[valid]) != self.nodata
+        return valid
+
+    def is_aligned_with(self, other_map):
+        """Check if both maps have the same pixel grid"""
+        return self.get_pixel_grid() == other_map.get_pixel_grid()
+
     def get_pixel_value_from_xy(self, x, y):
-        return (
-            self.qgs_layer.dataProvider()
-            .identify(QgsPointXY(x, y), Qgis.RasterIdentifyFormat.Value)
-            .results()[self.band]
-        )
+        block_cache = self.get_block_cache()
+        if block_cache is None:
+            return (
+                self.qgs_layer.dataProvider()
+                .identify(QgsPointXY(x, y), Qgis.RasterIdentifyFormat.Value)
+                .results()[self.band]
+            )
+
+        x_min, x_max, y_min, y_max, x_res, y_res, width, height = self.get_pixel_grid()
+        if not (x_min <= x <= x_max and y_min <= y <= y_max):
+            return None
+        col = min(floor((x - x_min) / x_res), width - 1)
+        row = min(floor((y_max - y) / y_res), height - 1)
+        value = float(block_cache.read_pixel(col, row))
+        if np.isnan(value) or value == self._gdal_band.GetNoDataValue():
+            return None
+        return value
 
     def get_pixel_value_from_pnt(self, point):
-        return self.qgs_layer.dataProvider().identify(point, Qgis.RasterIdentifyFormat.Value).results()[self.band]
+        return self.get_pixel_value_from_xy(point.x(), point.y())
 
     def get_total_pixels_by_value(self, pixel_value):
         pixel_counts_by_value = get_pixel_count_by_pixel_values(self.qgs_layer, self.band, None, self.nodata)
@@ -145,18 +489,10 @@ class Map:
             return pixel_counts_by_value[pixel_value]
 
     def get_pixel_centroid(self, x, y):
-        if (
-            x < self.extent().xMinimum()
-            or x > self.extent().xMaximum()
-            or y < self.extent().yMinimum()
-            or y > self.extent().yMaximum()
-        ):
+        x_min, x_max, y_min, y_max, pixel_width, pixel_height, _, _ = self.get_pixel_grid()
+        if x < x_min or x > x_max or y < y_min or y > y_max:
             return None, None
 
-        pixel_width = self.qgs_layer.rasterUnitsPerPixelX()
-        pixel_height = self.qgs_layer.rasterUnitsPerPixelY()
-        x_min = self.extent().xMinimum()
-        y_max = self.extent().yMaximum()
         col = int((x - x_min) / pixel_width)
         row = int((y_max - y) / pixel_height)
 
@@ -0,0 +1,165 @@
+"""
+/***************************************************************************
+ AcATaMa
+                                 A QGIS plugin
+ AcATaMa is a Qgis plugin for Accuracy Assessment of Thematic Maps
+                              -------------------
+        copyright            : (C) 2017-2026 by Xavier C. Llano, SMByC
+        email                : xavier.corredor.llano@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+import os
+import tempfile
+
+import numpy as np
+from osgeo import gdal
+
+from AcATaMa.core.map import ComputedCache, RasterBlockCache, get_block_cache_memory_limit
+
+# radius of the window for the number of neighbors
+WINDOW_RADIUS = {8: 1, 24: 2, 48: 3}
+
+# the rasters evicted from the cache with a temporary GeoTIFF, they could be still read by the maps
+# that got them, so the files are removed with the cache
+_evicted_files = []
+
+
+def _remove_with_the_cache(neighbor_homogeneity):
+    if neighbor_homogeneity.file_path:
+        _evicted_files.append(neighbor_homogeneity)
+
+
+# neighbor homogeneity rasters computed by map file, band and number of neighbors
+NEIGHBOR_HOMOGENEITY_CACHE = ComputedCache(on_evict=_remove_with_the_cache)
+
+
+def count_same_class_neighbors(values, radius):
+    """Count for each pixel the pixels in the window centered on it with the same class, the
+    pixel itself included as in the neighbors aggregation check
+
+    Args:
+        values (ndarray): values of the rows with the radius as halo rows above and below, nan for nodata
+        radius (int): radius of the window
+
+    Returns:
+        the counts of the rows without the halo
+    """
+    classes = np.trunc(values)
+    height = classes.shape[0] - 2 * radius
+    width = classes.shape[1]
+    padded = np.pad(classes, ((0, 0), (radius, radius)), constant_values=np.nan)
+    center = classes[radius : radius + height]
+    counts = np.zeros((height, width), dtype=np.uint8)
+    for dy in range(2 * radius + 1):
+        for dx in range(2 * radius + 1):
+            counts += padded[dy : dy + height, dx : dx + width] == center
+    return counts
+
+
+class NeighborHomogeneity:
+    """Raster with the number of neighbors with the same class of each pixel of the thematic
+    map, kept in memory or in a temporary GeoTIFF when it exceeds the memory limit
+    """
+
+    def __init__(self, num_neighbors, counts=None, file_path=None):
+        self.num_neighbors = num_neighbors
+        self.counts = counts
+        self.file_path = file_path
+        self._gdal_dataset = None
+        self._block_cache = None
+
+    @classmethod
+    def build(cls, thematic_map, num_neighbors, memory_limit=None):
+        """Compute the raster in one streaming pass by chunks of rows over the thematic map"""
+        radius = WINDOW_RADIUS[num_neighbors]
+        gdal_band = thematic_map.get_gdal_band()
+        width, height = gdal_band.XSize, gdal_band.YSize
+        memory_limit = get_block_cache_memory_limit() if memory_limit is None else memory_limit
+
+        if width * height <= memory_limit:
+            counts = np.empty((height, width), dtype=np.uint8)
+            for yoff, values in thematic_map.read_rows_by_chunks(halo=radius):
+                chunk_counts = count_same_class_neighbors(values, radius)
+                counts[yoff : yoff + len(chunk_counts)] = chunk_counts
+            return cls(num_neighbors, counts=counts)
+
+        file_descriptor, file_path = tempfile.mkstemp(prefix="acatama_neighbor_homogeneity_", suffix=".tif")
+        os.close(file_descriptor)
+        dataset = gdal.GetDriverByName("GTiff").Create(
+            file_path, width, height, 1, gdal.GDT_Byte, options=["TILED=YES", "COMPRESS=DEFLATE", "BIGTIFF=IF_SAFER"]
+        )
+        band = dataset.GetRasterBand(1)
+        for yoff, values in thematic_map.read_rows_by_chunks(halo=radius):
+            band.WriteArray(count_same_class_neighbors(values, radius), 0, yoff)
+        dataset.FlushCache()
+        del band, dataset
+        return cls(num_neighbors, file_path=file_path)
+
+    @property
+    def nbytes(self):
+        """Size in memory, the temporary GeoTIFF is only read by blocks"""
+        return self.counts.nbytes if self.counts is not None else 0
+
+    def clone(self):
+        """Copy that shares the counts but with its own gdal handle, to read it from other threads"""
+        return NeighborHomogeneity(self.num_neighbors, counts=self.counts, file_path=self.file_path)
+
+    def get_block_cache(self):
+        if self._block_cache is None:
+            self._gdal_dataset = gdal.Open(self.file_path, gdal.GA_ReadOnly)
+            self._block_cache = RasterBlockCache(self._gdal_dataset.GetRasterBand(1))
+        return self._block_cache
+
+    def read_counts(self, cols, rows):
+        """Counts for the arrays of columns and rows (inside the raster)"""
+        if self.counts is not None:
+            return self.counts[rows, cols]
+        return self.get_block_cache().read_pixels(cols, rows)
+
+    def read_rows(self, yoff, num_rows):
+        """Counts of the complete rows from yoff"""
+        if self.counts is not None:
+            return self.counts[yoff : yoff + num_rows]
+        return self.get_block_cache().gdal_band.ReadAsArray(0, yoff, None, num_rows)
+
+    def remove(self):
+        """Remove the temporary GeoTIFF, if any"""
+        self._block_cache = self._gdal_dataset = None
+        if self.file_path and os.path.isfile(self.file_path):
+            gdal.GetDriverByName("GTiff").Delete(self.file_path)
+
+
+def get_neighbor_homogeneity(thematic_map, num_neighbors):
+    """Get the neighbor homogeneity of the thematic map computed only once by the map file (while it
+    is not modified), band and number of neighbors, None if the map can't be read by gdal
+    """
+    if thematic_map.get_gdal_band() is None:
+        return None
+    try:
+        file_stat = os.stat(thematic_map.file_path)
+        file_version = (file_stat.st_size, file_stat.st_mtime_ns)
+    except OSError:
+        file_version = None
+
+    return NEIGHBOR_HOMOGENEITY_CACHE.get(
+        (thematic_map.file_path, thematic_map.band, num_neighbors),
+        file_version,
+        lambda: NeighborHomogeneity.build(thematic_map, num_neighbors),
+    )
+
+
+def clear_neighbor_homogeneity_cache():
+    NEIGHBOR_HOMOGENEITY_CACHE.clear()
+    for neighbor_homogeneity in _evicted_files:
+        neighbor_homogeneity.remove()
+    _evicted_files.clear()
@@ -0,0 +1,117 @@
+"""
+/***************************************************************************
+ AcATaMa
+                                 A QGIS plugin
+ AcATaMa is a Qgis plugin for Accuracy Assessment of Thematic Maps
+                              -------------------
+        copyright            : (C) 2017-2026 by Xavier C. Llano, SMByC
+        email                : xavier.corredor.llano@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+import os
+
+import numpy as np
+
+from AcATaMa.core.map import ComputedCache
+
+# occupancy indexes computed by map file, band, nodata and tile size
+OCCUPANCY_INDEX_CACHE = ComputedCache()
+
+
+class OccupancyIndex:
+    """Coarse index of the valid data of a map by square tiles of its pixel grid: the number of pixels
+    of each class in each tile (the valid pixels are the sum), to know which tiles have data without
+    reading them. The tiles are ordered by rows of tiles, from the top left
+    """
+
+    def __init__(self, tile_size, tiles_x, tiles_y, class_values, class_counts):
+        self.tile_size = tile_size
+        self.tiles_x = tiles_x
+        self.tiles_y = tiles_y
+        self.class_values = class_values
+        # pixels of each class (columns) in each tile (rows)
+        self.class_counts = class_counts
+        self.valid_counts = class_counts.sum(axis=1)
+
+    @property
+    def nbytes(self):
+        return self.class_counts.nbytes + self.valid_counts.nbytes
+
+    @classmethod
+    def build(cls, grid_map, tile_size):
+        """Build the index in one streaming pass over the rows of the map
+
+        Args:
+            grid_map (Map): the map, read by chunks of rows
+            tile_size (int): size in pixels of the tiles
+
+        Returns:
+            OccupancyIndex: the index of the map
+        """
+        _, _, _, _, _, _, width, height = grid_map.get_pixel_grid()
+        tiles_x, tiles_y = -(-width // tile_size), -(-height // tile_size)
+
+        counts_by_class = {}
+        for yoff, values in grid_map.read_rows_by_chunks():
+            valid = grid_map.valid_data_mask(values)
+            rows, cols = np.nonzero(valid)
+            if not rows.size:
+                continue
+            # only the rows of tiles of the chunk
+            first_tile_row = yoff // tile_size
+            chunk_tiles = ((yoff + len(values) - 1) // tile_size - first_tile_row + 1) * tiles_x
+            tile_ids = ((rows + yoff) // tile_size - first_tile_row) * tiles_x + cols // tile_size
+            chunk_class_values, class_ids = np.unique(np.trunc(values[valid]), return_inverse=True)
+            chunk_counts = np.bincount(
+                tile_ids * len(chunk_class_values) + class_ids.ravel(),
+                minlength=chunk_tiles * len(chunk_class_values),
+            ).reshape(chunk_tiles, len(chunk_class_values))
+            first_tile = first_tile_row * tiles_x
+            for class_idx, class_value in enumerate(chunk_class_values.tolist()):
+                if class_value not in counts_by_class:
+                    counts_by_class[class_value] = np.zeros(tiles_x * tiles_y, dtype=np.int64)
+                counts_by_class[class_value][first_tile : first_tile + chunk_tiles] += chunk_counts[:, class_idx]
+
+        class_values = np.array(sorted(counts_by_class), dtype=np.float64)
+        class_counts = (
+            np.stack([counts_by_class[class_value] for class_value in class_values.tolist()], axis=1)
+            if counts_by_class
+            else np.zeros((tiles_x * tiles_y, 0), dtype=np.int64)
+        )
+        return cls(tile_size, tiles_x, tiles_y, class_values, class_counts)
+
+    def tiles_with_data(self, pixel_values=None):
+        """Boolean mask of the tiles with valid pixels, or with pixels of any of the pixel values given"""
+        if pixel_values is None:
+            return self.valid_counts > 0
+        in_classes = np.isin(self.class_values, pixel_values)
+        return self.class_counts[:, in_classes].sum(axis=1) > 0
+
+
+def get_occupancy_index(grid_map, tile_size):
+    """Get the occupancy index of the map computed only once by the map file (while it is not
+    modified), band, nodata and tile size, None if the map can't be read by gdal
+    """
+    if grid_map.get_gdal_band() is None:
+        return None
+    try:
+        file_stat = os.stat(grid_map.file_path)
+        file_version = (file_stat.st_size, file_stat.st_mtime_ns)
+    except OSError:
+        file_version = None
+
+    return OCCUPANCY_INDEX_CACHE.get(
+        (grid_map.file_path, grid_map.band, grid_map.nodata, tile_size),
+        file_version,
+        lambda: OccupancyIndex.build(grid_map, tile_size),
+    )
@@ -0,0 +1,90 @@
+"""
+/***************************************************************************
+ AcATaMa
+                                 A QGIS plugin
+ AcATaMa is a Qgis plugin for Accuracy Assessment of Thematic Maps
+                              -------------------
+        copyright            : (C) 2017-2026 by Xavier C. Llano, SMByC
+        email                : xavier.corredor.llano@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+import numpy as np
+
+
+def get_runs_in_mask(mask):
+    """Get the runs of consecutive True pixels by row of the 2d boolean mask
+
+    Returns:
+        rows, start cols and lengths of the runs, ordered by row and col
+    """
+    edges = np.diff(np.pad(mask, ((0, 0), (1, 1))).astype(np.int8), axis=1)
+    rows, start_cols = np.nonzero(edges == 1)
+    end_cols = np.nonzero(edges == -1)[1]
+    return rows, start_cols, end_cols - start_cols
+
+
+class PixelIndex:
+    """Compact index of the eligible pixels of a map, saved as runs of consecutive pixels by
+    row, to draw uniform random points only inside the eligible pixels
+    """
+
+    def __init__(self, grid_map, run_rows, run_cols, run_lengths):
+        self.grid_map = grid_map
+        self.run_rows = run_rows
+        self.run_cols = run_cols
+        self.run_lengths = run_lengths
+        # cumulative number of pixels at the end of each run
+        self.run_ends = np.cumsum(run_lengths, dtype=np.int64)
+        self.total_pixels = int(self.run_ends[-1]) if self.run_ends.size else 0
+
+    @classmethod
+    def build(cls, grid_map, get_masks):
+        """Build the pixel indexes in one streaming pass over the rows of the grid map
+
+        Args:
+            grid_map (Map): the map that defines the pixel grid, read by chunks of rows
+            get_masks (callable): function that receives the first row of the chunk and the values
+                of the grid map, and returns a dict with the eligible pixels mask by each index key
+
+        Returns:
+            dict: the pixel index by each key
+        """
+        runs = {}
+        for yoff, values in grid_map.read_rows_by_chunks():
+            for key, mask in get_masks(yoff, values).items():
+                rows, cols, lengths = get_runs_in_mask(mask)
+                runs.setdefault(key, []).append(
+                    ((rows + yoff).astype(np.int32), cols.astype(np.int32), lengths.astype(np.int32))
+                )
+
+        return {
+            key: cls(grid_map, *(np.concatenate(runs_item) for runs_item in zip(*key_runs, strict=True)))
+            for key, key_runs in runs.items()
+        }
+
+    def draw(self, rng, size):
+        """Draw random points uniformly inside the eligible pixels, with a random position inside
+        the pixel so the points are continuous in space
+
+        Args:
+            rng (numpy.random.Generator): the random generator
+            size (int): number of points
+
+        Returns:
+            the arrays of x and y coordinates
+        """
+        pixel_ids = rng.integers(0, self.total_pixels, size)
+        runs = np.searchsorted(self.run_ends, pixel_ids, side="right")
+        cols = self.run_cols[runs] + (pixel_ids - (self.run_ends[runs] - self.run_lengths[runs]))
+        rows = self.run_rows[runs]
+        return self.grid_map.pixel_to_world(cols + rng.random(size), rows + rng.random(size))
@@ -21,18 +21,24 @@
 import random
 from math import floor
 
+import numpy as np
 from qgis.core import QgsGeometry, QgsPointXY, QgsRectangle
 from qgis.PyQt.sip import isdeleted
 
-from AcATaMa.utils.qgis_utils import valid_file_selected_in
-from AcATaMa.utils.sampling_utils import check_min_distance
 from AcATaMa.utils.system_utils import block_signals_to
 
 
 class Point:
     def __init__(self, x, y):
         self.QgsPnt = QgsPointXY(x, y)
-        self.QgsGeom = QgsGeometry.fromPointXY(self.QgsPnt)
+        self._QgsGeom = None
+
+    @property
+    def QgsGeom(self):
+        # the geometry is created only when it is needed
+        if self._QgsGeom is None:
+            self._QgsGeom = QgsGeometry.fromPointXY(self.QgsPnt)
+        return self._QgsGeom
 
 
 class RandomPoint(Point):
@@ -43,15 +49,16 @@ class RandomPoint(Point):
         super().__init__(x, y)
 
     @classmethod
-    def fromExtent(cls, extent):
+    def fromExtent(cls, extent, rng=random):
         """Generate the random x and y between boundaries
 
         Args:
             extent (QgsRectangle): extent boundaries for generate random points inside it
+            rng (random.Random): the random generator of the sampling, by default the global one
         """
         # statistical sampling positions, not a cryptographic use
-        rx = extent.xMinimum() + (extent.xMaximum() - extent.xMinimum()) * random.random()  # nosec B311
-        ry = extent.yMinimum() + (extent.yMaximum() - extent.yMinimum()) * random.random()  # nosec B311
+        rx = extent.xMinimum() + (extent.xMaximum() - extent.xMinimum()) * rng.random()  # nosec B311
+        ry = extent.yMinimum() + (extent.yMaximum() - extent.yMinimum()) * rng.random()  # nosec B311
         return cls(rx, ry)
 
     def in_valid_data(self, thematic_map):
@@ -62,6 +69,14 @@ class RandomPoint(Point):
             return False
         return point_value_in_thematic != thematic_map.nodata
 
+    def in_area_of_interest(self, aoi_mask):
+        """Check if the point is inside the area of interest, if any
+
+        Args:
+            aoi_mask (AOIMask)
+        """
+        return aoi_mask is None or bool(aoi_mask.contains([self.QgsPnt.x()], [self.QgsPnt.y()])[0])
+
     def in_extent(self, boundaries):
         """Check if the point is inside boundaries
 
@@ -70,13 +85,16 @@ class RandomPoint(Point):
         """
         return bool(self.QgsGeom.within(boundaries))
 
-    def in_mim_distance(self, index, min_distance, points):
+    def in_mim_distance(self, min_distance_grid):
         """Check if the point have at least the mim distance with respect
         to all points created at the moment
+
+        Args:
+            min_distance_grid (MinDistanceGrid): grid hash with the points created
         """
-        if min_distance == 0:
+        if min_distance_grid.min_distance == 0:
             return True
-        return check_min_distance(self.QgsPnt, index, min_distance, points)
+        return not min_distance_grid.is_close_to_points(np.array([self.QgsPnt.x()]), np.array([self.QgsPnt.y()]))[0]
 
     def in_post_stratification_map(self, classes_for_sampling, post_stratification_map):
         """Check if point is at least in one pixel values set in the post-stratification map"""
@@ -109,6 +127,13 @@ class RandomPoint(Point):
         """Check if the pixel have at least the minimum the neighbors with the
         same class of the pixel
         """
+        same_class_neighbors = thematic_map.read_same_class_neighbors(
+            np.array([self.QgsPnt.x()]), np.array([self.QgsPnt.y()]), num_neighbors
+        )
+        if same_class_neighbors is not None:
+            return int(same_class_neighbors[0]) > min_with_same_class
+
+        # fallback for sources not readable by gdal
         pixel_class_value = int(thematic_map.get_pixel_value_from_pnt(self.QgsPnt))
 
         pixel_size_x = thematic_map.qgs_layer.rasterUnitsPerPixelX()
@@ -134,15 +159,86 @@ class RandomPoint(Point):
         return neighbors.count(pixel_class_value) > min_with_same_class
 
 
-class LabelingPoint(Point):
-    def __init__(self, x, y, sample_id=None):
-        super().__init__(x, y)
+class LabelingPoints:
+    """Samples of the response design stored by columns in numpy arrays: the sample id, the
+    coordinates, the label button id (-1 without label) and the labeling status. The samples
+    are accessed through LabelingPoint views, created only when they are needed
+    """
+
+    def __init__(self, sample_ids, xs, ys):
+        self.sample_id = np.asarray(sample_ids)
+        self.x = np.asarray(xs, dtype=np.float64)
+        self.y = np.asarray(ys, dtype=np.float64)
+        self.label_id = np.full(len(self.x), -1, dtype=np.int64)
+        self.is_labeled = np.zeros(len(self.x), dtype=bool)
+
+    def __len__(self):
+        return len(self.x)
+
+    def __getitem__(self, idx):
+        """The sample in the position idx as a LabelingPoint view, negative positions as in a list"""
+        if not -len(self) <= idx < len(self):
+            raise IndexError("labeling point index out of range")
+        return LabelingPoint(self, idx % len(self))
+
+    def __iter__(self):
+        return (LabelingPoint(self, idx) for idx in range(len(self)))
+
+    def take(self, indices):
+        """New labeling points with the samples in the positions given, with their labels"""
+        indices = np.asarray(indices, dtype=np.int64)
+        labeling_points = LabelingPoints(self.sample_id[indices], self.x[indices], self.y[indices])
+        labeling_points.label_id = self.label_id[indices]
+        labeling_points.is_labeled = self.is_labeled[indices]
+        return labeling_points
+
+    def shuffle(self, rng=random):
+        """Shuffle the samples in place, the same permutation as rng.shuffle over a list of the samples"""
+        order = list(range(len(self)))
+        rng.shuffle(order)
+        for column in ("sample_id", "x", "y", "label_id", "is_labeled"):
+            setattr(self, column, getattr(self, column)[order])
+
+
+class LabelingPoint:
+    """View of one sample of the labeling points, the changes of the label are saved in the columns"""
+
+    def __init__(self, labeling_points, idx):
+        self.labeling_points = labeling_points
+        # position of the sample in the labeling points
+        self.idx = idx
+
+    @property
+    def QgsPnt(self):
+        return QgsPointXY(float(self.labeling_points.x[self.idx]), float(self.labeling_points.y[self.idx]))
+
+    @property
+    def QgsGeom(self):
+        return QgsGeometry.fromPointXY(self.QgsPnt)
+
+    @property
+    def sample_id(self):
         # shape id is the order of the points inside the shapefile
-        self.sample_id = sample_id
+        sample_id = self.labeling_points.sample_id[self.idx]
+        return sample_id.item() if isinstance(sample_id, np.generic) else sample_id
+
+    @property
+    def label_id(self):
         # label button id
-        self.label_id = None
-        # status for this point
-        self.is_labeled = False
+        label_id = int(self.labeling_points.label_id[self.idx])
+        return None if label_id == -1 else label_id
+
+    @label_id.setter
+    def label_id(self, label_id):
+        self.labeling_points.label_id[self.idx] = -1 if label_id is None else int(label_id)
+
+    @property
+    def is_labeled(self):
+        return bool(self.labeling_points.is_labeled[self.idx])
+
+    @is_labeled.setter
+    def is_labeled(self, is_labeled):
+        self.labeling_points.is_labeled[self.idx] = is_labeled
 
     def fit_to(self, view_widget, radius):
         if isdeleted(view_widget.render_widget.canvas):
@@ -154,33 +250,23 @@ class LabelingPoint(Point):
         with block_signals_to(view_widget.render_widget.canvas):
             view_widget.render_widget.set_extents_and_scalefactor(fit_extent)
 
-    def get_thematic_pixel_edges(self, with_buffer=0):
-        """Get the edges of the thematic pixel respectively of the current labeling point"""
-        from AcATaMa.gui.acatama_dockwidget import AcATaMaDockWidget as AcATaMa
+    def get_thematic_pixel_edges(self, thematic_map, with_buffer=0):
+        """Get the edges of the thematic pixel respectively of the current labeling point
 
-        if not valid_file_selected_in(AcATaMa.dockwidget.QCBox_ThematicMap):
-            return
-        thematic_layer = AcATaMa.dockwidget.QCBox_ThematicMap.currentLayer()
-        data_provider = thematic_layer.dataProvider()
-        if not data_provider.capabilities() or not data_provider.Size:
-            return
-        extent = data_provider.extent()
-        width = data_provider.xSize()
-        height = data_provider.ySize()
-        if not width or not height:
+        Args:
+            thematic_map (Map): the thematic map, its geotransform is computed once and reused
+            with_buffer (int): pixels to expand the edges around the pixel
+        """
+        if thematic_map is None:
             return
-        xres = extent.width() / width
-        yres = extent.height() / height
+        x_min, x_max, y_min, y_max, xres, yres, _, _ = thematic_map.get_pixel_grid()
 
-        if (
-            extent.xMinimum() <= self.QgsPnt.x() <= extent.xMaximum()
-            and extent.yMinimum() <= self.QgsPnt.y() <= extent.yMaximum()
-        ):
-            col = floor((self.QgsPnt.x() - extent.xMinimum()) / xres)
-            row = floor((extent.yMaximum() - self.QgsPnt.y()) / yres)
-            xmin = extent.xMinimum() + col * xres - with_buffer * xres
+        if x_min <= self.QgsPnt.x() <= x_max and y_min <= self.QgsPnt.y() <= y_max:
+            col = floor((self.QgsPnt.x() - x_min) / xres)
+            row = floor((y_max - self.QgsPnt.y()) / yres)
+            xmin = x_min + col * xres - with_buffer * xres
             xmax = xmin + xres + 2 * (with_buffer * xres)
-            ymax = extent.yMaximum() - row * yres + with_buffer * yres
+            ymax = y_max - row * yres + with_buffer * yres
             ymin = ymax - yres - 2 * (with_buffer * yres)
 
             return xmin, xmax, ymin, ymax
@@ -18,16 +18,27 @@
  ***************************************************************************/
 """
 
-from random import shuffle
+from itertools import compress
 from typing import ClassVar
 
-from qgis.core import Qgis, QgsFeature, QgsField, QgsProject, QgsVectorFileWriter, QgsVectorLayer
+import numpy as np
+from osgeo import ogr
+from qgis.core import (
+    Qgis,
+    QgsFeature,
+    QgsFeatureRequest,
+    QgsField,
+    QgsProject,
+    QgsProviderRegistry,
+    QgsVectorFileWriter,
+    QgsVectorLayer,
+)
 from qgis.PyQt.QtCore import NULL, QVariant
 from qgis.PyQt.QtGui import QColor
 from qgis.utils import iface
 
 from AcATaMa.core.map import Map
-from AcATaMa.core.point import LabelingPoint
+from AcATaMa.core.point import LabelingPoints
 from AcATaMa.utils.others_utils import get_nodata_format
 from AcATaMa.utils.system_utils import wait_process
 
@@ -41,9 +52,11 @@ class ResponseDesign:
         # for store the label buttons properties
         # {label_id: {"name", "color", "thematic_class"}}
         self.buttons_config = None
-        # get all points from the layer
+        # get all points from the layer, in random order
         self.num_points = None
-        self.points = self.get_points_from_shapefile()
+        points = self.get_points_from_shapefile()
+        points.shuffle()
+        self.points = points
         # save and init the current sample index
         self.current_sample_idx = 0
         # grid config
@@ -92,11 +105,29 @@ class ResponseDesign:
         self.ccd_plugin_opened = False
         self.ccd_plugin_config = None
 
-        # shuffle the list items
-        shuffle(self.points)
         # save instance
         ResponseDesign.instances[sampling_layer] = self
 
+    @property
+    def points(self):
+        return self._points
+
+    @points.setter
+    def points(self, points):
+        self._points = points
+        # position of the samples by sample id
+        self.sample_idx_by_id = get_sample_idx_by_id(points)
+
+    def get_next_sample_not_labeled(self, sample_idx):
+        """Position of the first sample not labeled after the position given, None if all are labeled"""
+        not_labeled = ~self.points.is_labeled[sample_idx + 1 :]
+        return sample_idx + 1 + int(np.argmax(not_labeled)) if not_labeled.any() else None
+
+    def get_previous_sample_not_labeled(self, sample_idx):
+        """Position of the last sample not labeled before the position given, None if all are labeled"""
+        not_labeled = ~self.points.is_labeled[: max(sample_idx, 0)]
+        return sample_idx - 1 - int(np.argmax(not_labeled[::-1])) if not_labeled.any() else None
+
     def label_the_current_sample(self, label_id):
         current_sample = self.points[self.current_sample_idx]
         if label_id:  # label with valid integer class
@@ -114,21 +145,13 @@ class ResponseDesign:
         self.is_completed = self.total_unlabel == 0
 
     def reload_labeling_status(self):
-        self.total_labeled = sum(sample.is_labeled for sample in self.points)
-        self.total_unlabel = sum(not sample.is_labeled for sample in self.points)
+        self.total_labeled = int(np.count_nonzero(self.points.is_labeled))
+        self.total_unlabel = len(self.points) - self.total_labeled
         self.is_completed = self.total_unlabel == 0
 
     def get_points_from_shapefile(self):
-        points = []
-        for enum_id, qgs_feature in enumerate(self.sampling_layer.getFeatures(), start=1):
-            geom = qgs_feature.geometry()
-            if not geom.isGeosValid():
-                continue
-            # get the id from shape file using column name "id" else use auto-enumeration
-            attr_id = self.sampling_layer.fields().lookupField("id")
-            sample_id = qgs_feature.attributes()[attr_id] if attr_id != -1 else enum_id
-            x, y = geom.asPoint()
-            points.append(LabelingPoint(x, y, sample_id))
+        sample_ids, xs, ys = read_sampling_points(self.sampling_layer)
+        points = LabelingPoints(sample_ids, xs, ys)
         self.num_points = len(points)
         return points
 
@@ -138,22 +161,34 @@ class ResponseDesign:
 
         # update all points from file and restore its labels
         points_from_shapefile = self.get_points_from_shapefile()
-        modified = 0
-        for point in self.points:
-            if point.sample_id in [p.sample_id for p in points_from_shapefile]:
-                point_to_restore = next(p for p in points_from_shapefile if p.sample_id == point.sample_id)
-                point_to_restore.label_id = point.label_id
-                if point_to_restore.label_id is not None:
-                    point_to_restore.is_labeled = True
-                if point.QgsPnt != point_to_restore.QgsPnt:
-                    modified += 1
+        sample_idx_from_shapefile = get_sample_idx_by_id(points_from_shapefile)
+        # the positions of the samples in both, by sample id
+        samples_in_both = np.array(
+            [
+                (sample_idx, sample_idx_from_shapefile[sample_id])
+                for sample_id, sample_idx in self.sample_idx_by_id.items()
+                if sample_id in sample_idx_from_shapefile
+            ],
+            dtype=np.int64,
+        ).reshape(-1, 2)
+        points_idx, points_from_shapefile_idx = samples_in_both[:, 0], samples_in_both[:, 1]
+        points_from_shapefile.label_id[points_from_shapefile_idx] = self.points.label_id[points_idx]
+        points_from_shapefile.is_labeled[points_from_shapefile_idx] = self.points.label_id[points_idx] != -1
+        # same point as QgsPointXY comparison
+        modified = int(
+            np.count_nonzero(
+                (np.abs(self.points.x[points_idx] - points_from_shapefile.x[points_from_shapefile_idx]) > 1e-8)
+                | (np.abs(self.points.y[points_idx] - points_from_shapefile.y[points_from_shapefile_idx]) > 1e-8)
+            )
+        )
         # calc added/removed changes
-        added = len({p.sample_id for p in points_from_shapefile} - {p.sample_id for p in self.points})
-        removed = len({p.sample_id for p in self.points} - {p.sample_id for p in points_from_shapefile})
+        added = len(sample_idx_from_shapefile.keys() - self.sample_idx_by_id.keys())
+        removed_sample_ids = self.sample_idx_by_id.keys() - sample_idx_from_shapefile.keys()
+        removed = len(removed_sample_ids)
         # adjust the current sample id if some points are eliminated, and it's located before it
-        for rm_sample_id in {p.sample_id for p in self.points} - {p.sample_id for p in points_from_shapefile}:
-            if [p.sample_id for p in self.points].index(rm_sample_id) <= self.current_sample_idx:
-                self.current_sample_idx -= 1
+        self.current_sample_idx -= sum(
+            self.sample_idx_by_id[rm_sample_id] <= self.current_sample_idx for rm_sample_id in removed_sample_ids
+        )
         # check if sampling has not changed
         if modified == 0 and added == 0 and removed == 0:
             iface.messageBar().pushMessage(
@@ -237,3 +272,105 @@ class ResponseDesign:
         QgsVectorFileWriter.writeAsVectorFormatV3(
             vlayer, file_out, QgsProject.instance().transformContext(), save_options
         )
+
+
+def get_sample_idx_by_id(points):
+    """Position of the samples of the labeling points by sample id, the first one if the id is repeated"""
+    sample_ids = points.sample_id.tolist()
+    return dict(zip(reversed(sample_ids), range(len(sample_ids) - 1, -1, -1), strict=True))
+
+
+def read_sampling_points(sampling_layer):
+    """Sample ids and coordinates of the points of the sampling layer, the id from the field "id"
+    else the order of the feature in the layer (from 1), without the features with no valid point
+
+    Returns:
+        (ndarray, ndarray, ndarray): the sample ids, xs and ys of the points
+    """
+    points = read_sampling_points_with_ogr(sampling_layer) if sampling_layer.providerType() == "ogr" else None
+    if points is not None:
+        return points
+
+    # fallback for the sources not readable in bulk by ogr
+    attr_id = sampling_layer.fields().lookupField("id")
+    request = QgsFeatureRequest().setSubsetOfAttributes([attr_id] if attr_id != -1 else [])
+    sample_ids, xs, ys = [], [], []
+    for enum_id, qgs_feature in enumerate(sampling_layer.getFeatures(request), start=1):
+        geom = qgs_feature.geometry()
+        if not geom.isGeosValid():
+            continue
+        x, y = geom.asPoint()
+        sample_ids.append(qgs_feature.attributes()[attr_id] if attr_id != -1 else enum_id)
+        xs.append(x)
+        ys.append(y)
+    return np.array(sample_ids), np.array(xs, dtype=np.float64), np.array(ys, dtype=np.float64)
+
+
+def read_sampling_points_with_ogr(sampling_layer):
+    """Read the sample ids and the points of the sampling layer in one bulk read by arrow batches
+    with ogr, None if the layer can't be read in this way
+    """
+    if sampling_layer.subsetString() or not hasattr(ogr.Layer, "GetArrowStreamAsNumPy"):
+        return None
+    uri = QgsProviderRegistry.instance().decodeUri("ogr", sampling_layer.source())
+    dataset = ogr.Open(uri.get("path", ""))
+    if dataset is None:
+        return None
+    if uri.get("layerName"):
+        layer = dataset.GetLayerByName(uri["layerName"])
+    else:
+        layer = dataset.GetLayer(uri.get("layerId") or 0)
+    if layer is None:
+        return None
+
+    # only the id field and the geometry
+    layer_definition = layer.GetLayerDefn()
+    field_names = [layer_definition.GetFieldDefn(idx).GetName() for idx in range(layer_definition.GetFieldCount())]
+    id_field = next((name for name in field_names if name.lower() == "id"), None)
+    layer.SetIgnoredFields([name for name in field_names if name != id_field])
+    geometry_column = layer.GetGeometryColumn() or "wkb_geometry"
+
+    sample_ids, xs, ys = [], [], []
+    enum_start = 1
+    for batch in layer.GetArrowStreamAsNumPy(options=["USE_MASKED_ARRAYS=NO"]):
+        if geometry_column not in batch:
+            return None
+        batch_xs, batch_ys = get_points_from_wkb(batch[geometry_column])
+        valid = np.isfinite(batch_xs) & np.isfinite(batch_ys)
+        if id_field is not None:
+            sample_ids.append(np.asarray(batch[id_field])[valid])
+        else:
+            sample_ids.append(np.arange(enum_start, enum_start + len(valid), dtype=np.int64)[valid])
+        xs.append(batch_xs[valid])
+        ys.append(batch_ys[valid])
+        enum_start += len(valid)
+    if not xs:
+        return np.array([], dtype=np.int64), np.array([], dtype=np.float64), np.array([], dtype=np.float64)
+    return np.concatenate(sample_ids), np.concatenate(xs), np.concatenate(ys)
+
+
+def get_points_from_wkb(wkbs):
+    """Coordinates of the points in wkb, nan for the null, empty or not point geometries. The 2D points
+    in little endian (as the sampling files) are read all at once
+    """
+    xs = np.full(len(wkbs), np.nan)
+    ys = np.full(len(wkbs), np.nan)
+    is_2d_point = np.array(
+        [wkb is not None and len(wkb) == 21 and bytes(wkb[:5]) == b"\x01\x01\x00\x00\x00" for wkb in wkbs],
+        dtype=bool,
+    )
+    if is_2d_point.any():
+        points = np.frombuffer(
+            b"".join(bytes(wkb) for wkb in compress(wkbs, is_2d_point)),
+            dtype=np.dtype([("header", "V5"), ("x", "<f8"), ("y", "<f8")]),
+        )
+        xs[is_2d_point] = points["x"]
+        ys[is_2d_point] = points["y"]
+    for idx in np.flatnonzero(~is_2d_point):
+        if wkbs[idx] is None:
+            continue
+        geometry = ogr.CreateGeometryFromWkb(bytes(wkbs[idx]))
+        if geometry is None or geometry.IsEmpty() or ogr.GT_Flatten(geometry.GetGeometryType()) != ogr.wkbPoint:
+            continue
+        xs[idx], ys[idx] = geometry.GetX(), geometry.GetY()
+    return xs, ys
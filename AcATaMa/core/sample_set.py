@@ -0,0 +1,133 @@
+"""
+/***************************************************************************
+ AcATaMa
+                                 A QGIS plugin
+ AcATaMa is a Qgis plugin for Accuracy Assessment of Thematic Maps
+                              -------------------
+        copyright            : (C) 2017-2026 by Xavier C. Llano, SMByC
+        email                : xavier.corredor.llano@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+from typing import ClassVar
+
+import numpy as np
+from qgis.core import QgsPointXY
+
+
+class SampleSet:
+    """Samples of a sampling stored by columns in numpy arrays (struct of arrays), shared by the
+    sampling, the writer and the sampling report. The QGIS points are created only when they are
+    requested, one sample at a time
+
+    Columns:
+        x, y: coordinates of the samples in the crs of the thematic map
+        id: id of the sample in the sampling file, from 1 in the order of the set
+        stratum: index of the stratum in the classes for sampling, -1 if the sampling is not stratified
+        thematic_value: pixel value in the thematic map, nan if it is nodata or outside
+        flags: bits of state of the samples for the users of the set
+    """
+
+    COLUMNS: ClassVar[dict] = {
+        "x": np.float64,
+        "y": np.float64,
+        "id": np.int64,
+        "stratum": np.int32,
+        "thematic_value": np.float64,
+        "flags": np.uint8,
+    }
+
+    def __init__(self, capacity=1024):
+        self.size = 0
+        self._columns = {name: np.empty(max(capacity, 1), dtype=dtype) for name, dtype in self.COLUMNS.items()}
+
+    def __len__(self):
+        return self.size
+
+    # the columns as views of the samples in the set
+    @property
+    def x(self):
+        return self._columns["x"][: self.size]
+
+    @property
+    def y(self):
+        return self._columns["y"][: self.size]
+
+    @property
+    def id(self):
+        return self._columns["id"][: self.size]
+
+    @property
+    def stratum(self):
+        return self._columns["stratum"][: self.size]
+
+    @property
+    def thematic_value(self):
+        return self._columns["thematic_value"][: self.size]
+
+    @property
+    def flags(self):
+        return self._columns["flags"][: self.size]
+
+    def _reserve(self, size):
+        capacity = len(self._columns["x"])
+        if size <= capacity:
+            return
+        capacity = max(size, 2 * capacity)
+        for name, column in self._columns.items():
+            new_column = np.empty(capacity, dtype=column.dtype)
+            new_column[: self.size] = column[: self.size]
+            self._columns[name] = new_column
+
+    def append(self, x, y, stratum=-1):
+        self.extend([x], [y], stratum)
+
+    def extend(self, xs, ys, strata=-1):
+        """Add the samples at the end of the set, with consecutive ids, the strata is an array
+        with the stratum of each sample or the same stratum for all
+        """
+        num_samples = len(xs)
+        if num_samples == 0:
+            return
+        start, end = self.size, self.size + num_samples
+        self._reserve(end)
+        self._columns["x"][start:end] = xs
+        self._columns["y"][start:end] = ys
+        self._columns["id"][start:end] = np.arange(start + 1, end + 1)
+        self._columns["stratum"][start:end] = strata
+        self._columns["thematic_value"][start:end] = np.nan
+        self._columns["flags"][start:end] = 0
+        self.size = end
+
+    def shuffle(self, rng):
+        """Shuffle the samples with the random generator, the same permutation as rng.shuffle over
+        a list of the samples, and renumber the ids in the new order
+        """
+        order = list(range(self.size))
+        rng.shuffle(order)
+        order = np.array(order, dtype=np.int64)
+        for column in self._columns.values():
+            column[: self.size] = column[: self.size][order]
+        self._columns["id"][: self.size] = np.arange(1, self.size + 1)
+
+    def read_thematic_values(self, thematic_map):
+        """Fill the thematic values of all samples reading the thematic map in one pass"""
+        self._columns["thematic_value"][: self.size] = thematic_map.read_values(self.x, self.y)
+
+    def point(self, idx):
+        return QgsPointXY(float(self._columns["x"][idx]), float(self._columns["y"][idx]))
+
+    def values(self):
+        """The points of the samples in the order of the set, created one at a time"""
+        return (self.point(idx) for idx in range(self.size))
+
+    __iter__ = values
@@ -21,42 +21,107 @@
 import math
 import os
 import random
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 import numpy as np
 from qgis.core import (
     Qgis,
-    QgsApplication,
-    QgsFeature,
-    QgsField,
-    QgsFields,
     QgsGeometry,
-    QgsProject,
-    QgsSpatialIndex,
-    QgsTask,
     QgsUnitTypes,
-    QgsVectorFileWriter,
 )
-from qgis.PyQt.QtCore import QVariant
+from qgis.PyQt.QtCore import QSettings
+from qgis.PyQt.QtWidgets import QMessageBox
 
+from AcATaMa.core.aoi_mask import get_aoi_mask
 from AcATaMa.core.map import Map
+from AcATaMa.core.occupancy_index import get_occupancy_index
+from AcATaMa.core.pixel_index import PixelIndex
 from AcATaMa.core.point import RandomPoint
 from AcATaMa.core.response_design import ResponseDesign
+from AcATaMa.core.sample_set import SampleSet
+from AcATaMa.core.sampling_queue import SamplingJobQueue
+from AcATaMa.core.sampling_writer import SamplingFileWriter
 from AcATaMa.gui.sampling_report import SamplingReport
-from AcATaMa.utils.others_utils import get_epsilon, get_nodata_format
+from AcATaMa.utils.others_utils import (
+    get_approximate_pixel_count_by_pixel_values,
+    get_epsilon,
+    get_nodata_format,
+    get_pixel_count_by_pixel_values,
+    pixel_count_tasks,
+)
 from AcATaMa.utils.qgis_utils import get_source_from, load_and_select_layer_in, valid_file_selected_in
+from AcATaMa.utils.sampling_utils import MinDistanceGrid, draw_random_floats, fill_stratified_sampling_table
 from AcATaMa.utils.system_utils import error_handler, get_save_file_name, output_file_is_OK
 
+# engines to generate the random sampling points, the rejection engine is the reference one
+# and with the same random seed it reproduces the samplings made by previous versions
+SAMPLING_ENGINES = {
+    "rejection": "Rejection over the extent (reference)",
+    "pixel_index": "Valid pixel index (sparse maps)",
+    "tiles": "Parallel tiles (multi-core)",
+}
+
+# size in pixels of the tiles of the thematic map for the parallel tiles engine
+SAMPLING_TILE_SIZE = 1024
+
+
+def get_sampling_workers():
+    """Number of threads for the parallel sampling, it can be tuned per machine with the
+    QGIS setting "AcATaMa/sampling_workers", by default the number of CPU cores
+    """
+    return max(QSettings().value("AcATaMa/sampling_workers", os.cpu_count() or 1, type=int), 1)
+
+
+def get_systematic_total_of_samples(
+    thematic_map_layer, band, nodata, points_spacing, systematic_sampling_unit, approximate=False
+):
+    """Estimate of the total of samples of the systematic sampling based on the valid pixels of the
+    thematic map and the points spacing, None if it can't be estimated. With approximate the nodata
+    pixels are estimated from the overviews or a subsample of the thematic map (for previews)
+    """
+    point_spacing_by_pixel = points_spacing / (
+        thematic_map_layer.rasterUnitsPerPixelX() if systematic_sampling_unit == "Distance" else 1
+    )
+    # total number of pixels
+    total_pixels = thematic_map_layer.width() * thematic_map_layer.height()
+    # total valid pixels
+    if nodata is not None:
+        if approximate:
+            pixel_count = get_approximate_pixel_count_by_pixel_values(thematic_map_layer, band, [nodata])[0]
+        else:
+            pixel_count = get_pixel_count_by_pixel_values(thematic_map_layer, band, None, None)
+        total_nodata_pixels = pixel_count[nodata]
+        total_valid_pixels = total_pixels - total_nodata_pixels
+    else:
+        total_valid_pixels = total_pixels
+
+    try:
+        max_samples = ((total_valid_pixels**0.5) / point_spacing_by_pixel + 1) ** 2
+    except ZeroDivisionError:
+        return None
+    if max_samples < 2147483647:
+        return round(max_samples)
+
+
+def get_area_of_interest(sampling_design, thematic_map):
+    """The mask of the area of interest of the sampling design window rasterized onto the thematic map,
+    in the main thread before the sampling task, None if the area of interest is not enabled
+    """
+    if not sampling_design.QGBox_AreaOfInterest.isChecked():
+        return None
+    aoi_layer = sampling_design.QCBox_AreaOfInterest.currentLayer()
+    if aoi_layer is None or not aoi_layer.isValid():
+        raise ValueError("Error, the area of interest option is enabled but the polygon layer is not selected")
+    feature_filter = sampling_design.AreaOfInterest_FeatureFilter.text().strip()
+    return get_aoi_mask(aoi_layer, thematic_map, feature_filter or None)
+
 
 def do_simple_random_sampling():
     from AcATaMa.gui.acatama_dockwidget import AcATaMaDockWidget as AcATaMa
 
     sampling_design = AcATaMa.dockwidget.sampling_design_window
 
-    # check if the sampling is processing
-    if sampling_design.QPBtn_GenerateSamples_SimpRS.text() == "FINISH":
-        globals()["sampling_task"].cancel()
-        return
-
     # first check input files requirements
     if not valid_file_selected_in(AcATaMa.dockwidget.QCBox_ThematicMap, "thematic map"):
         return
@@ -78,6 +143,13 @@ def do_simple_random_sampling():
     total_of_samples = int(sampling_design.numberOfSamples_SimpRS.value())
     min_distance = float(sampling_design.minDistance_SimpRS.value())
 
+    # the area of interest to sample only inside it
+    try:
+        aoi_mask = get_area_of_interest(sampling_design, thematic_map)
+    except ValueError as err:
+        sampling_design.MsgBar.pushMessage(str(err), level=Qgis.MessageLevel.Warning, duration=10)
+        return
+
     # post-stratification of the simple random sampling
     if sampling_design.QGBox_SimpRSwithPS.isChecked():
         post_stratification_map = Map(
@@ -118,7 +190,7 @@ def do_simple_random_sampling():
         sampling_design,
         "Select the output file to save the sampling",
         suggested_filename,
-        "GeoPackage files (*.gpkg);;Shape files (*.shp);;All files (*.*)",
+        "GeoPackage files (*.gpkg);;Shape files (*.shp);;FlatGeobuf files (*.fgb);;All files (*.*)",
     )
 
     if not output_file_is_OK(output_file):
@@ -136,17 +208,19 @@ def do_simple_random_sampling():
             pass
     else:
         random_seed = None
+    # define the engine to generate the random points
+    if sampling_design.QGBox_random_sampling_options_SimpRS.isChecked():
+        sampling_engine = sampling_design.QCBox_SamplingEngine_SimpRS.currentData()
+    else:
+        sampling_engine = "rejection"
 
-    # before process
-    sampling_design.QPBtn_GenerateSamples_SimpRS.setText("FINISH")
-    sampling_design.QPBtn_GenerateSamples_SimpRS.setStyleSheet("background-color: red")
-    sampling_design.widget_RandomSampling.setEnabled(False)
-    sampling_design.QGBox_neighbour_aggregation_SimpRS.setEnabled(False)
-    sampling_design.QGBox_random_sampling_options_SimpRS.setEnabled(False)
-
-    # process the sampling in a QGIS task
+    # process the sampling in a QGIS task through the sampling jobs queue
     sampling = Sampling(
-        "simple", thematic_map, post_stratification_map=post_stratification_map, output_file=output_file
+        "simple",
+        thematic_map,
+        post_stratification_map=post_stratification_map,
+        output_file=output_file,
+        aoi_mask=aoi_mask,
     )
     sampling_conf = {
         "sampling_type": "simple",
@@ -155,19 +229,16 @@ def do_simple_random_sampling():
         "classes_selected": classes_selected,
         "neighbor_aggregation": neighbor_aggregation,
         "random_seed": random_seed,
+        "sampling_engine": sampling_engine,
+        "area_of_interest": aoi_mask.name if aoi_mask else None,
     }
-    globals()["sampling_task"] = QgsTask.fromFunction(
-        "Simple random sampling",
+    sampling_job = SamplingJobQueue.instance().add_job(
+        f"Simple random sampling: {os.path.basename(output_file)}",
         sampling.generate_sampling_points,
-        on_finished=simple_random_sampling_finished,
-        sampling_conf=sampling_conf,
+        sampling_conf,
+        simple_random_sampling_finished,
     )
-
-    globals()["sampling_task"].progressChanged.connect(
-        lambda value: sampling_design.QPBar_GenerateSamples_SimpRS.setValue(math.ceil(total_of_samples * value / 100))
-    )
-
-    QgsApplication.taskManager().addTask(globals()["sampling_task"])
+    sampling_design.track_sampling_job(sampling_job, sampling_design.QPBar_GenerateSamples_SimpRS, total_of_samples)
 
 
 @error_handler
@@ -176,14 +247,6 @@ def simple_random_sampling_finished(exception, result=None):
 
     sampling_design = AcATaMa.dockwidget.sampling_design_window
 
-    # restoring
-    sampling_design.QPBtn_GenerateSamples_SimpRS.setText("Generate samples")
-    sampling_design.QPBtn_GenerateSamples_SimpRS.setStyleSheet("")
-    sampling_design.widget_RandomSampling.setEnabled(True)
-    sampling_design.QGBox_neighbour_aggregation_SimpRS.setEnabled(True)
-    sampling_design.QGBox_random_sampling_options_SimpRS.setEnabled(True)
-    sampling_design.QPBar_GenerateSamples_SimpRS.setValue(0)
-
     if exception is not None or result is None:
         raise Exception(f"Error in sampling process: {exception}")
 
@@ -251,11 +314,6 @@ def do_stratified_random_sampling():
 
     sampling_design = AcATaMa.dockwidget.sampling_design_window
 
-    # check if the sampling is processing
-    if sampling_design.QPBtn_GenerateSamples_StraRS.text() == "FINISH":
-        globals()["sampling_task"].cancel()
-        return
-
     # first check input files requirements
     if not valid_file_selected_in(AcATaMa.dockwidget.QCBox_ThematicMap, "thematic map"):
         return
@@ -275,6 +333,43 @@ def do_stratified_random_sampling():
     )
     min_distance = float(sampling_design.minDistance_StraRS.value())
 
+    # the area of interest to sample only inside it
+    try:
+        aoi_mask = get_area_of_interest(sampling_design, thematic_map)
+    except ValueError as err:
+        sampling_design.MsgBar.pushMessage(str(err), level=Qgis.MessageLevel.Warning, duration=10)
+        return
+
+    # the table is only a preview with the approximate pixel count until the exact count finishes
+    if (sampling_map.qgs_layer, sampling_map.band, sampling_map.nodata) in pixel_count_tasks:
+        sampling_design.MsgBar.pushMessage(
+            "The pixels of the sampling map are being counted, wait until it finishes to generate the samples",
+            level=Qgis.MessageLevel.Warning,
+            duration=10,
+        )
+        return
+    # the preview table is not saved in the srs tables, the exact count was canceled or failed
+    srs_method = (
+        "fixed values"
+        if sampling_design.QCBox_StraRS_Method.currentText().startswith("Fixed values")
+        else "area based proportion"
+    )
+    if sampling_design.QTableW_StraRS.rowCount() > 0 and srs_method not in sampling_design.srs_tables.get(
+        sampling_design.QCBox_SamplingMap_StraRS.currentText(), {}
+    ):
+        reply = QMessageBox.question(
+            None,
+            "The pixel count of the sampling map is not completed",
+            "The stratified sampling table is a preview with the approximate pixel count, the exact count "
+            "of the pixels of the sampling map was canceled or failed.\n\nDo you want to count them again?",
+            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
+            QMessageBox.StandardButton.Yes,
+        )
+        if reply == QMessageBox.StandardButton.Yes:
+            # restart the count in background, the table is filled again when it finishes
+            fill_stratified_sampling_table()
+        return
+
     # get values from category table  #########
     classes_for_sampling = []
     total_of_samples_by_stratum = []
@@ -331,7 +426,7 @@ def do_stratified_random_sampling():
         sampling_design,
         "Select the output file to save the sampling",
         suggested_filename,
-        "GeoPackage files (*.gpkg);;Shape files (*.shp);;All files (*.*)",
+        "GeoPackage files (*.gpkg);;Shape files (*.shp);;FlatGeobuf files (*.fgb);;All files (*.*)",
     )
 
     if not output_file_is_OK(output_file):
@@ -349,16 +444,13 @@ def do_stratified_random_sampling():
             pass
     else:
         random_seed = None
+    # define the engine to generate the random points
+    if sampling_design.QGBox_random_sampling_options_StraRS.isChecked():
+        sampling_engine = sampling_design.QCBox_SamplingEngine_StraRS.currentData()
+    else:
+        sampling_engine = "rejection"
 
-    # before process
-    sampling_design.QPBtn_GenerateSamples_StraRS.setText("FINISH")
-    sampling_design.QPBtn_GenerateSamples_StraRS.setStyleSheet("background-color: red")
-    sampling_design.widget_StratifiedSampling.setEnabled(False)
-    sampling_design.widget_minDistance_StraRS.setEnabled(False)
-    sampling_design.QGBox_neighbour_aggregation_StraRS.setEnabled(False)
-    sampling_design.QGBox_random_sampling_options_StraRS.setEnabled(False)
-
-    # process the sampling in a QGIS task
+    # process the sampling in a QGIS task through the sampling jobs queue
     sampling = Sampling(
         "stratified",
         thematic_map,
@@ -366,6 +458,7 @@ def do_stratified_random_sampling():
         sampling_method=sampling_method,
         srs_config=srs_config,
         output_file=output_file,
+        aoi_mask=aoi_mask,
     )
     sampling_conf = {
         "sampling_type": "stratified",
@@ -374,19 +467,16 @@ def do_stratified_random_sampling():
         "classes_selected": classes_for_sampling,
         "neighbor_aggregation": neighbor_aggregation,
         "random_seed": random_seed,
+        "sampling_engine": sampling_engine,
+        "area_of_interest": aoi_mask.name if aoi_mask else None,
     }
-    globals()["sampling_task"] = QgsTask.fromFunction(
-        "Stratified random sampling",
+    sampling_job = SamplingJobQueue.instance().add_job(
+        f"Stratified random sampling: {os.path.basename(output_file)}",
         sampling.generate_sampling_points,
-        on_finished=stratified_random_sampling_finished,
-        sampling_conf=sampling_conf,
+        sampling_conf,
+        stratified_random_sampling_finished,
     )
-
-    globals()["sampling_task"].progressChanged.connect(
-        lambda value: sampling_design.QPBar_GenerateSamples_StraRS.setValue(math.ceil(total_of_samples * value / 100))
-    )
-
-    QgsApplication.taskManager().addTask(globals()["sampling_task"])
+    sampling_design.track_sampling_job(sampling_job, sampling_design.QPBar_GenerateSamples_StraRS, total_of_samples)
 
 
 @error_handler
@@ -395,15 +485,6 @@ def stratified_random_sampling_finished(exception, result=None):
 
     sampling_design = AcATaMa.dockwidget.sampling_design_window
 
-    # restoring
-    sampling_design.QPBtn_GenerateSamples_StraRS.setText("Generate samples")
-    sampling_design.QPBtn_GenerateSamples_StraRS.setStyleSheet("")
-    sampling_design.widget_StratifiedSampling.setEnabled(True)
-    sampling_design.widget_minDistance_StraRS.setEnabled(True)
-    sampling_design.QGBox_neighbour_aggregation_StraRS.setEnabled(True)
-    sampling_design.QGBox_random_sampling_options_StraRS.setEnabled(True)
-    sampling_design.QPBar_GenerateSamples_StraRS.setValue(0)
-
     if exception is not None or result is None:
         raise Exception(f"Error in sampling process: {exception}")
 
@@ -471,11 +552,6 @@ def do_systematic_sampling():
 
     sampling_design = AcATaMa.dockwidget.sampling_design_window
 
-    # check if the sampling is processing
-    if sampling_design.QPBtn_GenerateSamples_SystS.text() == "FINISH":
-        globals()["sampling_task"].cancel()
-        return
-
     # first check input files requirements
     if not valid_file_selected_in(AcATaMa.dockwidget.QCBox_ThematicMap, "thematic map"):
         return
@@ -499,6 +575,13 @@ def do_systematic_sampling():
     total_of_samples = sampling_design.QPBar_GenerateSamples_SystS.maximum()
     systematic_sampling_unit = sampling_design.QCBox_Systematic_Sampling_Unit.currentText()
 
+    # the area of interest to sample only inside it
+    try:
+        aoi_mask = get_area_of_interest(sampling_design, thematic_map)
+    except ValueError as err:
+        sampling_design.MsgBar.pushMessage(str(err), level=Qgis.MessageLevel.Warning, duration=10)
+        return
+
     # post-stratification of the systematic sampling
     if sampling_design.QGBox_SystSwithPS.isChecked():
         post_stratification_map = Map(
@@ -539,7 +622,7 @@ def do_systematic_sampling():
         sampling_design,
         "Select the output file to save the sampling",
         suggested_filename,
-        "GeoPackage files (*.gpkg);;Shape files (*.shp);;All files (*.*)",
+        "GeoPackage files (*.gpkg);;Shape files (*.shp);;FlatGeobuf files (*.fgb);;All files (*.*)",
     )
 
     if not output_file_is_OK(output_file):
@@ -560,31 +643,22 @@ def do_systematic_sampling():
 
     # define the initial inset
     if sampling_design.QCBox_InitialInsetMode_SystS.currentText() == "Random":
-        random.seed(random_seed)
-        initial_inset = random.uniform(0, points_spacing)  # nosec B311 - statistical sampling
+        # own random generator, without changing the global random state
+        initial_inset = random.Random(random_seed).uniform(0, points_spacing)  # nosec B311 - statistical sampling
     else:
         initial_inset = float(sampling_design.InitialInsetFixed_SystS.value())
 
     # get the confidence level for per-pixel coverage (used to compute max tries in offset area)
     confidence_level = float(sampling_design.CL_PerPixelCoverage.currentText().replace("%", "")) / 100
 
-    # before process
-    sampling_design.QPBtn_GenerateSamples_SystS.setText("FINISH")
-    sampling_design.QPBtn_GenerateSamples_SystS.setStyleSheet("background-color: red")
-    sampling_design.widget_SystS_step0.setEnabled(False)
-    sampling_design.widget_SystS_step1.setEnabled(False)
-    sampling_design.widget_SystS_step2.setEnabled(False)
-    sampling_design.QGBox_SystSwithPS.setEnabled(False)
-    sampling_design.QGBox_neighbour_aggregation_SystS.setEnabled(False)
-    sampling_design.QGBox_random_sampling_options_SystS.setEnabled(False)
-
-    # process the sampling in a QGIS task
+    # process the sampling in a QGIS task through the sampling jobs queue
     sampling = Sampling(
         "systematic",
         thematic_map,
         post_stratification_map=post_stratification_map,
         sampling_method="grid with random offset",
         output_file=output_file,
+        aoi_mask=aoi_mask,
     )
     sampling_conf = {
         "sampling_type": "systematic",
@@ -596,6 +670,7 @@ def do_systematic_sampling():
         "neighbor_aggregation": neighbor_aggregation,
         "random_seed": random_seed,
         "confidence_level": confidence_level,
+        "area_of_interest": aoi_mask.name if aoi_mask else None,
     }
 
     if systematic_sampling_unit == "Distance":
@@ -603,18 +678,13 @@ def do_systematic_sampling():
     if systematic_sampling_unit == "Pixels":
         systematic_sampling_function = sampling.generate_systematic_sampling_points_by_pixels
 
-    globals()["sampling_task"] = QgsTask.fromFunction(
-        "Systematic sampling",
+    sampling_job = SamplingJobQueue.instance().add_job(
+        f"Systematic sampling: {os.path.basename(output_file)}",
         systematic_sampling_function,
-        on_finished=systematic_sampling_finished,
-        sampling_conf=sampling_conf,
-    )
-
-    globals()["sampling_task"].progressChanged.connect(
-        lambda value: sampling_design.QPBar_GenerateSamples_SystS.setValue(math.ceil(total_of_samples * value / 100))
+        sampling_conf,
+        systematic_sampling_finished,
     )
-
-    QgsApplication.taskManager().addTask(globals()["sampling_task"])
+    sampling_design.track_sampling_job(sampling_job, sampling_design.QPBar_GenerateSamples_SystS, total_of_samples)
 
 
 @error_handler
@@ -623,17 +693,6 @@ def systematic_sampling_finished(exception, result=None):
 
     sampling_design = AcATaMa.dockwidget.sampling_design_window
 
-    # restoring
-    sampling_design.QPBtn_GenerateSamples_SystS.setText("Generate samples")
-    sampling_design.QPBtn_GenerateSamples_SystS.setStyleSheet("")
-    sampling_design.widget_SystS_step0.setEnabled(True)
-    sampling_design.widget_SystS_step1.setEnabled(True)
-    sampling_design.widget_SystS_step2.setEnabled(True)
-    sampling_design.QGBox_SystSwithPS.setEnabled(True)
-    sampling_design.QGBox_neighbour_aggregation_SystS.setEnabled(True)
-    sampling_design.QGBox_random_sampling_options_SystS.setEnabled(True)
-    sampling_design.QPBar_GenerateSamples_SystS.setValue(0)
-
     if exception is not None or result is None:
         raise Exception(f"Error in sampling process: {exception}")
 
@@ -696,6 +755,8 @@ class Sampling:
         sampling_method=None,
         srs_config=None,
         output_file=None,
+        output_driver=None,
+        aoi_mask=None,
     ):
         self.sampling_design_type = sampling_design_type
         self.thematic_map = thematic_map
@@ -707,8 +768,12 @@ class Sampling:
         self.srs_config = srs_config
         # set the output dir for save sampling
         self.output_file = output_file
-        # for save all sampling points
-        self.points = {}
+        # the OGR driver for the output file, by default based on its extension
+        self.output_driver = output_driver
+        # the mask of the area of interest (AOIMask) to sample only inside it, None for all the map
+        self.aoi_mask = aoi_mask
+        # all sampling points, by columns
+        self.points = SampleSet()
 
     def generate_sampling_points(self, task, sampling_conf):
         """Some code base from (by Alexander Bruy):
@@ -719,6 +784,7 @@ class Sampling:
         self.min_distance = sampling_conf["min_distance"]
         self.classes_for_sampling = sampling_conf["classes_selected"]
         self.neighbor_aggregation = sampling_conf["neighbor_aggregation"]
+        self.sampling_engine = sampling_conf.get("sampling_engine", "rejection")
 
         if self.sampling_design_type == "simple":
             total_of_samples = self.total_of_samples
@@ -728,75 +794,478 @@ class Sampling:
 
         self.ThematicR_boundaries = QgsGeometry().fromRect(self.thematic_map.extent())
 
-        fields = QgsFields()
-        fields.append(QgsField("id", QVariant.Int, "", 10, 0))
-        thematic_CRS = self.thematic_map.qgs_layer.crs()
-        file_format = (
-            "GPKG"
-            if self.output_file.endswith(".gpkg")
-            else "ESRI Shapefile"
-            if self.output_file.endswith(".shp")
-            else None
+        thematic_extent = self.thematic_map.extent()
+        self.min_distance_grid = MinDistanceGrid(
+            self.min_distance, thematic_extent.xMinimum(), thematic_extent.yMinimum()
         )
-        save_options = QgsVectorFileWriter.SaveVectorOptions()
-        save_options.driverName = file_format
-        save_options.fileEncoding = "System"
-        writer = QgsVectorFileWriter.create(
-            self.output_file,
-            fields,
-            Qgis.WkbType.Point,
-            thematic_CRS,
-            QgsProject.instance().transformContext(),
-            save_options,
-        )
-
-        self.index = QgsSpatialIndex()
 
         # init the random sampling seed
         self.random_seed = sampling_conf["random_seed"]
-        random.seed(self.random_seed)
-
-        points_generated = []
-        while not task.isCanceled() and len(points_generated) < total_of_samples:
-            random_sampling_point = RandomPoint.fromExtent(self.thematic_map.extent())
-
-            # checks to the sampling point, else discard and continue
-            if not self.check_sampling_point(random_sampling_point):
-                continue
-
-            if self.sampling_design_type == "stratified":
-                self.samples_in_strata[random_sampling_point.index_pixel_value] += 1
+        self.random = random.Random(self.random_seed)  # nosec B311 - statistical sampling
+
+        # the pixel index engine requires the map to index readable by gdal
+        map_to_index = self.sampling_map if self.sampling_design_type == "stratified" else self.thematic_map
+        if self.sampling_engine == "pixel_index" and map_to_index.get_gdal_band() is None:
+            self.sampling_engine = sampling_conf["sampling_engine"] = "rejection"
+        # the parallel tiles engine requires all maps readable by gdal, to read them from other threads
+        maps_to_read = [self.thematic_map, self.sampling_map if self.sampling_design_type == "stratified" else None]
+        if self.classes_for_sampling is not None and self.sampling_design_type == "simple":
+            maps_to_read.append(self.post_stratification_map)
+        if self.sampling_engine == "tiles" and any(
+            map_to_read.get_gdal_band() is None for map_to_read in maps_to_read if map_to_read is not None
+        ):
+            self.sampling_engine = sampling_conf["sampling_engine"] = "rejection"
+
+        points_generated = SampleSet()
+        if self.sampling_engine == "tiles":
+            self.generate_random_points_by_tiles(task, points_generated, total_of_samples)
+        elif self.sampling_design_type == "simple" and self.sampling_engine == "pixel_index":
+            self.generate_random_points_from_pixel_index(task, points_generated, total_of_samples)
+        elif self.sampling_design_type == "simple":
+            self.generate_random_points_in_batches(task, points_generated, total_of_samples)
+        elif self.sampling_design_type == "stratified" and self.sampling_engine == "pixel_index":
+            self.generate_random_points_by_stratum(task, points_generated, total_of_samples)
+        else:
+            while not task.isCanceled() and len(points_generated) < total_of_samples:
+                random_sampling_point = RandomPoint.fromExtent(self.thematic_map.extent(), self.random)
+
+                # checks to the sampling point, else discard and continue
+                if not self.check_sampling_point(random_sampling_point):
+                    continue
 
-            # it requires tmp save the point to check min distance for the next sample
-            f = QgsFeature(len(points_generated))
-            f.setGeometry(random_sampling_point.QgsGeom)
-            self.index.addFeature(f)
-            self.points[len(points_generated)] = random_sampling_point.QgsPnt
+                stratum = -1
+                if self.sampling_design_type == "stratified":
+                    stratum = random_sampling_point.index_pixel_value
+                    self.samples_in_strata[stratum] += 1
 
-            points_generated.append(random_sampling_point)
-            # update task progress
-            task.setProgress(len(points_generated) / total_of_samples * 100)
+                self.add_point_generated(random_sampling_point, points_generated, stratum)
+                # update task progress
+                task.setProgress(len(points_generated) / total_of_samples * 100)
 
         # guarantee the random order for response design process
-        random.shuffle(points_generated)
-        self.points = {}  # restart
-
-        for num_point, point_generated in enumerate(points_generated):
-            # random sampling point passed the checks, save it
-            f = QgsFeature()
-            f.initAttributes(1)
-            f.setFields(fields)
-            f.setAttribute("id", num_point + 1)
-            f.setGeometry(point_generated.QgsGeom)
-            writer.addFeature(f)
-            self.points[num_point] = point_generated.QgsPnt
+        points_generated.shuffle(self.random)
+        points_generated.read_thematic_values(self.thematic_map)
+        self.points = points_generated
+        self.write_sampling_points(points_generated)
 
         # save the total point generated
         self.samples_generated = len(points_generated)
-        del writer, self.index
+        del self.min_distance_grid
 
         return self, sampling_conf
 
+    def write_sampling_points(self, points_generated):
+        """Save the sampling points in the output file in bulk, with the id in the order given"""
+        with SamplingFileWriter(self.output_file, self.thematic_map.qgs_layer.crs(), self.output_driver) as writer:
+            writer.add_points(points_generated.x, points_generated.y)
+
+    def add_point_generated(self, sampling_point, points_generated, stratum=-1):
+        # it requires tmp save the point to check min distance for the next sample
+        if self.min_distance > 0:
+            self.min_distance_grid.add([sampling_point.QgsPnt.x()], [sampling_point.QgsPnt.y()])
+        points_generated.append(sampling_point.QgsPnt.x(), sampling_point.QgsPnt.y(), stratum)
+
+    def generate_random_points_in_batches(self, task, points_generated, total_of_samples):
+        """Generate the random points drawing and checking the candidates in batches with numpy,
+        the candidates are the same (and in the same order) as drawing them one by one with
+        RandomPoint.fromExtent, so for the same seed the sampling is the same as the point by
+        point generation, including the random state left for the shuffle
+        """
+        extent = self.thematic_map.extent()
+        x_min, y_min = extent.xMinimum(), extent.yMinimum()
+        x_range, y_range = extent.xMaximum() - x_min, extent.yMaximum() - y_min
+
+        batch_size = 1024
+        while not task.isCanceled() and len(points_generated) < total_of_samples:
+            random_state = self.random.getstate()
+            random_floats = draw_random_floats(2 * batch_size, self.random)
+            # the x and y are drawn alternately for each candidate as in RandomPoint.fromExtent
+            xs = x_min + x_range * random_floats[0::2]
+            ys = y_min + y_range * random_floats[1::2]
+
+            samples_before = len(points_generated)
+            candidates_used = self.add_candidates_in_batch(task, xs, ys, points_generated, total_of_samples)
+            if candidates_used < batch_size:
+                # leave the random state as if only the candidates used had been drawn
+                self.random.setstate(random_state)
+                draw_random_floats(2 * candidates_used, self.random)
+
+            batch_size = self.get_next_batch_size(
+                batch_size,
+                len(points_generated) - samples_before,
+                candidates_used,
+                total_of_samples - len(points_generated),
+            )
+
+    def generate_random_points_from_pixel_index(self, task, points_generated, total_of_samples):
+        """Generate the random points drawing the candidates only inside the eligible pixels of
+        the thematic map (valid data and the post-stratification classes when both maps have the
+        same pixel grid), the run time doesn't depend on how sparse the valid data is
+        """
+        post_stratification_in_index = (
+            self.classes_for_sampling is not None
+            and self.post_stratification_map.get_gdal_band() is not None
+            and self.post_stratification_map.is_aligned_with(self.thematic_map)
+        )
+        # pre-filter the pixels without the neighbors aggregation
+        neighbor_homogeneity = (
+            self.thematic_map.get_neighbor_homogeneity(self.neighbor_aggregation[0])
+            if self.neighbor_aggregation
+            else None
+        )
+
+        def get_masks(yoff, values):
+            mask = self.thematic_map.valid_data_mask(values)
+            if post_stratification_in_index:
+                # same rows by window, the chunks of each map follow its own gdal block size
+                post_stratification_values = self.post_stratification_map.read_rows(yoff, len(values))
+                mask &= np.isin(np.trunc(post_stratification_values), self.classes_for_sampling)
+            if neighbor_homogeneity is not None:
+                mask &= neighbor_homogeneity.read_rows(yoff, len(values)) > self.neighbor_aggregation[1]
+            if self.aoi_mask is not None:
+                mask &= self.aoi_mask.read_rows(yoff, len(values))
+            return {"valid": mask}
+
+        pixel_index = PixelIndex.build(self.thematic_map, get_masks)["valid"]
+        if pixel_index.total_pixels == 0:
+            return
+
+        rng = np.random.default_rng(self.random.getrandbits(128))
+        batch_size = 1024
+        while not task.isCanceled() and len(points_generated) < total_of_samples:
+            xs, ys = pixel_index.draw(rng, batch_size)
+            samples_before = len(points_generated)
+            candidates_used = self.add_candidates_in_batch(task, xs, ys, points_generated, total_of_samples)
+            batch_size = self.get_next_batch_size(
+                batch_size,
+                len(points_generated) - samples_before,
+                candidates_used,
+                total_of_samples - len(points_generated),
+            )
+
+    def generate_random_points_by_stratum(self, task, points_generated, total_of_samples):
+        """Generate exactly the number of samples of each stratum drawing the candidates only inside
+        the pixels of the stratum, with the pixel indexes of all strata built in one pass over the
+        sampling map. Each stratum has its own random stream derived from the seed, and the strata
+        are processed in parallel when there is no minimum distance between the samples
+        """
+        thematic_in_index = self.thematic_map.get_gdal_band() is not None and self.thematic_map.is_aligned_with(
+            self.sampling_map
+        )
+        # pre-filter the pixels without the neighbors aggregation
+        neighbor_homogeneity = (
+            self.thematic_map.get_neighbor_homogeneity(self.neighbor_aggregation[0])
+            if thematic_in_index and self.neighbor_aggregation
+            else None
+        )
+
+        def get_masks(yoff, values):
+            classes_values = np.trunc(values)
+            valid = self.sampling_map.valid_data_mask(values)
+            if thematic_in_index:
+                thematic_values = self.thematic_map.read_rows(yoff, len(values))
+                valid &= self.thematic_map.valid_data_mask(thematic_values)
+            if neighbor_homogeneity is not None:
+                valid &= neighbor_homogeneity.read_rows(yoff, len(values)) > self.neighbor_aggregation[1]
+            if thematic_in_index and self.aoi_mask is not None:
+                valid &= self.aoi_mask.read_rows(yoff, len(values))
+            return {
+                idx: valid & (classes_values == pixel_value)
+                for idx, pixel_value in enumerate(self.classes_for_sampling)
+                if self.total_of_samples[idx] > 0
+            }
+
+        pixel_indexes = PixelIndex.build(self.sampling_map, get_masks)
+        seed_sequences = np.random.SeedSequence(self.random.getrandbits(128)).spawn(len(self.classes_for_sampling))
+        strata = [
+            (idx, pixel_indexes[idx], np.random.default_rng(seed_sequences[idx]))
+            for idx in sorted(pixel_indexes)
+            if pixel_indexes[idx].total_pixels > 0
+        ]
+
+        if self.min_distance > 0:
+            # the min distance is checked with respect to the samples of all strata, sequentially
+            for idx, pixel_index, rng in strata:
+                samples_before = len(points_generated)
+                batch_size = 1024
+                stratum_samples_limit = samples_before + self.total_of_samples[idx]
+                while not task.isCanceled() and len(points_generated) < stratum_samples_limit:
+                    xs, ys = pixel_index.draw(rng, batch_size)
+                    candidates_used = self.add_candidates_in_batch(
+                        task,
+                        xs,
+                        ys,
+                        points_generated,
+                        total_of_samples,
+                        samples_limit=stratum_samples_limit,
+                        stratum=idx,
+                    )
+                    self.samples_in_strata[idx] = len(points_generated) - samples_before
+                    batch_size = self.get_next_batch_size(
+                        batch_size,
+                        self.samples_in_strata[idx],
+                        candidates_used,
+                        stratum_samples_limit - len(points_generated),
+                    )
+            return
+
+        def draw_stratum_points(idx, pixel_index, rng, thematic_map):
+            xs_stratum, ys_stratum = [], []
+            samples_remaining = self.total_of_samples[idx]
+            while not task.isCanceled() and samples_remaining > 0:
+                xs, ys = pixel_index.draw(rng, min(max(2 * samples_remaining, 1024), 65536))
+                passed = np.flatnonzero(self.check_sampling_points_in_batch(xs, ys, thematic_map))[:samples_remaining]
+                xs_stratum.append(xs[passed])
+                ys_stratum.append(ys[passed])
+                samples_remaining -= len(passed)
+            return idx, np.concatenate(xs_stratum or [[]]), np.concatenate(ys_stratum or [[]])
+
+        with ThreadPoolExecutor(max_workers=min(len(strata), os.cpu_count() or 1) or 1) as executor:
+            futures = [
+                executor.submit(draw_stratum_points, idx, pixel_index, rng, self.thematic_map.clone())
+                for idx, pixel_index, rng in strata
+            ]
+            strata_points = {}
+            for future in as_completed(futures):
+                idx, xs, ys = future.result()
+                strata_points[idx] = (xs, ys)
+                task.setProgress(sum(len(xs) for xs, _ in strata_points.values()) / total_of_samples * 100)
+
+        # merge the samples in the order of the strata, independent of the threads
+        for idx in sorted(strata_points):
+            xs, ys = strata_points[idx]
+            points_generated.extend(xs, ys, idx)
+            self.samples_in_strata[idx] = len(xs)
+
+    def generate_random_points_by_tiles(self, task, points_generated, total_of_samples):
+        """Generate the random points checking the candidates by tiles of the thematic map in parallel.
+        The candidates are a Poisson process over the extent: each tile draws the number, positions and
+        arrival times of its candidates with its own random stream derived from the seed, and the
+        candidates that passed the checks in all tiles are added in order of arrival as in the sequential
+        rejection sampling (min distance and samples by stratum). The sampling for the same seed doesn't
+        depend on the number of workers. The tiles without data to sample (from the occupancy indexes
+        of the maps) are skipped, all their candidates would be discarded so the sampling is the same
+        """
+        _, _, _, _, _, _, width, height = self.thematic_map.get_pixel_grid()
+        tiles = [
+            (col, row, min(SAMPLING_TILE_SIZE, width - col), min(SAMPLING_TILE_SIZE, height - row))
+            for row in range(0, height, SAMPLING_TILE_SIZE)
+            for col in range(0, width, SAMPLING_TILE_SIZE)
+        ]
+        tile_weights = np.array([tile_width * tile_height for _, _, tile_width, tile_height in tiles], dtype=np.float64)
+        tile_weights /= tile_weights.sum()
+        tile_rngs = [
+            np.random.default_rng(seed_sequence)
+            for seed_sequence in np.random.SeedSequence(self.random.getrandbits(128)).spawn(len(tiles))
+        ]
+
+        if self.sampling_design_type == "stratified":
+            samples_remaining = np.array(self.total_of_samples, dtype=np.int64)
+        else:
+            samples_remaining = np.array([total_of_samples], dtype=np.int64)
+
+        # own copies of the maps for each thread
+        thread_maps = threading.local()
+
+        def draw_tile_candidates(tile_idx, num_candidates, round_idx):
+            if not hasattr(thread_maps, "thematic_map"):
+                thread_maps.thematic_map = self.thematic_map.clone()
+                thread_maps.sampling_map = self.sampling_map and self.sampling_map.clone()
+                thread_maps.post_stratification_map = (
+                    self.post_stratification_map and self.post_stratification_map.clone()
+                )
+            col, row, tile_width, tile_height = tiles[tile_idx]
+            rng = tile_rngs[tile_idx]
+            xs, ys = thread_maps.thematic_map.pixel_to_world(
+                col + tile_width * rng.random(num_candidates), row + tile_height * rng.random(num_candidates)
+            )
+            arrival_times = round_idx + rng.random(num_candidates)
+            passed = self.check_sampling_points_in_batch(
+                xs, ys, thread_maps.thematic_map, thread_maps.post_stratification_map
+            )
+            xs, ys, arrival_times = xs[passed], ys[passed], arrival_times[passed]
+            if self.sampling_design_type == "stratified":
+                strata = self.get_strata_of_points(xs, ys, thread_maps.sampling_map)
+            else:
+                strata = np.zeros(len(xs), dtype=np.int64)
+            in_strata = strata >= 0
+            return xs[in_strata], ys[in_strata], arrival_times[in_strata], strata[in_strata]
+
+        num_candidates = max(2 * total_of_samples, 1024)
+        round_idx = 0
+        with ThreadPoolExecutor(max_workers=get_sampling_workers()) as executor:
+            while not task.isCanceled() and samples_remaining.sum() > 0:
+                tiles_to_draw = np.flatnonzero(self.get_tiles_with_data(samples_remaining)).tolist()
+                if not tiles_to_draw:
+                    # no data left to sample
+                    break
+                tiles_candidates = [
+                    (tile_idx, tile_candidates, round_idx)
+                    for tile_idx, tile_candidates in (
+                        (tile_idx, int(tile_rngs[tile_idx].poisson(num_candidates * tile_weights[tile_idx])))
+                        for tile_idx in tiles_to_draw
+                    )
+                    if tile_candidates > 0
+                ]
+                # the results are merged in the order of the tiles, independent of the threads
+                results = list(executor.map(lambda args: draw_tile_candidates(*args), tiles_candidates))
+                samples_before = len(points_generated)
+                if results:
+                    xs, ys, arrival_times, strata = (np.concatenate(items) for items in zip(*results, strict=True))
+                    order = np.argsort(arrival_times, kind="stable")
+                    self.add_candidates_by_strata(
+                        xs[order], ys[order], strata[order], samples_remaining, points_generated
+                    )
+                task.setProgress(len(points_generated) / total_of_samples * 100)
+
+                # adjust the candidates of the next round with the acceptance rate of this round
+                samples_in_round = len(points_generated) - samples_before
+                if samples_in_round == 0:
+                    num_candidates = min(num_candidates * 2, 2**24)
+                else:
+                    num_candidates = int(
+                        min(max(1.2 * samples_remaining.sum() * num_candidates / samples_in_round, 1024), 2**24)
+                    )
+                round_idx += 1
+
+        if self.sampling_design_type == "stratified":
+            self.samples_in_strata = (np.array(self.total_of_samples) - samples_remaining).tolist()
+
+    def get_tiles_with_data(self, samples_remaining):
+        """Mask of the tiles of the parallel tiles engine that can have samples: with valid data in the
+        thematic map and in the area of interest and, when they are aligned with it, with pixels of the
+        classes to sample in the post-stratification map or of the strata with samples remaining in the
+        sampling map
+        """
+        thematic_occupancy = get_occupancy_index(self.thematic_map, SAMPLING_TILE_SIZE)
+        tiles_with_data = thematic_occupancy.tiles_with_data()
+        if self.aoi_mask is not None:
+            tiles_with_data &= self.aoi_mask.tiles_with_data(SAMPLING_TILE_SIZE)
+        if self.sampling_design_type == "stratified":
+            classes_map = self.sampling_map
+            classes = [
+                pixel_value
+                for pixel_value, stratum_remaining in zip(self.classes_for_sampling, samples_remaining, strict=True)
+                if stratum_remaining > 0
+            ]
+        else:
+            classes_map = self.post_stratification_map
+            classes = self.classes_for_sampling
+        if classes is not None and classes_map.is_aligned_with(self.thematic_map):
+            tiles_with_data &= get_occupancy_index(classes_map, SAMPLING_TILE_SIZE).tiles_with_data(classes)
+        return tiles_with_data
+
+    def get_strata_of_points(self, xs, ys, sampling_map):
+        """Index of the stratum of the points in the sampling map, -1 if the point is not in a
+        stratum to sample, same as the in_max_samples_in_stratum check
+        """
+        values = sampling_map.read_values(xs, ys)
+        valid = sampling_map.valid_data_mask(values)
+        strata = np.full(len(xs), -1, dtype=np.int64)
+        for idx, pixel_value in enumerate(self.classes_for_sampling):
+            if self.total_of_samples[idx] > 0:
+                strata[valid & (np.trunc(values) == pixel_value)] = idx
+        return strata
+
+    def add_candidates_by_strata(self, xs, ys, strata, samples_remaining, points_generated, window_size=65536):
+        """Add in order the candidates until complete the samples remaining of each stratum, checking the
+        min distance with respect to the previous samples, same as adding them one by one
+        """
+        start = 0
+        while start < len(xs) and samples_remaining.sum() > 0:
+            window_strata = strata[start : start + window_size]
+            active = samples_remaining[window_strata] > 0
+            # cut the chunk before any stratum could exceed its samples remaining, so inside the
+            # chunk the candidates are only discarded by the min distance
+            ranks = np.zeros(len(window_strata), dtype=np.int64)
+            for stratum in np.unique(window_strata[active]):
+                in_stratum = active & (window_strata == stratum)
+                ranks[in_stratum] = np.arange(1, np.count_nonzero(in_stratum) + 1)
+            exceeded = np.flatnonzero(active & (ranks > samples_remaining[window_strata]))
+            chunk_size = int(exceeded[0]) if exceeded.size else len(window_strata)
+
+            candidates = start + np.flatnonzero(active[:chunk_size])
+            if self.min_distance > 0:
+                candidates = candidates[self.min_distance_grid.accept(xs[candidates], ys[candidates])]
+            samples_remaining -= np.bincount(strata[candidates], minlength=len(samples_remaining))
+            points_generated.extend(
+                xs[candidates], ys[candidates], strata[candidates] if self.sampling_design_type == "stratified" else -1
+            )
+            start += chunk_size
+
+    def add_candidates_in_batch(self, task, xs, ys, points_generated, total_of_samples, samples_limit=None, stratum=-1):
+        """Check the batch of candidates in order and add the ones that passed the checks until
+        complete the total of samples (or the samples limit of the stratum), return the number of
+        candidates used
+        """
+        samples_limit = samples_limit or total_of_samples
+        candidates = np.flatnonzero(self.check_sampling_points_in_batch(xs, ys))
+        if self.min_distance > 0:
+            candidates = candidates[
+                self.min_distance_grid.accept(
+                    xs[candidates], ys[candidates], max_accepted=samples_limit - len(points_generated)
+                )
+            ]
+        else:
+            candidates = candidates[: samples_limit - len(points_generated)]
+
+        points_generated.extend(xs[candidates], ys[candidates], stratum)
+        # update task progress
+        task.setProgress(len(points_generated) / total_of_samples * 100)
+
+        if len(points_generated) == samples_limit:
+            return int(candidates[-1]) + 1
+        return len(xs)
+
+    @staticmethod
+    def get_next_batch_size(batch_size, samples_in_batch, candidates_used, samples_remaining):
+        """Adjust the next batch size with the acceptance rate of the current batch"""
+        if samples_in_batch == 0:
+            return min(batch_size * 2, 65536)
+        return int(min(max(1.2 * samples_remaining * candidates_used / samples_in_batch, 1024), 65536))
+
+    def check_sampling_points_in_batch(self, xs, ys, thematic_map=None, post_stratification_map=None):
+        """Vectorized version of the checks of check_sampling_point that only depend on the
+        position of the point (all except the min distance and the max samples in the stratum),
+        return the boolean mask of the points that passed the checks
+        """
+        thematic_map = thematic_map or self.thematic_map
+        post_stratification_map = post_stratification_map or self.post_stratification_map
+        thematic_values = thematic_map.read_values(xs, ys)
+        # in valid data
+        passed = thematic_map.valid_data_mask(thematic_values)
+        # in the area of interest
+        if self.aoi_mask is not None:
+            passed &= self.aoi_mask.contains(xs, ys)
+        # in extent (inside and not in the boundaries)
+        x_min, x_max, y_min, y_max, pixel_size_x, pixel_size_y, _, _ = thematic_map.get_pixel_grid()
+        passed &= (xs > x_min) & (xs < x_max) & (ys > y_min) & (ys < y_max)
+        # in the post-stratification map classes
+        if self.sampling_design_type in ["simple", "systematic"] and self.classes_for_sampling is not None:
+            post_stratification_values = post_stratification_map.read_values(xs, ys)
+            passed &= ~np.isnan(post_stratification_values)
+            passed[passed] = np.isin(np.trunc(post_stratification_values[passed]), self.classes_for_sampling)
+        # neighbors aggregation
+        if self.neighbor_aggregation and passed.any():
+            num_neighbors, min_with_same_class = self.neighbor_aggregation
+            same_class_neighbors = thematic_map.read_same_class_neighbors(xs[passed], ys[passed], num_neighbors)
+            if same_class_neighbors is not None:
+                passed[passed] = same_class_neighbors > min_with_same_class
+                return passed
+            # fallback for sources not readable by gdal
+            radius = {8: 1, 24: 2, 48: 3}[num_neighbors]
+            multipliers = np.arange(-radius, radius + 1)
+            neighbors_xs = pixel_size_x * multipliers[None, :, None] + xs[passed][:, None, None]
+            neighbors_ys = pixel_size_y * multipliers[None, None, :] + ys[passed][:, None, None]
+            neighbors_xs, neighbors_ys = np.broadcast_arrays(neighbors_xs, neighbors_ys)
+            neighbors_values = thematic_map.read_values(neighbors_xs, neighbors_ys)
+            pixel_class_values = np.trunc(thematic_values[passed])[:, None, None]
+            with np.errstate(invalid="ignore"):
+                same_class = np.trunc(neighbors_values) == pixel_class_values
+            passed[passed] = same_class.sum(axis=(1, 2)) > min_with_same_class
+
+        return passed
+
     def generate_systematic_sampling_points_by_distance(self, task, sampling_conf):
         """Some code base from (by Alexander Bruy):
         https://github.com/qgis/QGIS/blob/main/python/plugins/processing/algs/qgis/RegularPoints.py
@@ -816,28 +1285,6 @@ class Sampling:
         epsilon = get_epsilon(for_crs=self.thematic_map.qgs_layer.crs())
         initial_inset = self.initial_inset + epsilon
 
-        fields = QgsFields()
-        fields.append(QgsField("id", QVariant.Int, "", 10, 0))
-        thematic_CRS = self.thematic_map.qgs_layer.crs()
-        file_format = (
-            "GPKG"
-            if self.output_file.endswith(".gpkg")
-            else "ESRI Shapefile"
-            if self.output_file.endswith(".shp")
-            else None
-        )
-        save_options = QgsVectorFileWriter.SaveVectorOptions()
-        save_options.driverName = file_format
-        save_options.fileEncoding = "System"
-        writer = QgsVectorFileWriter.create(
-            self.output_file,
-            fields,
-            Qgis.WkbType.Point,
-            thematic_CRS,
-            QgsProject.instance().transformContext(),
-            save_options,
-        )
-
         pixel_size_x = self.thematic_map.qgs_layer.rasterUnitsPerPixelX()
         pixel_size_y = self.thematic_map.qgs_layer.rasterUnitsPerPixelY()
 
@@ -849,39 +1296,43 @@ class Sampling:
             max_tries = math.ceil(math.log(1 - self.confidence_level) / math.log(1 - 1 / N)) if N > 1 else 1
 
         # init the random sampling seed
-        random.seed(self.random_seed)
+        self.random = random.Random(self.random_seed)  # nosec B311 - statistical sampling
 
-        points_generated = []
-        pixels_sampled = []  # to check and avoid duplicate sampled pixels
+        points_generated = SampleSet()
+        pixels_sampled = set()  # to check and avoid duplicate sampled pixels
 
-        y = self.thematic_map.extent().yMaximum() - initial_inset
-        while not task.isCanceled() and y >= self.thematic_map.extent().yMinimum() - self.points_spacing:
-            x = self.thematic_map.extent().xMinimum() + initial_inset
-            while not task.isCanceled() and x <= self.thematic_map.extent().xMaximum() + self.points_spacing:
-                ### aligned sampling without offset
-                if self.max_xy_offset == 0:
-                    random_sampling_point = RandomPoint(x, y)
-                    _x_centroid, _y_centroid = self.thematic_map.get_pixel_centroid(x, y)
+        extent = self.thematic_map.extent()
+        x_nodes = self.get_systematic_grid_nodes(
+            extent.xMinimum() + initial_inset, self.points_spacing, extent.xMaximum() + self.points_spacing
+        )
+        y_nodes = self.get_systematic_grid_nodes(
+            extent.yMaximum() - initial_inset, -self.points_spacing, extent.yMinimum() - self.points_spacing
+        )
 
-                    # check if the pixel is not already sampled
-                    if (_x_centroid, _y_centroid) in pixels_sampled:
-                        x += self.points_spacing
-                        continue
+        for y in y_nodes.tolist():
+            if task.isCanceled():
+                break
 
-                    # do multi-checks to the sampling point, else discard and continue
-                    if not self.check_sampling_point(random_sampling_point):
-                        x += self.points_spacing
+            ### aligned sampling without offset
+            if self.max_xy_offset == 0:
+                # all the grid nodes of the row are checked at once
+                ys = np.full_like(x_nodes, y)
+                x_centroids, y_centroids = self.thematic_map.pixel_centroids(x_nodes, ys)
+                for idx in np.flatnonzero(self.check_sampling_points_in_batch(x_nodes, ys)).tolist():
+                    # check if the pixel is not already sampled
+                    pixel = (float(x_centroids[idx]), float(y_centroids[idx]))
+                    if pixel in pixels_sampled:
                         continue
+                    points_generated.append(float(x_nodes[idx]), y)
+                    pixels_sampled.add(pixel)
+                # update task progress
+                task.setProgress(len(points_generated) / sampling_conf["total_of_samples"] * 100)
+                continue
 
-                    points_generated.append(random_sampling_point)
-                    pixels_sampled.append((_x_centroid, _y_centroid))
-
-                    x += self.points_spacing
-                    # update task progress
-                    task.setProgress(len(points_generated) / sampling_conf["total_of_samples"] * 100)
-                    continue
-
-                ### with random offset
+            ### with random offset
+            for x in x_nodes.tolist():
+                if task.isCanceled():
+                    break
                 # define the offset grid area by each aligning grid point
                 x_offset_grid = np.arange(x - self.max_xy_offset, x + self.max_xy_offset, pixel_size_x)
                 y_offset_grid = np.arange(y - self.max_xy_offset + 2 * epsilon, y + self.max_xy_offset, pixel_size_y)
@@ -890,84 +1341,48 @@ class Sampling:
                 y_offset_grid = np.append(y_offset_grid, y + self.max_xy_offset)
 
                 # gather all the valid thematic pixels centroids in the offset area
-                pixels_in_offset_grid = []
-                for x_offset in x_offset_grid:
-                    for y_offset in y_offset_grid:
-                        x_centroid, y_centroid = self.thematic_map.get_pixel_centroid(x_offset, y_offset)
-                        if x_centroid is None or y_centroid is None:
-                            continue
-
-                        pixel_value = self.thematic_map.get_pixel_value_from_xy(x_centroid, y_centroid)
-                        if pixel_value is None or pixel_value == self.thematic_map.nodata:
-                            continue
-
-                        if (x_centroid, y_centroid) in pixels_in_offset_grid:
-                            continue
-
-                        pixels_in_offset_grid.append((x_centroid, y_centroid))
-
-                # if all pixels in the offset grid are None
-                if not pixels_in_offset_grid:
-                    x += self.points_spacing
-                    continue
+                pixels_in_offset_grid = set(self.get_valid_pixels_in_offset_grid(x_offset_grid, y_offset_grid))
 
                 tries = 0
-
-                while not task.isCanceled():
-                    if not pixels_in_offset_grid or tries >= max_tries:
-                        x += self.points_spacing
-                        break
-
+                while not task.isCanceled() and pixels_in_offset_grid and tries < max_tries:
                     tries += 1
 
                     # generate a random point inside the offset area
-                    _x = random.uniform(x - self.max_xy_offset, x + self.max_xy_offset)  # nosec B311
-                    _y = random.uniform(y - self.max_xy_offset, y + self.max_xy_offset)  # nosec B311
+                    _x = self.random.uniform(x - self.max_xy_offset, x + self.max_xy_offset)  # nosec B311
+                    _y = self.random.uniform(y - self.max_xy_offset, y + self.max_xy_offset)  # nosec B311
                     random_sampling_point = RandomPoint(_x, _y)
                     # get the pixel centroid of the random point
-                    _x_centroid, _y_centroid = self.thematic_map.get_pixel_centroid(_x, _y)
+                    pixel = self.thematic_map.get_pixel_centroid(_x, _y)
 
                     # check if the random point centroid is in the pixel_in_offset_grid
-                    if (_x_centroid, _y_centroid) not in pixels_in_offset_grid:
+                    if pixel not in pixels_in_offset_grid:
                         continue
 
                     # check if the pixel is not already sampled
-                    if (_x_centroid, _y_centroid) in pixels_sampled:
-                        pixels_in_offset_grid.remove((_x_centroid, _y_centroid))
+                    if pixel in pixels_sampled:
+                        pixels_in_offset_grid.discard(pixel)
                         continue
 
                     # do multi-checks to the sampling point, else discard and continue
                     if not self.check_sampling_point(random_sampling_point):
-                        pixels_in_offset_grid.remove((_x_centroid, _y_centroid))
+                        pixels_in_offset_grid.discard(pixel)
                         continue
 
-                    points_generated.append(random_sampling_point)
-                    pixels_sampled.append((_x_centroid, _y_centroid))
+                    points_generated.append(_x, _y)
+                    pixels_sampled.add(pixel)
 
-                    x += self.points_spacing
                     # update task progress
                     task.setProgress(len(points_generated) / sampling_conf["total_of_samples"] * 100)
                     break
 
-            y = y - self.points_spacing
-
         # guarantee the random order for response design process
-        random.shuffle(points_generated)
-        self.points = {}  # restart
-
-        for num_point, point_generated in enumerate(points_generated):
-            # random sampling point passed the checks, save it
-            f = QgsFeature()
-            f.initAttributes(1)
-            f.setFields(fields)
-            f.setAttribute("id", num_point + 1)
-            f.setGeometry(point_generated.QgsGeom)
-            writer.addFeature(f)
-            self.points[num_point] = point_generated.QgsPnt
+        points_generated.shuffle(self.random)
+        points_generated.read_thematic_values(self.thematic_map)
+        self.points = points_generated
+        self.write_sampling_points(points_generated)
 
         # save the total point generated
         self.samples_generated = len(points_generated)
-        del writer
 
         return self, sampling_conf
 
@@ -988,28 +1403,6 @@ class Sampling:
 
         initial_inset = self.initial_inset
 
-        fields = QgsFields()
-        fields.append(QgsField("id", QVariant.Int, "", 10, 0))
-        thematic_CRS = self.thematic_map.qgs_layer.crs()
-        file_format = (
-            "GPKG"
-            if self.output_file.endswith(".gpkg")
-            else "ESRI Shapefile"
-            if self.output_file.endswith(".shp")
-            else None
-        )
-        save_options = QgsVectorFileWriter.SaveVectorOptions()
-        save_options.driverName = file_format
-        save_options.fileEncoding = "System"
-        writer = QgsVectorFileWriter.create(
-            self.output_file,
-            fields,
-            Qgis.WkbType.Point,
-            thematic_CRS,
-            QgsProject.instance().transformContext(),
-            save_options,
-        )
-
         pixel_size_x = self.thematic_map.qgs_layer.rasterUnitsPerPixelX()
         pixel_size_y = self.thematic_map.qgs_layer.rasterUnitsPerPixelY()
 
@@ -1021,49 +1414,50 @@ class Sampling:
             max_tries = math.ceil(math.log(1 - self.confidence_level) / math.log(1 - 1 / N)) if N > 1 else 1
 
         # init the random sampling seed
-        random.seed(self.random_seed)
+        self.random = random.Random(self.random_seed)  # nosec B311 - statistical sampling
 
-        points_generated = []
-        pixels_sampled = []  # to check and avoid duplicate sampled pixels
+        points_generated = SampleSet()
+        pixels_sampled = set()  # to check and avoid duplicate sampled pixels
 
-        y = self.thematic_map.extent().yMaximum() - pixel_size_y * initial_inset
-        while not task.isCanceled() and y >= self.thematic_map.extent().yMinimum() - pixel_size_y * self.points_spacing:
-            x = self.thematic_map.extent().xMinimum() + pixel_size_x * initial_inset
-            while (
-                not task.isCanceled()
-                and x <= self.thematic_map.extent().xMaximum() + pixel_size_x * self.points_spacing
-            ):
-                ### aligned sampling without offset
-                if self.max_xy_offset == 0:
-                    # select the pixel where the aligned grid is in the top-left corner
-                    _x, _y = self.thematic_map.get_pixel_centroid(x + pixel_size_x / 2, y - pixel_size_y / 2)
-
-                    # check if the pixel centroid is valid
-                    if _x is None or _y is None:
-                        x += pixel_size_x * self.points_spacing
-                        continue
+        extent = self.thematic_map.extent()
+        x_nodes = self.get_systematic_grid_nodes(
+            extent.xMinimum() + pixel_size_x * initial_inset,
+            pixel_size_x * self.points_spacing,
+            extent.xMaximum() + pixel_size_x * self.points_spacing,
+        )
+        y_nodes = self.get_systematic_grid_nodes(
+            extent.yMaximum() - pixel_size_y * initial_inset,
+            -pixel_size_y * self.points_spacing,
+            extent.yMinimum() - pixel_size_y * self.points_spacing,
+        )
 
-                    random_sampling_point = RandomPoint(_x, _y)
+        for y in y_nodes.tolist():
+            if task.isCanceled():
+                break
 
+            ### aligned sampling without offset
+            if self.max_xy_offset == 0:
+                # select the pixels where the aligned grid is in the top-left corner, all the row at once
+                x_centroids, y_centroids = self.thematic_map.pixel_centroids(
+                    x_nodes + pixel_size_x / 2, np.full_like(x_nodes, y - pixel_size_y / 2)
+                )
+                inside = np.flatnonzero(~np.isnan(x_centroids))
+                x_centroids, y_centroids = x_centroids[inside], y_centroids[inside]
+                for idx in np.flatnonzero(self.check_sampling_points_in_batch(x_centroids, y_centroids)).tolist():
                     # check if the pixel is not already sampled
-                    if (_x, _y) in pixels_sampled:
-                        x += pixel_size_x * self.points_spacing
-                        continue
-
-                    # do multi-checks to the sampling point, else discard and continue
-                    if not self.check_sampling_point(random_sampling_point):
-                        x += pixel_size_x * self.points_spacing
+                    pixel = (float(x_centroids[idx]), float(y_centroids[idx]))
+                    if pixel in pixels_sampled:
                         continue
+                    points_generated.append(*pixel)
+                    pixels_sampled.add(pixel)
+                # update task progress
+                task.setProgress(len(points_generated) / sampling_conf["total_of_samples"] * 100)
+                continue
 
-                    points_generated.append(random_sampling_point)
-                    pixels_sampled.append((_x, _y))
-
-                    x += pixel_size_x * self.points_spacing
-                    # update task progress
-                    task.setProgress(len(points_generated) / sampling_conf["total_of_samples"] * 100)
-                    continue
-
-                ### with random offset
+            ### with random offset
+            for x in x_nodes.tolist():
+                if task.isCanceled():
+                    break
                 # define the offset grid area by each aligning grid point
                 x_offset_grid = np.arange(
                     x - pixel_size_x * self.max_xy_offset,
@@ -1076,95 +1470,86 @@ class Sampling:
                     pixel_size_y,
                 )
 
-                # gather all the valid thematic pixels centroids in the offset area
-                pixels_in_offset_grid = []
-                for x_offset in x_offset_grid:
-                    for y_offset in y_offset_grid:
-                        # select the pixel where the offset grid is in the top-left corner
-                        _x, _y = self.thematic_map.get_pixel_centroid(
-                            x_offset + pixel_size_x / 2, y_offset - pixel_size_y / 2
-                        )
-
-                        if _x is None or _y is None:
-                            continue
-
-                        pixel_value = self.thematic_map.get_pixel_value_from_xy(_x, _y)
-                        if pixel_value is None or pixel_value == self.thematic_map.nodata:
-                            continue
-
-                        if (_x, _y) in pixels_in_offset_grid:
-                            continue
-
-                        pixels_in_offset_grid.append((_x, _y))
-
-                # if all pixels in the offset grid are None
-                if not pixels_in_offset_grid:
-                    x += pixel_size_x * self.points_spacing
-                    continue
+                # gather all the valid thematic pixels centroids in the offset area, selecting the
+                # pixels where the offset grid is in the top-left corner
+                pixels_in_offset_grid = self.get_valid_pixels_in_offset_grid(
+                    x_offset_grid + pixel_size_x / 2, y_offset_grid - pixel_size_y / 2
+                )
 
                 tries = 0
-
-                while not task.isCanceled():
-                    if not pixels_in_offset_grid or tries >= max_tries:
-                        x += pixel_size_x * self.points_spacing
-                        break
-
+                while not task.isCanceled() and pixels_in_offset_grid and tries < max_tries:
                     tries += 1
 
-                    _x, _y = random.choice(pixels_in_offset_grid)  # nosec B311 - statistical sampling
+                    # same random stream as random.choice, keeping the index to remove the pixel
+                    pixel_idx = self.random.randrange(len(pixels_in_offset_grid))  # nosec B311 - statistical sampling
+                    pixel = pixels_in_offset_grid[pixel_idx]
 
-                    random_sampling_point = RandomPoint(_x, _y)
+                    random_sampling_point = RandomPoint(*pixel)
 
                     # check if the pixel is not already sampled
-                    if (_x, _y) in pixels_sampled:
-                        pixels_in_offset_grid.remove((_x, _y))
+                    if pixel in pixels_sampled:
+                        pixels_in_offset_grid.pop(pixel_idx)
                         continue
 
                     # do multi-checks to the sampling point, else discard and continue
                     if not self.check_sampling_point(random_sampling_point):
-                        pixels_in_offset_grid.remove((_x, _y))
+                        pixels_in_offset_grid.pop(pixel_idx)
                         continue
 
-                    points_generated.append(random_sampling_point)
-                    pixels_sampled.append((_x, _y))
+                    points_generated.append(*pixel)
+                    pixels_sampled.add(pixel)
 
-                    x += pixel_size_x * self.points_spacing
                     # update task progress
                     task.setProgress(len(points_generated) / sampling_conf["total_of_samples"] * 100)
                     break
 
-            y -= pixel_size_y * self.points_spacing
-
         # guarantee the random order for response design process
-        random.shuffle(points_generated)
-        self.points = {}  # restart
-
-        for num_point, point_generated in enumerate(points_generated):
-            # random sampling point passed the checks, save it
-            f = QgsFeature()
-            f.initAttributes(1)
-            f.setFields(fields)
-            f.setAttribute("id", num_point + 1)
-            f.setGeometry(point_generated.QgsGeom)
-            writer.addFeature(f)
-            self.points[num_point] = point_generated.QgsPnt
+        points_generated.shuffle(self.random)
+        points_generated.read_thematic_values(self.thematic_map)
+        self.points = points_generated
+        self.write_sampling_points(points_generated)
 
         # save the total point generated
         self.samples_generated = len(points_generated)
-        del writer
 
         return self, sampling_conf
 
+    @staticmethod
+    def get_systematic_grid_nodes(start, step, limit):
+        """Coordinates of the systematic grid nodes from the start adding the step while not
+        pass the limit, accumulated one by one to get the same values as walking the grid
+        """
+        num_steps = max(math.floor((limit - start) / step), -1) + 2
+        nodes = np.add.accumulate(np.concatenate(([start], np.full(num_steps, step, dtype=np.float64))))
+        return nodes[nodes <= limit] if step > 0 else nodes[nodes >= limit]
+
+    def get_valid_pixels_in_offset_grid(self, x_offset_grid, y_offset_grid):
+        """Centroids of the valid thematic pixels of all the points in the offset grid, read at once,
+        without duplicates and in the order of the grid (by x and then by y)
+        """
+        xs, ys = np.meshgrid(x_offset_grid, y_offset_grid, indexing="ij")
+        x_centroids, y_centroids = self.thematic_map.pixel_centroids(xs.ravel(), ys.ravel())
+        values = self.thematic_map.read_values(x_centroids, y_centroids)
+        valid = ~np.isnan(values)
+        if self.thematic_map.nodata is not None:
+            valid &= values != self.thematic_map.nodata
+        if self.aoi_mask is not None:
+            valid &= self.aoi_mask.contains(x_centroids, y_centroids)
+        return list(dict.fromkeys(zip(x_centroids[valid].tolist(), y_centroids[valid].tolist(), strict=True)))
+
     def check_sampling_point(self, sampling_point):
         """Make several checks to the sampling point, else discard"""
         if not sampling_point.in_valid_data(self.thematic_map):
             return False
 
+        if not sampling_point.in_area_of_interest(self.aoi_mask):
+            return False
+
         if not sampling_point.in_extent(self.ThematicR_boundaries):
             return False
 
         if self.sampling_design_type in ["simple", "stratified"]:
-            if not sampling_point.in_mim_distance(self.index, self.min_distance, self.points):
+            if not sampling_point.in_mim_distance(self.min_distance_grid):
                 return False
 
         if self.sampling_design_type in ["simple", "systematic"]:
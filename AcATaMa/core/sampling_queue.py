@@ -0,0 +1,164 @@
+"""
+/***************************************************************************
+ AcATaMa
+                                 A QGIS plugin
+ AcATaMa is a Qgis plugin for Accuracy Assessment of Thematic Maps
+                              -------------------
+        copyright            : (C) 2017-2026 by Xavier C. Llano, SMByC
+        email                : xavier.corredor.llano@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+from collections import deque
+from itertools import count
+
+from qgis.core import QgsApplication, QgsTask
+from qgis.PyQt.QtCore import QObject, QSettings, pyqtSignal
+
+
+def get_sampling_parallel_jobs():
+    """Number of sampling jobs running at the same time, saved in the QGIS setting
+    "AcATaMa/sampling_parallel_jobs"
+    """
+    return max(QSettings().value("AcATaMa/sampling_parallel_jobs", 2, type=int), 1)
+
+
+class SamplingJob:
+    """A sampling configuration queued to run in a QGIS task"""
+
+    QUEUED = "Queued"
+    RUNNING = "Running"
+    FINISHED = "Finished"
+    CANCELED = "Canceled"
+    FAILED = "Failed"
+
+    def __init__(self, job_id, description, sampling_function, sampling_conf, on_finished):
+        self.job_id = job_id
+        self.description = description
+        self.sampling_function = sampling_function
+        self.sampling_conf = sampling_conf
+        self.on_finished = on_finished
+        self.status = SamplingJob.QUEUED
+        self.progress = 0
+        self.task = None
+
+    @property
+    def is_done(self):
+        return self.status in (SamplingJob.FINISHED, SamplingJob.CANCELED, SamplingJob.FAILED)
+
+
+class SamplingJobQueue(QObject):
+    """Queue of sampling jobs that runs them through the QGIS task manager, with a maximum number
+    of jobs running at the same time, and the progress and cancel of each job
+    """
+
+    job_added = pyqtSignal(object)
+    job_updated = pyqtSignal(object)
+
+    inst = None
+
+    def __init__(self, max_parallel_jobs=None):
+        super().__init__()
+        self.max_parallel_jobs = max_parallel_jobs or get_sampling_parallel_jobs()
+        self.jobs = {}  # all jobs by id, the references to the tasks must be kept
+        self.queued_jobs = deque()
+        self.running_jobs = set()
+        self.job_ids = count(1)
+
+    @classmethod
+    def instance(cls):
+        if cls.inst is None:
+            cls.inst = SamplingJobQueue()
+        return cls.inst
+
+    def add_job(self, description, sampling_function, sampling_conf, on_finished):
+        """Queue the sampling function (generate_sampling_points or a systematic one) with its config
+
+        Args:
+            description (str): name of the job in the task manager and in the jobs table
+            sampling_function (callable): the sampling function, it receives the task and the sampling_conf
+            sampling_conf (dict): the sampling configuration
+            on_finished (callable): called with (exception, result) when the job ends
+
+        Returns:
+            SamplingJob: the job queued
+        """
+        job = SamplingJob(next(self.job_ids), description, sampling_function, sampling_conf, on_finished)
+        self.jobs[job.job_id] = job
+        self.queued_jobs.append(job)
+        self.job_added.emit(job)
+        self.start_queued_jobs()
+        return job
+
+    def set_max_parallel_jobs(self, max_parallel_jobs):
+        self.max_parallel_jobs = max(int(max_parallel_jobs), 1)
+        QSettings().setValue("AcATaMa/sampling_parallel_jobs", self.max_parallel_jobs)
+        self.start_queued_jobs()
+
+    def start_queued_jobs(self):
+        while self.queued_jobs and len(self.running_jobs) < self.max_parallel_jobs:
+            job = self.queued_jobs.popleft()
+            job.task = QgsTask.fromFunction(
+                job.description,
+                job.sampling_function,
+                on_finished=lambda exception, result=None, job=job: self.job_finished(job, exception, result),
+                sampling_conf=job.sampling_conf,
+            )
+            job.task.progressChanged.connect(lambda value, job=job: self.update_job_progress(job, value))
+            job.status = SamplingJob.RUNNING
+            self.running_jobs.add(job.job_id)
+            self.job_updated.emit(job)
+            QgsApplication.taskManager().addTask(job.task)
+
+    def update_job_progress(self, job, value):
+        job.progress = value
+        self.job_updated.emit(job)
+
+    def cancel_job(self, job_id):
+        """Cancel the job, a queued job is removed from the queue and a running job finishes
+        with the samples generated until now
+        """
+        job = self.jobs[job_id]
+        if job.status == SamplingJob.QUEUED:
+            self.queued_jobs.remove(job)
+            job.status = SamplingJob.CANCELED
+            self.job_updated.emit(job)
+        elif job.status == SamplingJob.RUNNING:
+            job.task.cancel()
+
+    def cancel_all_jobs(self, report=True):
+        """Cancel all the jobs, without report the samples generated by the running jobs if not report
+        (when the plugin is closed, the windows to report them are gone)
+        """
+        for job_id, job in list(self.jobs.items()):
+            if not report:
+                job.on_finished = lambda exception, result: None
+            self.cancel_job(job_id)
+
+    def job_finished(self, job, exception, result):
+        self.running_jobs.discard(job.job_id)
+        if job.task.isCanceled():
+            job.status = SamplingJob.CANCELED
+        elif exception is not None or result is None:
+            job.status = SamplingJob.FAILED
+        else:
+            job.status = SamplingJob.FINISHED
+        self.job_updated.emit(job)
+        self.start_queued_jobs()
+        # a task canceled before it started has nothing to report
+        if job.status != SamplingJob.CANCELED or result is not None:
+            job.on_finished(exception, result)
+
+    def clear_done_jobs(self):
+        """Remove the jobs that are not queued or running"""
+        for job_id in [job_id for job_id, job in self.jobs.items() if job.is_done]:
+            del self.jobs[job_id]
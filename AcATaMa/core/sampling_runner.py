@@ -0,0 +1,334 @@
+"""
+/***************************************************************************
+ AcATaMa
+                                 A QGIS plugin
+ AcATaMa is a Qgis plugin for Accuracy Assessment of Thematic Maps
+                              -------------------
+        copyright            : (C) 2017-2026 by Xavier C. Llano, SMByC
+        email                : xavier.corredor.llano@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+import os
+import random
+
+import yaml
+from qgis.core import QgsVectorLayer
+
+from AcATaMa.core.aoi_mask import get_aoi_mask
+from AcATaMa.core.config import update_legacy_config
+from AcATaMa.core.map import Map, get_nodata_value
+from AcATaMa.core.sampling_design import Sampling, get_systematic_total_of_samples
+from AcATaMa.utils.others_utils import count_pixels_in_one_pass, get_nodata_format, storage_pixel_count_by_pixel_values
+from AcATaMa.utils.system_utils import LegacyLoader, load_yaml
+
+# sampling types by the tab activated in the sampling design window
+SAMPLING_TYPES = ("simple", "stratified", "systematic")
+
+
+class HeadlessTask:
+    """Replace the QgsTask to run the sampling functions directly, without the QGIS task manager"""
+
+    def __init__(self, progress_callback=None):
+        self.progress_callback = progress_callback
+        self.canceled = False
+
+    def setProgress(self, value):
+        if self.progress_callback is not None:
+            self.progress_callback(value)
+
+    def isCanceled(self):
+        return self.canceled
+
+    def cancel(self):
+        self.canceled = True
+
+
+def load_config(yml_file_path):
+    """Load the AcATaMa configuration file saved by the plugin, with the items of the old format renamed"""
+    try:
+        with open(yml_file_path, encoding="utf-8") as yaml_file:
+            yaml_config = load_yaml(yaml_file)
+    except yaml.constructor.ConstructorError:
+        # support legacy YAML files that store ordered mappings and tuples
+        with open(yml_file_path, encoding="utf-8") as yaml_file:
+            yaml_config = load_yaml(yaml_file, LegacyLoader)
+    update_legacy_config(yaml_config)
+    return yaml_config
+
+
+def get_config_path(path, yml_file_path=None):
+    """Check if the file path exists or try using relative path to the yml file"""
+    if path and not os.path.isfile(path) and yml_file_path is not None:
+        rel_path = os.path.join(os.path.dirname(yml_file_path), path)
+        if os.path.isfile(rel_path):
+            return os.path.abspath(rel_path)
+    return path
+
+
+def get_map_from_config(path, band, nodata, yml_file_path=None):
+    """Map of the configuration, if the nodata is not saved it is the nodata of the band as in the window"""
+    path = get_config_path(path, yml_file_path)
+    if not path or band in (None, -1):
+        raise ValueError("The map is not configured in the AcATaMa configuration file")
+    config_map = Map.from_file(path, band=int(band))
+    config_map.nodata = get_nodata_format(
+        get_nodata_value(config_map.qgs_layer, config_map.band) if nodata is None else nodata
+    )
+    return config_map
+
+
+def count_map_pixels(config_map, nodata, task=None):
+    """Count the pixels of the map in one pass without the gui (no progress dialogs) and save them in
+    the storage, for the pixel count asked by the sampling functions with the same (layer, band, nodata)
+    """
+    key = (config_map.qgs_layer, config_map.band, nodata)
+    if key in storage_pixel_count_by_pixel_values:
+        return
+    result = count_pixels_in_one_pass([(config_map.file_path, config_map.band, nodata, [])], task=task)
+    if result is not None:
+        storage_pixel_count_by_pixel_values[key] = result[0][0]
+
+
+def get_area_of_interest_from_config(sd_config, thematic_map, yml_file_path=None):
+    """Mask of the area of interest of the configuration rasterized onto the thematic map, None if it is not enabled"""
+    aoi_cfg = sd_config.get("area_of_interest")
+    if not aoi_cfg or not aoi_cfg.get("enabled"):
+        return None
+    path = get_config_path(aoi_cfg.get("layer_path"), yml_file_path)
+    if not path:
+        raise ValueError("The area of interest is enabled but the polygon layer is not configured")
+    aoi_layer = QgsVectorLayer(path, os.path.splitext(os.path.basename(path.split("|")[0]))[0], "ogr")
+    if not aoi_layer.isValid():
+        raise ValueError(f"Could not load the area of interest: {path}")
+    return get_aoi_mask(aoi_layer, thematic_map, (aoi_cfg.get("feature_filter") or "").strip() or None)
+
+
+def get_classes_selected(sd_cfg):
+    try:
+        classes_selected = [int(p) for p in str(sd_cfg["classes_selected_for_sampling"]).split(",")]
+    except Exception:
+        raise ValueError("The post-stratification option is enabled but none of the classes were selected")
+    return classes_selected
+
+
+def get_neighbor_aggregation(sd_cfg):
+    if not sd_cfg.get("with_neighbors_aggregation"):
+        return None
+    return int(sd_cfg["num_neighbors"]), int(sd_cfg["min_neighbors_with_the_same_class"])
+
+
+def get_random_seed(sd_cfg):
+    if not (sd_cfg.get("random_sampling_options") and sd_cfg.get("with_random_seed_by_user")):
+        return None
+    try:
+        return int(sd_cfg["random_seed_by_user"])
+    except Exception:  # nosec B110 - non-numeric seed text is kept as string seed, valid for random.seed
+        return sd_cfg["random_seed_by_user"]
+
+
+def run_sampling(
+    yaml_config,
+    output_file,
+    sampling_type=None,
+    yml_file_path=None,
+    random_seed=None,
+    sampling_engine=None,
+    task=None,
+):
+    """Generate the sampling with the sampling design saved in the AcATaMa configuration, the
+    same as the sampling design window does but without the gui
+
+    Args:
+        yaml_config (dict): the AcATaMa configuration, see load_config
+        output_file (str): the sampling file to generate (.gpkg, .shp or .fgb)
+        sampling_type (str): simple, stratified or systematic, by default the tab activated when it was saved
+        yml_file_path (str): the configuration file, for the paths relative to it
+        random_seed (int): the random seed, by default the one of the configuration (if any)
+        sampling_engine (str): the engine of the random sampling, by default the one of the configuration
+        task (HeadlessTask): to report the progress and cancel the sampling
+
+    Returns:
+        (Sampling, dict): the sampling and its sampling configuration
+    """
+    if "sampling_design" not in yaml_config:
+        raise ValueError("The AcATaMa configuration file has no sampling design")
+    sd_config = yaml_config["sampling_design"]
+    if sampling_type is None:
+        sampling_type = SAMPLING_TYPES[sd_config.get("tab_activated", 0)]
+    if sampling_type not in SAMPLING_TYPES:
+        raise ValueError(f"Unknown sampling type: {sampling_type}")
+    task = task or HeadlessTask()
+
+    thematic_map = get_map_from_config(
+        yaml_config["thematic_map"]["path"],
+        yaml_config["thematic_map"].get("band", 1),
+        yaml_config["thematic_map"].get("nodata"),
+        yml_file_path,
+    )
+    aoi_mask = get_area_of_interest_from_config(sd_config, thematic_map, yml_file_path)
+
+    # simple random sampling
+    if sampling_type == "simple":
+        sd_cfg = sd_config["simple_random_sampling"]
+        if sd_cfg.get("post_stratification"):
+            post_stratification_map = get_map_from_config(
+                sd_cfg["post_stratification_map_path"],
+                sd_cfg["post_stratification_map_band"],
+                sd_cfg.get("post_stratification_map_nodata"),
+                yml_file_path,
+            )
+            classes_selected = get_classes_selected(sd_cfg)
+        else:
+            post_stratification_map = None
+            classes_selected = None
+        if random_seed is None:
+            random_seed = get_random_seed(sd_cfg)
+        if sampling_engine is None:
+            sampling_engine = sd_cfg.get("sampling_engine") if sd_cfg.get("random_sampling_options") else None
+
+        sampling = Sampling(
+            "simple",
+            thematic_map,
+            post_stratification_map=post_stratification_map,
+            output_file=output_file,
+            aoi_mask=aoi_mask,
+        )
+        sampling_conf = {
+            "sampling_type": "simple",
+            "total_of_samples": int(sd_cfg["num_samples"]),
+            "min_distance": float(sd_cfg["min_distance"]),
+            "classes_selected": classes_selected,
+            "neighbor_aggregation": get_neighbor_aggregation(sd_cfg),
+            "random_seed": random_seed,
+            "sampling_engine": sampling_engine or "rejection",
+            "area_of_interest": aoi_mask.name if aoi_mask else None,
+        }
+        return sampling.generate_sampling_points(task, sampling_conf)
+
+    # stratified random sampling
+    if sampling_type == "stratified":
+        sd_cfg = sd_config["stratified_random_sampling"]
+        sampling_map = get_map_from_config(
+            sd_cfg["stratification_map_path"],
+            sd_cfg["stratification_map_band"],
+            sd_cfg.get("stratification_map_nodata"),
+            yml_file_path,
+        )
+        srs_table = sd_cfg.get("stratified_random_sampling_table")
+        if srs_table is None:
+            raise ValueError("The stratified random sampling table is not saved in the AcATaMa configuration file")
+        classes_for_sampling = [int(pixel_value) for pixel_value in srs_table["values_and_colors_table"]["Pixel Value"]]
+        classes_enabled = srs_table.get("On") or [True] * len(classes_for_sampling)
+        total_of_samples_by_stratum = [
+            int(num_samples) if enabled else 0
+            for num_samples, enabled in zip(srs_table["num_samples"], classes_enabled, strict=True)
+        ]
+        if any(num_samples < 0 for num_samples in total_of_samples_by_stratum):
+            raise ValueError("The number of samples should be only positive integers")
+        if sum(total_of_samples_by_stratum) == 0:
+            raise ValueError("No number of samples configured in the stratified random sampling table")
+
+        if sd_cfg["sampling_random_method"].startswith("Area based proportion"):
+            sampling_method = "area based proportion"
+            srs_config = {
+                "total_std_error": sd_cfg["overall_std_error"],
+                "ui": [float(ui) for ui in srs_table["ui"]],
+            }
+        else:
+            sampling_method = "fixed values"
+            srs_config = None
+        if random_seed is None:
+            random_seed = get_random_seed(sd_cfg)
+        if sampling_engine is None:
+            sampling_engine = sd_cfg.get("sampling_engine") if sd_cfg.get("random_sampling_options") else None
+
+        sampling = Sampling(
+            "stratified",
+            thematic_map,
+            sampling_map=sampling_map,
+            sampling_method=sampling_method,
+            srs_config=srs_config,
+            output_file=output_file,
+            aoi_mask=aoi_mask,
+        )
+        sampling_conf = {
+            "sampling_type": "stratified",
+            "total_of_samples": total_of_samples_by_stratum,
+            "min_distance": float(sd_cfg["min_distance"]),
+            "classes_selected": classes_for_sampling,
+            "neighbor_aggregation": get_neighbor_aggregation(sd_cfg),
+            "random_seed": random_seed,
+            "sampling_engine": sampling_engine or "rejection",
+            "area_of_interest": aoi_mask.name if aoi_mask else None,
+        }
+        return sampling.generate_sampling_points(task, sampling_conf)
+
+    # systematic sampling
+    sd_cfg = sd_config["systematic_sampling"]
+    if sd_cfg.get("post_stratification"):
+        post_stratification_map = get_map_from_config(
+            sd_cfg["post_stratification_map_path"],
+            sd_cfg["post_stratification_map_band"],
+            sd_cfg.get("post_stratification_map_nodata"),
+            yml_file_path,
+        )
+        classes_selected = get_classes_selected(sd_cfg)
+    else:
+        post_stratification_map = None
+        classes_selected = None
+    if random_seed is None:
+        random_seed = get_random_seed(sd_cfg)
+
+    points_spacing = float(sd_cfg["points_spacing"])
+    systematic_sampling_unit = sd_cfg.get("systematic_sampling_unit", "Distance")
+    # the nodata pixels of the thematic map for the total of samples
+    if thematic_map.nodata is not None:
+        count_map_pixels(thematic_map, None, task)
+        if task.isCanceled():
+            raise ValueError("The pixel count of the thematic map was canceled")
+    total_of_samples = get_systematic_total_of_samples(
+        thematic_map.qgs_layer, thematic_map.band, thematic_map.nodata, points_spacing, systematic_sampling_unit
+    )
+    if total_of_samples is None:
+        raise ValueError("The points spacing of the systematic sampling is not valid")
+    # define the initial inset
+    if sd_cfg.get("initial_inset_mode") == "Random":
+        # own random generator, without changing the global random state
+        initial_inset = random.Random(random_seed).uniform(0, points_spacing)  # nosec B311 - statistical sampling
+    else:
+        initial_inset = float(sd_cfg["initial_inset"])
+
+    sampling = Sampling(
+        "systematic",
+        thematic_map,
+        post_stratification_map=post_stratification_map,
+        sampling_method="grid with random offset",
+        output_file=output_file,
+        aoi_mask=aoi_mask,
+    )
+    sampling_conf = {
+        "sampling_type": "systematic",
+        "total_of_samples": total_of_samples,
+        "points_spacing": points_spacing,
+        "initial_inset": initial_inset,
+        "max_xy_offset": float(sd_cfg["max_xy_offset"]),
+        "classes_selected": classes_selected,
+        "neighbor_aggregation": get_neighbor_aggregation(sd_cfg),
+        "random_seed": random_seed,
+        # the per-pixel coverage is not saved in the configuration, the default of the window
+        "confidence_level": 0.95,
+        "area_of_interest": aoi_mask.name if aoi_mask else None,
+    }
+    if systematic_sampling_unit == "Pixels":
+        return sampling.generate_systematic_sampling_points_by_pixels(task, sampling_conf)
+    return sampling.generate_systematic_sampling_points_by_distance(task, sampling_conf)
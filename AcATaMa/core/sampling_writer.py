@@ -0,0 +1,112 @@
+"""
+/***************************************************************************
+ AcATaMa
+                                 A QGIS plugin
+ AcATaMa is a Qgis plugin for Accuracy Assessment of Thematic Maps
+                              -------------------
+        copyright            : (C) 2017-2026 by Xavier C. Llano, SMByC
+        email                : xavier.corredor.llano@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+import os
+
+from osgeo import gdal, ogr, osr
+from qgis.core import Qgis
+
+# output vector drivers for the sampling file by its extension
+SAMPLING_OUTPUT_DRIVERS = {
+    ".gpkg": "GPKG",
+    ".shp": "ESRI Shapefile",
+    ".fgb": "FlatGeobuf",
+}
+
+
+class SamplingFileWriter:
+    """Write the sampling points with OGR in bulk, adding the features by large batches each one
+    inside a transaction, and building the spatial index once after all the points are inserted
+    """
+
+    batch_size = 100000
+
+    def __init__(self, output_file, crs, driver_name=None):
+        """
+        Args:
+            output_file (str): the output file, it is overwritten if exists
+            crs (QgsCoordinateReferenceSystem): crs of the sampling points
+            driver_name (str): the OGR driver, by default based on the extension of the file
+        """
+        self.output_file = output_file
+        self.driver_name = driver_name or SAMPLING_OUTPUT_DRIVERS.get(os.path.splitext(output_file)[1].lower())
+        if self.driver_name is None:
+            raise ValueError(f"The output format of the sampling file is not supported: {output_file}")
+        driver = ogr.GetDriverByName(self.driver_name)
+        if os.path.exists(output_file):
+            driver.DeleteDataSource(output_file)
+
+        self.dataset = driver.CreateDataSource(output_file)
+        if self.dataset is None:
+            raise OSError(f"Error creating the sampling file {output_file}: {gdal.GetLastErrorMsg()}")
+
+        srs = None
+        if crs.isValid():
+            srs = osr.SpatialReference()
+            srs.ImportFromWkt(crs.toWkt(Qgis.CrsWktVariant.PreferredGdal))
+            srs.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+
+        # the spatial index of the geopackage is built after the bulk insert
+        layer_options = ["SPATIAL_INDEX=NO"] if self.driver_name == "GPKG" else []
+        self.layer_name = os.path.splitext(os.path.basename(output_file))[0]
+        self.layer = self.dataset.CreateLayer(self.layer_name, srs, ogr.wkbPoint, options=layer_options)
+        field = ogr.FieldDefn("id", ogr.OFTInteger)
+        field.SetWidth(10)
+        self.layer.CreateField(field)
+        self.total_points = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close(build_spatial_index=exc_type is None)
+
+    def add_points(self, xs, ys):
+        """Add the points in the order given, with consecutive ids from 1 for the whole file"""
+        with_transactions = self.dataset.TestCapability(ogr.ODsCTransactions)
+        feature = ogr.Feature(self.layer.GetLayerDefn())
+        point = ogr.Geometry(ogr.wkbPoint)
+        for batch_start in range(0, len(xs), self.batch_size):
+            batch_end = batch_start + self.batch_size
+            if with_transactions:
+                self.dataset.StartTransaction()
+            for x, y in zip(xs[batch_start:batch_end], ys[batch_start:batch_end], strict=True):
+                self.total_points += 1
+                point.SetPoint_2D(0, float(x), float(y))
+                feature.SetFID(ogr.NullFID)
+                feature.SetField(0, self.total_points)
+                feature.SetGeometry(point)
+                self.layer.CreateFeature(feature)
+            if with_transactions:
+                self.dataset.CommitTransaction()
+
+    def close(self, build_spatial_index=True):
+        if self.dataset is None:
+            return
+        if build_spatial_index and self.total_points:
+            if self.driver_name == "GPKG":
+                layer_name = self.layer_name.replace("'", "''")
+                result = self.dataset.ExecuteSQL(f"SELECT CreateSpatialIndex('{layer_name}', 'geom')")
+                self.dataset.ReleaseResultSet(result)
+            elif self.driver_name == "ESRI Shapefile":
+                self.dataset.ExecuteSQL(f'CREATE SPATIAL INDEX ON "{self.layer_name}"')
+        self.layer = None
+        self.dataset.FlushCache()
+        self.dataset = None
@@ -184,7 +184,7 @@ class AcATaMaDockWidget(QDockWidget, FORM_CLASS):
                 self,
                 self.QCBox_SamplingFile,
                 dialog_title=self.tr("Select the Sampling points file"),
-                file_filters=self.tr("Vector files (*.gpkg *.shp);;All files (*.*)"),
+                file_filters=self.tr("Vector files (*.gpkg *.shp *.fgb);;All files (*.*)"),
             )
         )
         # call to reload sampling file
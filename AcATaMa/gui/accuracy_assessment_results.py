@@ -711,8 +711,8 @@ def get_html(accu_asse):
     return html
 
 
-@error_handler
-def export_to_csv(accu_asse, file_out, csv_separator, csv_decimal_separator):
+def get_csv_rows(accu_asse):
+    """All the accuracy assessment results as the rows of the csv file"""
     csv_rows = []
     csv_rows.append(["Analysis - Accuracy assessment results"])
     csv_rows.append([])
@@ -1092,14 +1092,29 @@ def export_to_csv(accu_asse, file_out, csv_separator, csv_decimal_separator):
 
     csv_rows.append(["total", rf(total_area)])
 
+    return csv_rows
+
+
+def write_csv(accu_asse, file_out, csv_separator, csv_decimal_separator, csv_rows=None):
+    """Write the accuracy assessment results in the csv file, without the gui, with the csv rows
+    already computed (see get_csv_rows) or computed here if not given
+    """
+    if csv_rows is None:
+        csv_rows = get_csv_rows(accu_asse)
+
     # write CSV file
     with open(file_out, "w") as csvfile:
         csv_w = csv.writer(csvfile, delimiter=str(csv_separator))
         # replace with the user define decimal separator
         if csv_decimal_separator != ".":
-            for idx, row in enumerate(csv_rows):
-                csv_rows[idx] = [
-                    str(item).replace(".", csv_decimal_separator) if isinstance(item, float) else item for item in row
-                ]
+            csv_rows = [
+                [str(item).replace(".", csv_decimal_separator) if isinstance(item, float) else item for item in row]
+                for row in csv_rows
+            ]
 
         csv_w.writerows(csv_rows)
+
+
+@error_handler
+def export_to_csv(accu_asse, file_out, csv_separator, csv_decimal_separator):
+    write_csv(accu_asse, file_out, csv_separator, csv_decimal_separator)
@@ -53,7 +53,7 @@ from qgis.PyQt.QtWidgets import (
 from qgis.PyQt.sip import isdeleted
 from qgis.utils import iface
 
-from AcATaMa.core.map import get_values_and_colors_table
+from AcATaMa.core.map import Map, get_values_and_colors_table
 from AcATaMa.core.response_design import ResponseDesign
 from AcATaMa.gui.response_design_view_widget import LabelingViewWidget
 from AcATaMa.utils.others_utils import get_decimal_places, get_nodata_format
@@ -81,6 +81,7 @@ class ResponseDesignWindow(QDialog, FORM_CLASS):
     def __init__(self, sampling_layer, columns, rows):
         QDialog.__init__(self)
         self.sampling_layer = sampling_layer
+        self.thematic_map = None
         self.setupUi(self)
         ResponseDesignWindow.inst = self
 
@@ -291,6 +292,8 @@ class ResponseDesignWindow(QDialog, FORM_CLASS):
         from AcATaMa.gui.acatama_dockwidget import AcATaMaDockWidget as AcATaMa
 
         ResponseDesignWindow.is_opened = True
+        # the thematic map can't be changed while the response design window is opened
+        self.set_thematic_map()
         # adjust some objects in the dockwidget while response design window is opened
         AcATaMa.dockwidget.QGBox_ThematicMap.setDisabled(True)
         AcATaMa.dockwidget.QGBox_SamplingDesign.setDisabled(True)
@@ -301,6 +304,16 @@ class ResponseDesignWindow(QDialog, FORM_CLASS):
         super().show()
         self.show_and_go_to_current_sample()
 
+    def set_thematic_map(self):
+        """Set the thematic map used to get the pixel edges of the samples"""
+        from AcATaMa.gui.acatama_dockwidget import AcATaMaDockWidget as AcATaMa
+
+        self.thematic_map = None
+        if valid_file_selected_in(AcATaMa.dockwidget.QCBox_ThematicMap):
+            data_provider = AcATaMa.dockwidget.QCBox_ThematicMap.currentLayer().dataProvider()
+            if data_provider.capabilities() and data_provider.xSize() and data_provider.ySize():
+                self.thematic_map = Map(AcATaMa.dockwidget.QCBox_ThematicMap)
+
     def set_current_sample(self):
         # clear all message bar
         self.MsgBar.clearWidgets()
@@ -325,10 +338,8 @@ class ResponseDesignWindow(QDialog, FORM_CLASS):
     def go_to_sample_id(self):
         try:
             sample_id = int(self.GoTo_ID.text())
-            # find the sample point with ID
-            sample_point = next((x for x in self.response_design.points if x.sample_id == sample_id), None)
-            # go to sample
-            self.current_sample_idx = self.response_design.points.index(sample_point)
+            # go to the sample point with ID
+            self.current_sample_idx = self.response_design.sample_idx_by_id[sample_id]
             self.set_current_sample()
         except Exception:
             self.GoTo_ID.setStyleSheet("color: red")
@@ -487,7 +498,7 @@ class ResponseDesignWindow(QDialog, FORM_CLASS):
 
     def highlight_thematic_pixel(self):
         # highlight thematic pixel respectively of the current sampling point
-        thematic_pixel = self.current_sample.get_thematic_pixel_edges()
+        thematic_pixel = self.current_sample.get_thematic_pixel_edges(self.thematic_map)
         if thematic_pixel and self.current_sample.label_id:
             fill_color = QColor(self.response_design.buttons_config[self.current_sample.label_id]["color"])
             highlight_pixel_tile = Tile(*thematic_pixel, QColor("black"), fill_color=fill_color)
@@ -520,7 +531,7 @@ class ResponseDesignWindow(QDialog, FORM_CLASS):
         pixel_buffer = int(self.SamplingUnit_Size.currentText())
         self.response_design.sampling_unit_pixel_buffer = pixel_buffer
         if pixel_buffer > 0:
-            sampling_unit = self.current_sample.get_thematic_pixel_edges(with_buffer=pixel_buffer)
+            sampling_unit = self.current_sample.get_thematic_pixel_edges(self.thematic_map, with_buffer=pixel_buffer)
             if sampling_unit:
                 self.sampling_unit = Tile(*sampling_unit, self.response_design.sampling_unit_color)
                 self.sampling_unit.show()
@@ -530,7 +541,7 @@ class ResponseDesignWindow(QDialog, FORM_CLASS):
         # show the edges of the thematic pixel of the current sample
         if self.pixel_tile:
             self.pixel_tile.hide()
-        thematic_pixel = self.current_sample.get_thematic_pixel_edges()
+        thematic_pixel = self.current_sample.get_thematic_pixel_edges(self.thematic_map)
         if thematic_pixel:
             self.pixel_tile = Tile(*thematic_pixel, QColor("black"))
             self.pixel_tile.show()
@@ -565,16 +576,9 @@ class ResponseDesignWindow(QDialog, FORM_CLASS):
 
     @pyqtSlot()
     def next_sample_not_labeled(self):
-        tmp_sample_idx = self.current_sample_idx + 1
-        while (
-            tmp_sample_idx < len(self.response_design.points) and self.response_design.points[tmp_sample_idx].is_labeled
-        ):
-            tmp_sample_idx += 1
-        if (
-            tmp_sample_idx < len(self.response_design.points)
-            and not self.response_design.points[tmp_sample_idx].is_labeled
-        ):
-            self.current_sample_idx = tmp_sample_idx
+        sample_idx = self.response_design.get_next_sample_not_labeled(self.current_sample_idx)
+        if sample_idx is not None:
+            self.current_sample_idx = sample_idx
             self.set_current_sample()
 
     @pyqtSlot()
@@ -586,11 +590,9 @@ class ResponseDesignWindow(QDialog, FORM_CLASS):
 
     @pyqtSlot()
     def previous_sample_not_labeled(self):
-        tmp_sample_idx = self.current_sample_idx - 1
-        while self.response_design.points[tmp_sample_idx].is_labeled and tmp_sample_idx >= 0:
-            tmp_sample_idx -= 1
-        if not self.response_design.points[tmp_sample_idx].is_labeled and tmp_sample_idx >= 0:
-            self.current_sample_idx = tmp_sample_idx
+        sample_idx = self.response_design.get_previous_sample_not_labeled(self.current_sample_idx)
+        if sample_idx is not None:
+            self.current_sample_idx = sample_idx
             self.set_current_sample()
 
     def eventFilter(self, obj, event):
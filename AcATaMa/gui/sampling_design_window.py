@@ -18,24 +18,29 @@
  ***************************************************************************/
 """
 
+import math
 import os
 import sys
 
 from qgis.core import Qgis, QgsMapLayerProxyModel, QgsUnitTypes
 from qgis.PyQt import uic
 from qgis.PyQt.QtCore import Qt, pyqtSlot
-from qgis.PyQt.QtWidgets import QDialog, QDialogButtonBox
+from qgis.PyQt.QtWidgets import QDialog, QDialogButtonBox, QHeaderView, QProgressBar, QPushButton, QTableWidgetItem
 from qgis.utils import iface
 
 from AcATaMa.core.map import get_nodata_value
 from AcATaMa.core.sampling_design import (
+    SAMPLING_ENGINES,
     do_simple_random_sampling,
     do_stratified_random_sampling,
     do_systematic_sampling,
+    get_systematic_total_of_samples,
 )
+from AcATaMa.core.sampling_queue import SamplingJobQueue
 from AcATaMa.gui.determine_num_samples_dialog import DetermineNumberSamplesDialog
 from AcATaMa.gui.post_stratification_classes_dialog import PostStratificationClassesDialog
 from AcATaMa.utils.others_utils import (
+    count_pixels_in_background,
     get_decimal_places,
     get_nodata_format,
     get_pixel_count_by_pixel_values,
@@ -73,6 +78,9 @@ class SamplingDesignWindow(QDialog, FORM_CLASS):
         self.widget_SimpRSwithPS.setHidden(True)
         self.widget_neighbour_aggregation_SimpRS.setHidden(True)
         self.widget_random_sampling_options_SimpRS.setHidden(True)
+        # sampling engines
+        for engine, engine_name in SAMPLING_ENGINES.items():
+            self.QCBox_SamplingEngine_SimpRS.addItem(engine_name, engine)
         # number of samples
         self.determine_number_samples_dialog_SimpRS = DetermineNumberSamplesDialog()
         self.determine_number_samples_dialog_SimpRS.adjustSize()
@@ -116,6 +124,9 @@ class SamplingDesignWindow(QDialog, FORM_CLASS):
         # ######### stratified random sampling ######### #
         self.widget_neighbour_aggregation_StraRS.setHidden(True)
         self.widget_random_sampling_options_StraRS.setHidden(True)
+        # sampling engines
+        for engine, engine_name in SAMPLING_ENGINES.items():
+            self.QCBox_SamplingEngine_StraRS.addItem(engine_name, engine)
         # set properties to QgsMapLayerComboBox
         self.QCBox_SamplingMap_StraRS.setCurrentIndex(-1)
         self.QCBox_SamplingMap_StraRS.setFilters(QgsMapLayerProxyModel.Filter.RasterLayer)
@@ -216,6 +227,31 @@ class SamplingDesignWindow(QDialog, FORM_CLASS):
             )
         )
 
+        # ######### area of interest ######### #
+        self.QCBox_AreaOfInterest.setCurrentIndex(-1)
+        self.QCBox_AreaOfInterest.setFilters(QgsMapLayerProxyModel.Filter.PolygonLayer)
+        self.QPBtn_browseAreaOfInterest.clicked.connect(
+            lambda: browse_dialog_to_load_file(
+                self,
+                self.QCBox_AreaOfInterest,
+                dialog_title=self.tr("Select the polygons of the area of interest"),
+                file_filters=self.tr("Vector files (*.gpkg *.shp *.fgb);;All files (*.*)"),
+                msg_bar=self.MsgBar,
+            )
+        )
+
+        # ######### sampling jobs ######### #
+        self.QGBox_SamplingJobs.setHidden(True)
+        self.QTableW_SamplingJobs.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+        self.tracked_sampling_jobs = {}  # the last job and its total of samples by progress bar name
+        sampling_job_queue = SamplingJobQueue.instance()
+        with block_signals_to(self.QSBox_ParallelJobs):
+            self.QSBox_ParallelJobs.setValue(sampling_job_queue.max_parallel_jobs)
+        self.QSBox_ParallelJobs.valueChanged.connect(sampling_job_queue.set_max_parallel_jobs)
+        self.QPBtn_ClearSamplingJobs.clicked.connect(self.clear_done_sampling_jobs)
+        sampling_job_queue.job_added.connect(self.add_sampling_job)
+        sampling_job_queue.job_updated.connect(self.update_sampling_job)
+
         # dialog buttons box
         self.closeButton.rejected.connect(self.closing)
         # disable enter action
@@ -588,29 +624,91 @@ class SamplingDesignWindow(QDialog, FORM_CLASS):
 
         from AcATaMa.gui.acatama_dockwidget import AcATaMaDockWidget as AcATaMa
 
-        systematic_sampling_unit = self.QCBox_Systematic_Sampling_Unit.currentText()
-        point_spacing_by_pixel = point_spacing / (
-            self.thematic_map_layer.rasterUnitsPerPixelX() if systematic_sampling_unit == "Distance" else 1
+        band = int(AcATaMa.dockwidget.QCBox_band_ThematicMap.currentText())
+        nodata = get_nodata_format(AcATaMa.dockwidget.nodata_ThematicMap.text())
+        # the valid pixels need the pixel count of the thematic map, meanwhile it is counted in
+        # background the maximum is estimated with the approximate pixel count, and it is updated
+        # when the count finishes
+        approximate = (
+            nodata is not None
+            and count_pixels_in_background(
+                [(self.thematic_map_layer, band, None)],
+                on_finished=lambda pixel_counts: (
+                    self.update_systematic_sampling_progressbar(self.PointSpacing_SystS.value())
+                    if pixel_counts
+                    else None
+                ),
+            )
+            is not None
         )
-        # total number of pixels
-        map_width = self.thematic_map_layer.width()
-        map_height = self.thematic_map_layer.height()
-        total_pixels = map_width * map_height
-        # total valid pixels
-        map_nodata = get_nodata_format(AcATaMa.dockwidget.nodata_ThematicMap.text())
-        if map_nodata is not None:
-            band = int(AcATaMa.dockwidget.QCBox_band_ThematicMap.currentText())
-            total_nodata_pixels = get_pixel_count_by_pixel_values(self.thematic_map_layer, band, None, None)[map_nodata]
-            total_valid_pixels = total_pixels - total_nodata_pixels
-        else:
-            total_valid_pixels = total_pixels
 
-        try:
-            max_samples = ((total_valid_pixels**0.5) / point_spacing_by_pixel + 1) ** 2
-        except ZeroDivisionError:
-            return
-        if max_samples < 2147483647:
-            self.QPBar_GenerateSamples_SystS.setMaximum(round(max_samples))
+        max_samples = get_systematic_total_of_samples(
+            self.thematic_map_layer,
+            band,
+            nodata,
+            point_spacing,
+            self.QCBox_Systematic_Sampling_Unit.currentText(),
+            approximate=approximate,
+        )
+        if max_samples is not None:
+            self.QPBar_GenerateSamples_SystS.setMaximum(max_samples)
+
+    def track_sampling_job(self, sampling_job, progress_bar, total_of_samples):
+        """The progress bar of the sampling tab follows the progress of the last job queued from it"""
+        self.tracked_sampling_jobs[progress_bar.objectName()] = (sampling_job, total_of_samples)
+        progress_bar.setValue(0)
+
+    def get_sampling_job_row(self, job_id):
+        for row in range(self.QTableW_SamplingJobs.rowCount()):
+            if self.QTableW_SamplingJobs.item(row, 0).data(Qt.ItemDataRole.UserRole) == job_id:
+                return row
+
+    @pyqtSlot(object)
+    def add_sampling_job(self, sampling_job):
+        row = self.QTableW_SamplingJobs.rowCount()
+        self.QTableW_SamplingJobs.insertRow(row)
+        item_description = QTableWidgetItem(sampling_job.description)
+        item_description.setData(Qt.ItemDataRole.UserRole, sampling_job.job_id)
+        item_description.setToolTip(sampling_job.description)
+        self.QTableW_SamplingJobs.setItem(row, 0, item_description)
+        self.QTableW_SamplingJobs.setItem(row, 1, QTableWidgetItem(sampling_job.status))
+        progress_bar = QProgressBar()
+        progress_bar.setRange(0, 100)
+        self.QTableW_SamplingJobs.setCellWidget(row, 2, progress_bar)
+        cancel_button = QPushButton(self.tr("Cancel"))
+        cancel_button.setCursor(Qt.CursorShape.PointingHandCursor)
+        cancel_button.clicked.connect(
+            lambda checked=False, job_id=sampling_job.job_id: SamplingJobQueue.instance().cancel_job(job_id)
+        )
+        self.QTableW_SamplingJobs.setCellWidget(row, 3, cancel_button)
+        self.QGBox_SamplingJobs.setVisible(True)
+
+    @pyqtSlot(object)
+    def update_sampling_job(self, sampling_job):
+        row = self.get_sampling_job_row(sampling_job.job_id)
+        if row is not None:
+            self.QTableW_SamplingJobs.item(row, 1).setText(sampling_job.status)
+            self.QTableW_SamplingJobs.cellWidget(row, 2).setValue(int(sampling_job.progress))
+            self.QTableW_SamplingJobs.cellWidget(row, 3).setEnabled(not sampling_job.is_done)
+
+        for progress_bar_name, (tracked_job, total_of_samples) in list(self.tracked_sampling_jobs.items()):
+            if tracked_job is not sampling_job:
+                continue
+            progress_bar = getattr(self, progress_bar_name)
+            if sampling_job.is_done:
+                progress_bar.setValue(0)
+                del self.tracked_sampling_jobs[progress_bar_name]
+            else:
+                progress_bar.setValue(math.ceil(total_of_samples * sampling_job.progress / 100))
+
+    @pyqtSlot()
+    def clear_done_sampling_jobs(self):
+        sampling_job_queue = SamplingJobQueue.instance()
+        sampling_job_queue.clear_done_jobs()
+        for row in reversed(range(self.QTableW_SamplingJobs.rowCount())):
+            if self.QTableW_SamplingJobs.item(row, 0).data(Qt.ItemDataRole.UserRole) not in sampling_job_queue.jobs:
+                self.QTableW_SamplingJobs.removeRow(row)
+        self.QGBox_SamplingJobs.setVisible(self.QTableW_SamplingJobs.rowCount() > 0)
 
     @pyqtSlot()
     def clear(self):
@@ -42,7 +42,10 @@ def rf(fv, r=5):
     return round(fv, r)
 
 
-def get_samples_distribution_table(map_layer, points, area_unit):
+def get_samples_distribution_table(map_layer, map_values, area_unit):
+    """Distribution of the samples by the pixel values of the map, from the values of the map in the
+    samples (nan for nodata or outside)
+    """
     table = {
         "pix_val": [],
         "color": [],
@@ -51,12 +54,8 @@ def get_samples_distribution_table(map_layer, points, area_unit):
         "total_area": [],
     }
 
-    samples_in_pix_val = {}
-    for point in points:
-        map_value = map_layer.get_pixel_value_from_pnt(point)
-        if map_value not in samples_in_pix_val:
-            samples_in_pix_val[map_value] = 0
-        samples_in_pix_val[map_value] += 1
+    pix_vals, num_samples = np.unique(map_values[~np.isnan(map_values)], return_counts=True)
+    samples_in_pix_val = {float(pix_val): int(num) for pix_val, num in zip(pix_vals, num_samples, strict=True)}
 
     values_and_colors_table = get_values_and_colors_table(map_layer.qgs_layer, map_layer.band, map_layer.nodata)
     pixel_area_base = map_layer.qgs_layer.rasterUnitsPerPixelX() * map_layer.qgs_layer.rasterUnitsPerPixelY()
@@ -135,7 +134,7 @@ class SamplingReport(QDialog, FORM_CLASS):
 
         thematic_map_table = get_samples_distribution_table(
             self.sampling.thematic_map,
-            self.sampling.points.values(),
+            self.sampling.points.thematic_value,
             Qgis.AreaUnit(self.area_unit.currentIndex()),
         )
 
@@ -168,7 +167,7 @@ class SamplingReport(QDialog, FORM_CLASS):
         ):
             post_stratification_table = get_samples_distribution_table(
                 self.sampling.post_stratification_map,
-                self.sampling.points.values(),
+                self.sampling.post_stratification_map.read_values(self.sampling.points.x, self.sampling.points.y),
                 Qgis.AreaUnit(self.area_unit.currentIndex()),
             )
         else:
@@ -181,7 +180,7 @@ class SamplingReport(QDialog, FORM_CLASS):
             sampling_map = self.sampling.sampling_map.qgs_layer.name()
             sampling_map_table = get_samples_distribution_table(
                 self.sampling.sampling_map,
-                self.sampling.points.values(),
+                self.sampling.sampling_map.read_values(self.sampling.points.x, self.sampling.points.y),
                 Qgis.AreaUnit(self.area_unit.currentIndex()),
             )
         else:
@@ -217,6 +216,10 @@ class SamplingReport(QDialog, FORM_CLASS):
                 "random_seed": self.sampling_conf["random_seed"]
                 if self.sampling_conf["random_seed"] is not None
                 else "Auto",
+                "sampling_engine": self.sampling_conf.get("sampling_engine", "rejection").replace("_", " ")
+                if self.sampling_conf["sampling_type"] in ["simple", "stratified"]
+                else None,
+                "area_of_interest": self.sampling_conf.get("area_of_interest"),
                 "area_unit": self.area_unit.currentIndex(),
             },
             "samples": {
@@ -409,7 +412,6 @@ class SamplingReport(QDialog, FORM_CLASS):
                     <th>Random Seed</th>
                     <td>{random_seed}</td>
                 </tr>
-            </table>
             """.format(
             neighbor_aggregation="{}/{}".format(
                 self.report["general"]["neighbor_aggregation"][1], self.report["general"]["neighbor_aggregation"][0]
@@ -418,6 +420,23 @@ class SamplingReport(QDialog, FORM_CLASS):
             else None,
             random_seed=self.report["general"]["random_seed"],
         )
+        if self.report["general"].get("sampling_engine"):
+            html += """
+                    <tr>
+                        <th>Sampling Engine</th>
+                        <td>{sampling_engine}</td>
+                    </tr>
+                """.format(sampling_engine=self.report["general"]["sampling_engine"])
+        if self.report["general"].get("area_of_interest"):
+            html += """
+                    <tr>
+                        <th>Area of Interest</th>
+                        <td>{area_of_interest}</td>
+                    </tr>
+                """.format(area_of_interest=self.report["general"]["area_of_interest"])
+        html += """
+            </table>
+            """
 
         html += """
             <h3>Distribution of samples on the thematic map</h3>
@@ -734,6 +753,10 @@ class SamplingReport(QDialog, FORM_CLASS):
             ]
         )
         rows.append(["Random Seed", general["random_seed"]])
+        if general.get("sampling_engine"):
+            rows.append(["Sampling Engine", general["sampling_engine"]])
+        if general.get("area_of_interest"):
+            rows.append(["Area of Interest", general["area_of_interest"]])
         rows.append([])
 
         def _distribution_rows(title, table, samples_not_in_map_key, not_in_map_label, include_color=True):
@@ -18,15 +18,24 @@
  ***************************************************************************/
 """
 
+import hashlib
 import importlib.util
+import json
+import math
+import os
 import re
+import threading
 import xml.etree.ElementTree as ET  # nosec B405 - parses only QGIS-generated style XML, not untrusted input
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 import numpy as np
-from osgeo import gdal, gdal_array
-from qgis.core import Qgis
-from qgis.PyQt.QtCore import Qt
+from osgeo import gdal
+from qgis.core import Qgis, QgsApplication, QgsTask
+from qgis.PyQt.QtCore import QSettings, Qt
 from qgis.PyQt.QtWidgets import QApplication, QProgressDialog
+from qgis.utils import iface
 
 from AcATaMa.utils.qgis_utils import get_source_from
 from AcATaMa.utils.system_utils import wait_process
@@ -105,7 +114,8 @@ def get_unique_values(layer, band, chunk_size=1000):
     return sorted(unique_values)
 
 
-def get_unique_pixel_values(layer, band, nodata=None):
+def get_symbology_pixel_values(layer, band):
+    """Pixel values of the classes defined in the xml color style of the layer"""
     current_style = layer.styleManager().currentStyle()
     layer_style = layer.styleManager().style(current_style)
     xml_style_str = layer_style.xmlData()
@@ -117,9 +127,11 @@ def get_unique_pixel_values(layer, band, nodata=None):
         # for unique values
         items = xml_style.findall(f'pipe/rasterrenderer[@band="{band}"]/colorPalette/paletteEntry')
 
-    unique_values = []
-    for item in items:
-        unique_values.append(int(item.get("value")))
+    return [int(item.get("value")) for item in items]
+
+
+def get_unique_pixel_values(layer, band, nodata=None):
+    unique_values = get_symbology_pixel_values(layer, band)
 
     # fallback to get the unique values if no xml color style is defined in the layer
     if not unique_values:
@@ -135,18 +147,186 @@ def get_unique_pixel_values(layer, band, nodata=None):
 # --------------------------------------------------------------------------
 # compute pixels count by pixel unique values
 
-storage_pixel_count_by_pixel_values = {}  # storage the pixel/values computed by layer, band and nodata
+
+def get_pixel_count_cache_dir():
+    """Directory of the pixel count cache on disk, saved in the QGIS setting "AcATaMa/pixel_count_cache_dir"
+    (by default in the QGIS profile directory)
+    """
+    default_cache_dir = os.path.join(QgsApplication.qgisSettingsDirPath(), "AcATaMa", "pixel_count_cache")
+    return QSettings().value("AcATaMa/pixel_count_cache_dir", default_cache_dir, type=str)
+
+
+class PixelCountStorage(MutableMapping):
+    """Storage of the pixel count by pixel values computed by (layer, band, nodata)
+
+    It keeps the last ones used in memory (LRU) and all of them on disk, keyed by the file path, band
+    and nodata, so they survive restarting QGIS and reloading the layer. The file size and
+    modification time are saved with each one, if the file changes the pixel count is discarded.
+    Layers that are not files (or not layers) are only kept in memory.
+    """
+
+    def __init__(self, max_items_in_memory=32, cache_dir=None):
+        self.max_items_in_memory = max_items_in_memory
+        self.cache_dir = cache_dir
+        self.memory = OrderedDict()  # {(layer, band, nodata): (file signature, pixel count)}
+
+    @staticmethod
+    def get_file_signature(layer):
+        try:
+            source = get_source_from(layer)
+            stat = os.stat(source)
+        except Exception:
+            return None
+        return source, stat.st_size, stat.st_mtime_ns
+
+    def get_cache_file(self, file_signature, band, nodata):
+        cache_key = json.dumps([file_signature[0], band, nodata])
+        cache_dir = self.cache_dir or get_pixel_count_cache_dir()
+        return os.path.join(cache_dir, hashlib.sha1(cache_key.encode(), usedforsecurity=False).hexdigest() + ".json")
+
+    def load_from_disk(self, file_signature, band, nodata):
+        cache_file = self.get_cache_file(file_signature, band, nodata)
+        try:
+            with open(cache_file, encoding="utf-8") as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if cached["file_size"] != file_signature[1] or cached["file_mtime"] != file_signature[2]:
+            # the file changed
+            os.remove(cache_file)
+            return None
+        return dict(cached["pixel_count"])
+
+    def save_on_disk(self, file_signature, band, nodata, pixel_count):
+        cache_file = self.get_cache_file(file_signature, band, nodata)
+        cached = {
+            "source": file_signature[0],
+            "file_size": file_signature[1],
+            "file_mtime": file_signature[2],
+            "band": band,
+            "nodata": nodata,
+            "pixel_count": [[value, count] for value, count in pixel_count.items()],
+        }
+        try:
+            os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+            with open(cache_file + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(cached, f, default=lambda value: value.item())
+            os.replace(cache_file + ".tmp", cache_file)
+        except OSError:  # nosec B110 - the cache on disk is optional
+            pass
+
+    def remember(self, key, file_signature, pixel_count):
+        self.memory[key] = (file_signature, pixel_count)
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_items_in_memory:
+            self.memory.popitem(last=False)
+
+    def get(self, key, default=None):
+        layer, band, nodata = key
+        file_signature = self.get_file_signature(layer)
+        if key in self.memory:
+            memory_signature, pixel_count = self.memory[key]
+            if memory_signature == file_signature:
+                self.memory.move_to_end(key)
+                return pixel_count
+            del self.memory[key]
+        if file_signature is None:
+            return default
+        pixel_count = self.load_from_disk(file_signature, band, nodata)
+        if pixel_count is None:
+            return default
+        self.remember(key, file_signature, pixel_count)
+        return pixel_count
+
+    def __getitem__(self, key):
+        pixel_count = self.get(key)
+        if pixel_count is None:
+            raise KeyError(key)
+        return pixel_count
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __setitem__(self, key, pixel_count):
+        layer, band, nodata = key
+        file_signature = self.get_file_signature(layer)
+        self.remember(key, file_signature, pixel_count)
+        if file_signature is not None:
+            self.save_on_disk(file_signature, band, nodata, pixel_count)
+
+    def set_in_memory(self, key, pixel_count):
+        """Keep the pixel count only in memory, for the ones not computed from the current file
+        (e.g. restored from a config file) that must not be saved on disk as valid for it
+        """
+        layer, _, _ = key
+        self.remember(key, self.get_file_signature(layer), pixel_count)
+
+    def __delitem__(self, key):
+        layer, band, nodata = key
+        self.memory.pop(key, None)
+        file_signature = self.get_file_signature(layer)
+        if file_signature is not None:
+            cache_file = self.get_cache_file(file_signature, band, nodata)
+            if os.path.isfile(cache_file):
+                os.remove(cache_file)
+
+    def __iter__(self):
+        return iter(list(self.memory))
+
+    def __len__(self):
+        return len(self.memory)
+
+    def clear(self, on_disk=False):
+        """Clear the pixel counts in memory, and the ones on disk only with on_disk"""
+        self.memory.clear()
+        if not on_disk:
+            return
+        cache_dir = self.cache_dir or get_pixel_count_cache_dir()
+        if os.path.isdir(cache_dir):
+            for file_name in os.listdir(cache_dir):
+                if file_name.endswith(".json"):
+                    os.remove(os.path.join(cache_dir, file_name))
+
+
+# storage the pixel/values computed by layer, band and nodata
+storage_pixel_count_by_pixel_values = PixelCountStorage()
+
+
+# backends to compute the pixel count, "auto" is dask when available, else the QGIS native
+# algorithm, else the sequential processing
+PIXEL_COUNT_BACKENDS = ("auto", "dask", "threads", "qgis native", "sequential")
+
+
+def get_pixel_count_backend():
+    """Backend to compute the pixel count, saved in the QGIS setting "AcATaMa/pixel_count_backend",
+    by default auto
+    """
+    backend = QSettings().value("AcATaMa/pixel_count_backend", "auto", type=str)
+    return backend if backend in PIXEL_COUNT_BACKENDS else "auto"
+
+
+def get_pixel_count_workers():
+    """Number of threads for the threads backend of the pixel count, it can be tuned per machine with
+    the QGIS setting "AcATaMa/pixel_count_workers", by default the number of CPU cores
+    """
+    return max(QSettings().value("AcATaMa/pixel_count_workers", os.cpu_count() or 1, type=int), 1)
 
 
-def get_pixel_count_by_pixel_values(layer, band, pixel_values=None, nodata=None):
+def get_pixel_count_by_pixel_values(layer, band, pixel_values=None, nodata=None, backend=None):
     """Meta function to compute the pixel count by pixel values"""
 
     # check if it was already computed, then return it
     if (layer, band, nodata) in storage_pixel_count_by_pixel_values:
         return storage_pixel_count_by_pixel_values[(layer, band, nodata)]
 
+    backend = backend or get_pixel_count_backend()
+    if backend == "threads":
+        return get_pixel_count_by_pixel_values_threads(layer, band, pixel_values, nodata)
+    if backend == "sequential":
+        return get_pixel_count_by_pixel_values_sequential(layer, band, pixel_values, nodata)
+
     # Try parallel processing with dask when available
-    if dask_is_available():
+    if backend in ("auto", "dask") and dask_is_available():
         pixel_count = get_pixel_count_by_pixel_values_parallel(layer, band, pixel_values, nodata)
         if pixel_count is not None:
             return pixel_count
@@ -248,6 +428,49 @@ def get_pixel_count_by_pixel_values_qgis_native(layer, band, pixel_values=None,
         raise e
 
 
+# --------------------------------------------------------------------------
+# histogram kernel
+
+# max range of the pixel values (max - min) of a block to count them with np.bincount,
+# blocks with a larger range (sparse large values) are counted with np.unique
+MAX_BINCOUNT_RANGE = 2**20
+
+
+def get_histogram(block):
+    """Pixel values and its count in the block, for integer blocks (thematic maps are byte or
+    integer) with a small range of values it uses np.bincount offset by the minimum value, a
+    single pass without sorting, else np.unique
+
+    Returns:
+        (list, list): the pixel values and the count of each one
+    """
+    if block.size == 0:
+        return [], []
+    if np.issubdtype(block.dtype, np.integer):
+        min_value, max_value = int(block.min()), int(block.max())
+        if max_value - min_value <= MAX_BINCOUNT_RANGE:
+            if min_value >= 0 and max_value <= MAX_BINCOUNT_RANGE:
+                # the pixel values are the bins
+                min_value = 0
+                bins = block.ravel()
+            else:
+                # offset by the min value, in a data type without overflow for the range of values
+                block = block.astype(np.int32) if block.dtype.itemsize < 4 else block
+                bins = block.ravel() - block.dtype.type(min_value)
+            counts = np.bincount(bins.astype(np.intp, copy=False))
+            values = np.flatnonzero(counts)
+            return [value + min_value for value in values.tolist()], counts[values].tolist()
+    values, counts = np.unique(block, return_counts=True)
+    return values.tolist(), counts.tolist()
+
+
+def add_counts(pixel_count, values, counts, nodata=None):
+    for value, count in zip(values, counts, strict=True):
+        if nodata is not None and value == nodata:
+            continue
+        pixel_count[value] = pixel_count.get(value, 0) + count
+
+
 # --------------------------------------------------------------------------
 # parallel processing
 
@@ -259,12 +482,11 @@ def chunks(lst, n):
 
 
 def pixel_count_in_chunk(img_path, band, xoff, yoff, xsize, ysize):
-    """Count unique pixel values in a chunk using np.unique."""
+    """Count unique pixel values in a chunk using the histogram kernel."""
     gdal_file = gdal.Open(img_path, gdal.GA_ReadOnly)
     chunk_narray = gdal_file.GetRasterBand(band).ReadAsArray(xoff, yoff, xsize, ysize)
     del gdal_file
-    unique_values, counts = np.unique(chunk_narray, return_counts=True)
-    return dict(zip(unique_values.tolist(), counts.tolist(), strict=True))
+    return dict(zip(*get_histogram(chunk_narray), strict=True))
 
 
 @wait_process
@@ -343,29 +565,43 @@ def get_pixel_count_by_pixel_values_parallel(layer, band, pixel_values=None, nod
 
 
 # --------------------------------------------------------------------------
-# sequential processing
-total_count = 0
+# parallel processing with threads
 
 
 @wait_process
-def get_pixel_count_by_pixel_values_sequential(layer, band, pixel_values=None, nodata=None):
-
+def get_pixel_count_by_pixel_values_threads(
+    layer, band, pixel_values=None, nodata=None, workers=None, max_pixels=2**22
+):
+    """Get the total pixel count for each pixel values using a pool of threads, without external
+    libraries. GDAL releases the GIL while reading, each thread reads windows aligned to the blocks
+    of the image with its own GDAL dataset and counts them with the histogram kernel.
+    """
     if pixel_values is None:
         pixel_values = get_unique_pixel_values(layer, band, nodata)
 
-    # put nodata at the beginning, with the idea to include it for stopping
-    # the counting when reaching the total pixels, delete it at the end
+    # if nodata is defined by the user, remove it to not count it
     if nodata is not None:
-        if nodata in pixel_values:
-            pixel_values.remove(nodata)
-        pixel_values.insert(0, nodata)
+        pixel_values = [pixel_value for pixel_value in pixel_values if pixel_value != nodata]
 
-    dataset = gdal_array.LoadFile(get_source_from(layer))
+    # windows of full rows aligned to the blocks of the image
+    layer_filepath = get_source_from(layer)
+    gdal_file = gdal.Open(layer_filepath, gdal.GA_ReadOnly)
+    x_size, y_size = gdal_file.RasterXSize, gdal_file.RasterYSize
+    block_height = gdal_file.GetRasterBand(band).GetBlockSize()[1]
+    del gdal_file
+    rows_by_window = max(1, max_pixels // x_size // block_height) * block_height
+    windows = [(yoff, min(rows_by_window, y_size - yoff)) for yoff in range(0, y_size, rows_by_window)]
 
-    if len(dataset.shape) == 3:
-        dataset = dataset[band - 1]
+    # one GDAL dataset by thread
+    thread_data = threading.local()
+    gdal_files = []
 
-    max_pixels = dataset.shape[-1] * dataset.shape[-2]
+    def count_window(yoff, ysize):
+        if not hasattr(thread_data, "raster_band"):
+            thread_data.gdal_file = gdal.Open(layer_filepath, gdal.GA_ReadOnly)
+            thread_data.raster_band = thread_data.gdal_file.GetRasterBand(band)
+            gdal_files.append(thread_data.gdal_file)
+        return get_histogram(thread_data.raster_band.ReadAsArray(0, yoff, x_size, ysize))
 
     progress = QProgressDialog(
         "AcATaMa is counting the number of pixels for each thematic value.\n"
@@ -374,36 +610,382 @@ def get_pixel_count_by_pixel_values_sequential(layer, band, pixel_values=None, n
         0,
         100,
     )
-    progress.setWindowTitle("AcATaMa - Counting pixels by values...")
+    progress.setWindowTitle("AcATaMa - Counting unique values...")
     progress.setWindowModality(Qt.WindowModality.WindowModal)
+    progress.setMinimumDuration(0)
     progress.setValue(0)
     progress.show()
     QApplication.processEvents()
 
-    global total_count
-    total_count = 0
+    # Initialize counts with 0 for all pixel values from symbology
+    pairing_values_and_counts = dict.fromkeys(pixel_values, 0)
 
-    def count_value(pixel_value):
-        global total_count
-        if total_count >= max_pixels:
-            return 0
-        count = np.count_nonzero(dataset == pixel_value)
-        total_count += count
-        progress.setValue(int(total_count * 100 / max_pixels))
-        return count
+    try:
+        with ThreadPoolExecutor(max_workers=workers or get_pixel_count_workers()) as executor:
+            futures = [executor.submit(count_window, yoff, ysize) for yoff, ysize in windows]
+            for windows_counted, future in enumerate(as_completed(futures), start=1):
+                add_counts(pairing_values_and_counts, *future.result(), nodata)
+                progress.setValue(int(windows_counted * 100 / len(windows)))
+                QApplication.processEvents()
+    finally:
+        progress.close()
+        thread_data = None
+        gdal_files.clear()
 
-    pixel_counts = [count_value(pixel_value) for pixel_value in pixel_values]
+    storage_pixel_count_by_pixel_values[(layer, band, nodata)] = pairing_values_and_counts
+    return pairing_values_and_counts
+
+
+# --------------------------------------------------------------------------
+# sequential processing
+
+
+@wait_process
+def get_pixel_count_by_pixel_values_sequential(layer, band, pixel_values=None, nodata=None, max_pixels=2**22):
+    """Get the total pixel count for each pixel values reading the image by blocks of rows, with the
+    histogram kernel for each block
+    """
+    if pixel_values is None:
+        pixel_values = get_unique_pixel_values(layer, band, nodata)
 
+    # if nodata is defined by the user, remove it to not count it
     if nodata is not None:
-        pixel_values.pop(0)
-        pixel_counts.pop(0)
+        pixel_values = [pixel_value for pixel_value in pixel_values if pixel_value != nodata]
+
+    gdal_file = gdal.Open(get_source_from(layer), gdal.GA_ReadOnly)
+    raster_band = gdal_file.GetRasterBand(band)
+    x_size, y_size = gdal_file.RasterXSize, gdal_file.RasterYSize
+
+    progress = QProgressDialog(
+        "AcATaMa is counting the number of pixels for each thematic value.\n"
+        "Depending on the size of the image, it would take a few minutes.",
+        None,
+        0,
+        100,
+    )
+    progress.setWindowTitle("AcATaMa - Counting pixels by values...")
+    progress.setWindowModality(Qt.WindowModality.WindowModal)
+    progress.setValue(0)
+    progress.show()
+    QApplication.processEvents()
+
+    pixel_count = {}
+    rows_by_block = max(1, max_pixels // x_size)
+    for yoff in range(0, y_size, rows_by_block):
+        ysize = min(rows_by_block, y_size - yoff)
+        add_counts(pixel_count, *get_histogram(raster_band.ReadAsArray(0, yoff, x_size, ysize)), nodata)
+        progress.setValue(int((yoff + ysize) * 100 / y_size))
+        QApplication.processEvents()
+    del raster_band, gdal_file
 
     progress.close()
-    pairing_values_and_counts = dict(zip(pixel_values, pixel_counts, strict=True))
+    pairing_values_and_counts = {pixel_value: pixel_count.get(pixel_value, 0) for pixel_value in pixel_values}
     storage_pixel_count_by_pixel_values[(layer, band, nodata)] = pairing_values_and_counts
     return pairing_values_and_counts
 
 
+# --------------------------------------------------------------------------
+# approximate pixel count for interactive previews
+
+
+def get_approximate_pixel_count_by_pixel_values(layer, band, pixel_values=None, nodata=None, max_pixels=2**20):
+    """Estimate the pixel count for each pixel value in milliseconds for interactive previews, reading
+    at most max_pixels: the largest overview of the image that fits, else a subsample of the image
+    taking one pixel each step in both directions (nearest neighbour). The overviews of the thematic
+    maps must be built with nearest or mode resampling (the default of gdaladdo is nearest)
+
+    Returns:
+        (dict, dict): the estimated pixel count by pixel values and its error bound (95% confidence), the
+        error bound is zero when the image is small enough to be read completely
+    """
+    if pixel_values is None:
+        # without reading the image to get the unique values
+        pixel_values = get_symbology_pixel_values(layer, band)
+
+    gdal_file = gdal.Open(get_source_from(layer), gdal.GA_ReadOnly)
+    raster_band = gdal_file.GetRasterBand(band)
+    x_size, y_size = gdal_file.RasterXSize, gdal_file.RasterYSize
+    total_pixels = x_size * y_size
+
+    if total_pixels <= max_pixels:
+        block = raster_band.ReadAsArray()
+    else:
+        overviews = [raster_band.GetOverview(idx) for idx in range(raster_band.GetOverviewCount())]
+        overviews = [overview for overview in overviews if overview.XSize * overview.YSize <= max_pixels]
+        if overviews:
+            block = max(overviews, key=lambda overview: overview.XSize * overview.YSize).ReadAsArray()
+        else:
+            step = math.ceil((total_pixels / max_pixels) ** 0.5)
+            block = raster_band.ReadAsArray(
+                0,
+                0,
+                x_size,
+                y_size,
+                buf_xsize=math.ceil(x_size / step),
+                buf_ysize=math.ceil(y_size / step),
+                resample_alg=gdal.GRIORA_NearestNeighbour,
+            )
+    del raster_band, gdal_file
+
+    sample_pixels = block.size
+    sample_pixel_count = dict.fromkeys([pixel_value for pixel_value in pixel_values if pixel_value != nodata], 0)
+    add_counts(sample_pixel_count, *get_histogram(block), nodata)
+    if sample_pixels == total_pixels:
+        return sample_pixel_count, dict.fromkeys(sample_pixel_count, 0)
+
+    pixel_count = {}
+    error_bound = {}
+    for pixel_value, count in sample_pixel_count.items():
+        proportion = count / sample_pixels
+        pixel_count[pixel_value] = round(proportion * total_pixels)
+        if count:
+            # normal approximation of the proportion in a sample of the pixels
+            error_bound[pixel_value] = round(
+                1.96 * total_pixels * (proportion * (1 - proportion) / sample_pixels) ** 0.5
+            )
+        else:
+            # rule of three, a class not found in the sample could still have some pixels
+            error_bound[pixel_value] = math.ceil(3 * total_pixels / sample_pixels)
+    return pixel_count, error_bound
+
+
+# --------------------------------------------------------------------------
+# pixel count of several aligned rasters in one pass
+
+
+def rasters_are_aligned(layers):
+    """Check if the rasters have the same size and pixel grid, so their blocks can be read together"""
+    grids = set()
+    for layer in layers:
+        gdal_file = gdal.Open(get_source_from(layer), gdal.GA_ReadOnly)
+        if gdal_file is None:
+            return False
+        geotransform = tuple(round(value, 9) for value in gdal_file.GetGeoTransform())
+        grids.add((gdal_file.RasterXSize, gdal_file.RasterYSize, geotransform))
+        del gdal_file
+    return len(grids) <= 1
+
+
+def count_pixels_in_one_pass(rasters, crosstab=None, max_pixels=2**22, task=None):
+    """Count the pixels by pixel values of several aligned raster files reading their blocks only once,
+    without the gui, it can run in a QgsTask
+
+    Args:
+        rasters (list): (file path, band, nodata, pixel values) of each raster, the pixel values are
+            counted even without pixels, the others values found are added
+        crosstab (tuple): the indexes in rasters of the two rasters to cross-tabulate
+        max_pixels (int): maximum number of pixels read by block
+        task (QgsTask): to report the progress and cancel the count
+
+    Returns:
+        (list, dict): the pixel count by pixel values of each raster, and the pixel count by each pair
+        of pixel values (first raster, second raster) without the nodata of both, or None if canceled
+    """
+    # the bands to read, the same file and band is read only once
+    gdal_files = {}
+    gdal_bands = {}
+    raster_keys = []
+    for source, band, _, _ in rasters:
+        if source not in gdal_files:
+            gdal_files[source] = gdal.Open(source, gdal.GA_ReadOnly)
+        if (source, band) not in gdal_bands:
+            gdal_bands[(source, band)] = gdal_files[source].GetRasterBand(band)
+        raster_keys.append((source, band))
+    x_size = next(iter(gdal_files.values())).RasterXSize
+    y_size = next(iter(gdal_files.values())).RasterYSize
+
+    # init all pixel values with 0 count
+    pixel_counts = [
+        dict.fromkeys([value for value in pixel_values if value != nodata], 0) for _, _, nodata, pixel_values in rasters
+    ]
+    crosstab_count = {}
+
+    # blocks of full rows
+    rows_by_block = max(1, max_pixels // x_size)
+    for yoff in range(0, y_size, rows_by_block):
+        if task is not None and task.isCanceled():
+            return None
+        ysize = min(rows_by_block, y_size - yoff)
+        blocks = {key: gdal_band.ReadAsArray(0, yoff, x_size, ysize) for key, gdal_band in gdal_bands.items()}
+        unique_values = {key: get_histogram(block) for key, block in blocks.items()}
+        for pixel_count, key, (_, _, nodata, _) in zip(pixel_counts, raster_keys, rasters, strict=True):
+            add_counts(pixel_count, *unique_values[key], nodata)
+
+        if crosstab is not None:
+            block_a, block_b = (blocks[raster_keys[idx]] for idx in crosstab)
+            nodata_a, nodata_b = (rasters[idx][2] for idx in crosstab)
+            valid = np.ones(block_a.shape, dtype=bool)
+            if nodata_a is not None:
+                valid &= block_a != nodata_a
+            if nodata_b is not None:
+                valid &= block_b != nodata_b
+            # both values packed in one int64 to count the pairs with np.unique
+            pairs = (block_a[valid].astype(np.int64) << 32) | (block_b[valid].astype(np.int64) & 0xFFFFFFFF)
+            pairs, counts = np.unique(pairs, return_counts=True)
+            for pair, count in zip(pairs.tolist(), counts.tolist(), strict=True):
+                pair = (pair >> 32, ((pair & 0xFFFFFFFF) ^ 0x80000000) - 0x80000000)
+                crosstab_count[pair] = crosstab_count.get(pair, 0) + count
+
+        if task is not None:
+            task.setProgress((yoff + ysize) * 100 / y_size)
+
+    return pixel_counts, crosstab_count
+
+
+class ProgressDialogTask:
+    """Report the progress of the pixel count in a progress dialog, for counting in the main thread"""
+
+    def __init__(self, progress):
+        self.progress = progress
+
+    def setProgress(self, value):
+        self.progress.setValue(int(value))
+        QApplication.processEvents()
+
+    def isCanceled(self):
+        return self.progress.wasCanceled()
+
+
+@wait_process
+def get_pixel_count_by_pixel_values_in_one_pass(rasters, crosstab=None, max_pixels=2**22):
+    """Get the total pixel count for each pixel values of several aligned rasters (e.g. the thematic,
+    the stratification and the post-stratification maps) reading their blocks only once, and the
+    joint pixel count between two of them (e.g. thematic x strata)
+
+    The pixel counts are saved in the storage, the same as the pixel count by each raster.
+
+    Args:
+        rasters (list): (layer, band, nodata) of each raster, all with the same pixel grid
+        crosstab (tuple): the indexes in rasters of the two rasters to cross-tabulate
+        max_pixels (int): maximum number of pixels read by block
+
+    Returns:
+        (list, dict): the pixel count by pixel values of each raster, and the pixel count by each pair
+        of pixel values (first raster, second raster) without the nodata of both
+    """
+    if not rasters_are_aligned([layer for layer, _, _ in rasters]):
+        raise ValueError("The rasters to count in one pass must have the same size and pixel grid")
+
+    progress = QProgressDialog(
+        "AcATaMa is counting the number of pixels for each thematic value.\n"
+        "Depending on the size of the image, it would take a few minutes.",
+        None,
+        0,
+        100,
+    )
+    progress.setWindowTitle("AcATaMa - Counting unique values...")
+    progress.setWindowModality(Qt.WindowModality.WindowModal)
+    progress.setMinimumDuration(0)
+    progress.setValue(0)
+    progress.show()
+    QApplication.processEvents()
+
+    try:
+        pixel_counts, crosstab_count = count_pixels_in_one_pass(
+            [
+                (get_source_from(layer), band, nodata, get_symbology_pixel_values(layer, band))
+                for layer, band, nodata in rasters
+            ],
+            crosstab,
+            max_pixels,
+            ProgressDialogTask(progress),
+        )
+    finally:
+        progress.close()
+
+    for pixel_count, (layer, band, nodata) in zip(pixel_counts, rasters, strict=True):
+        storage_pixel_count_by_pixel_values[(layer, band, nodata)] = pixel_count
+    return pixel_counts, crosstab_count
+
+
+# --------------------------------------------------------------------------
+# pixel count in background
+
+
+class PixelCountTask(QgsTask):
+    """Count the pixels by pixel values of one or several aligned rasters in one pass in background,
+    with the QGIS task manager (progress and cancel), the pixel counts are saved in the storage
+    """
+
+    def __init__(self, rasters):
+        names = ", ".join(layer.name() for layer, _, _ in rasters)
+        super().__init__(f"AcATaMa - Counting pixels: {names}", QgsTask.Flag.CanCancel)
+        self.rasters = rasters
+        # the layers are read in the main thread, the task only reads the files
+        self.rasters_to_count = [
+            (get_source_from(layer), band, nodata, get_symbology_pixel_values(layer, band))
+            for layer, band, nodata in rasters
+        ]
+        self.pixel_counts = None
+        self.exception = None
+        self.callbacks = []
+
+    def run(self):
+        try:
+            result = count_pixels_in_one_pass(self.rasters_to_count, task=self)
+        except Exception as err:
+            self.exception = err
+            return False
+        if result is None:
+            return False
+        self.pixel_counts = result[0]
+        return True
+
+    def finished(self, result):
+        for raster in self.rasters:
+            pixel_count_tasks.pop(raster, None)
+        if result:
+            for pixel_count, raster in zip(self.pixel_counts, self.rasters, strict=True):
+                storage_pixel_count_by_pixel_values[raster] = pixel_count
+        elif self.exception is not None and iface is not None:
+            iface.messageBar().pushMessage(
+                "AcATaMa", f"Error counting the pixels: {self.exception}", level=Qgis.MessageLevel.Warning, duration=10
+            )
+        for callback in self.callbacks:
+            callback(self.pixel_counts if result else None)
+
+
+pixel_count_tasks = {}  # the pixel count task running by (layer, band, nodata)
+
+
+def count_pixels_in_background(rasters, on_finished):
+    """Count the pixels by pixel values of the first raster (layer, band, nodata) in a background task,
+    without freezing QGIS, the other rasters are counted in the same pass if they are aligned with it
+
+    Args:
+        rasters (list): (layer, band, nodata) of each raster
+        on_finished (callable): called in the main thread when the count finishes, with the pixel
+            counts or None if it was canceled or failed
+
+    Returns:
+        PixelCountTask: the task counting, or None if it was already counted (on_finished is not called)
+    """
+    main_raster = rasters[0]
+    if main_raster in storage_pixel_count_by_pixel_values:
+        return None
+    if main_raster in pixel_count_tasks:
+        # it is already counting
+        task = pixel_count_tasks[main_raster]
+        task.callbacks.append(on_finished)
+        return task
+
+    rasters = [main_raster] + [
+        raster
+        for raster in rasters[1:]
+        if raster != main_raster
+        and raster not in pixel_count_tasks
+        and raster not in storage_pixel_count_by_pixel_values
+    ]
+    if len(rasters) > 1 and not rasters_are_aligned([layer for layer, _, _ in rasters]):
+        rasters = [main_raster]
+    task = PixelCountTask(rasters)
+    task.callbacks.append(on_finished)
+    for raster in rasters:
+        pixel_count_tasks[raster] = task
+    QgsApplication.taskManager().addTask(task)
+    return task
+
+
 # --------------------------------------------------------------------------
 # set nodata format for the text line boxes
 
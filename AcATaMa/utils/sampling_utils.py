@@ -18,11 +18,21 @@
  ***************************************************************************/
 """
 
+import random
+
+import numpy as np
 from qgis.PyQt.QtCore import Qt
 from qgis.PyQt.QtGui import QColor
 from qgis.PyQt.QtWidgets import QTableWidgetItem
 
-from AcATaMa.utils.others_utils import get_nodata_format, get_pixel_count_by_pixel_values, mask
+from AcATaMa.utils.others_utils import (
+    count_pixels_in_background,
+    get_approximate_pixel_count_by_pixel_values,
+    get_nodata_format,
+    get_pixel_count_by_pixel_values,
+    mask,
+    storage_pixel_count_by_pixel_values,
+)
 from AcATaMa.utils.system_utils import block_signals_to, wait_process
 
 
@@ -38,13 +48,135 @@ def check_min_distance(point, index, distance, points):
         return True
 
     if neighbors[0] in points:
-        np = points[neighbors[0]]
-        if np.distance(point) < distance:
+        nearest_point = points[neighbors[0]]
+        if nearest_point.distance(point) < distance:
             return False
 
     return True
 
 
+class MinDistanceGrid:
+    """Uniform grid hash of the sampling points, with cells of the size of the min distance, so the
+    points closer than the min distance to a candidate can only be in the 3x3 cells around it.
+    The points are saved in numpy arrays sorted by cell, the last points added are kept in a small
+    pending buffer that is merged in the sorted arrays by blocks
+    """
+
+    pending_size = 256
+
+    def __init__(self, min_distance, x_origin=0.0, y_origin=0.0):
+        self.min_distance = min_distance
+        self.x_origin = x_origin
+        self.y_origin = y_origin
+        self.xs = np.empty(0)
+        self.ys = np.empty(0)
+        self.cell_keys = np.empty(0, dtype=np.int64)
+        self.pending_xs = []
+        self.pending_ys = []
+
+    def __len__(self):
+        return len(self.xs) + len(self.pending_xs)
+
+    def get_cells(self, xs, ys):
+        cols = np.floor((xs - self.x_origin) / self.min_distance).astype(np.int64)
+        rows = np.floor((ys - self.y_origin) / self.min_distance).astype(np.int64)
+        return cols, rows
+
+    @staticmethod
+    def get_cell_keys(cols, rows):
+        return cols * 2**32 + rows
+
+    def is_close_to_points(self, xs, ys):
+        """Boolean mask of the candidates closer than the min distance to any point in the grid"""
+        close = np.zeros(xs.shape, dtype=bool)
+        if self.xs.size:
+            cols, rows = self.get_cells(xs, ys)
+            for col_offset in (-1, 0, 1):
+                for row_offset in (-1, 0, 1):
+                    keys = self.get_cell_keys(cols + col_offset, rows + row_offset)
+                    starts = np.searchsorted(self.cell_keys, keys, side="left")
+                    ends = np.searchsorted(self.cell_keys, keys, side="right")
+                    # few points fit in a cell with the min distance between them
+                    for k in range(int((ends - starts).max(initial=0))):
+                        in_cell = np.flatnonzero(starts + k < ends)
+                        points = starts[in_cell] + k
+                        dx = xs[in_cell] - self.xs[points]
+                        dy = ys[in_cell] - self.ys[points]
+                        close[in_cell[np.sqrt(dx * dx + dy * dy) < self.min_distance]] = True
+        if self.pending_xs:
+            dx = xs[:, None] - np.array(self.pending_xs)[None, :]
+            dy = ys[:, None] - np.array(self.pending_ys)[None, :]
+            close |= (np.sqrt(dx * dx + dy * dy) < self.min_distance).any(axis=1)
+        return close
+
+    def add(self, xs, ys):
+        """Add the points to the grid"""
+        self.pending_xs.extend(float(x) for x in xs)
+        self.pending_ys.extend(float(y) for y in ys)
+        if len(self.pending_xs) >= self.pending_size:
+            xs = np.concatenate([self.xs, self.pending_xs])
+            ys = np.concatenate([self.ys, self.pending_ys])
+            cell_keys = self.get_cell_keys(*self.get_cells(xs, ys))
+            order = np.argsort(cell_keys, kind="stable")
+            self.xs, self.ys, self.cell_keys = xs[order], ys[order], cell_keys[order]
+            self.pending_xs, self.pending_ys = [], []
+
+    def accept(self, xs, ys, max_accepted=None):
+        """Accept the candidates in order that are at least at the min distance of all points in the
+        grid and of the previous candidates accepted, the same as checking and adding them one by
+        one, until max_accepted. The candidates accepted are added to the grid
+
+        Returns:
+            the boolean mask of the candidates accepted
+        """
+        xs = np.asarray(xs, dtype=np.float64)
+        ys = np.asarray(ys, dtype=np.float64)
+        accepted = np.zeros(xs.shape, dtype=bool)
+        candidates = np.flatnonzero(~self.is_close_to_points(xs, ys))
+
+        num_accepted = 0
+        for start in range(0, len(candidates), self.pending_size):
+            if max_accepted is not None and num_accepted >= max_accepted:
+                break
+            chunk = candidates[start : start + self.pending_size]
+            if start:
+                # check again with the candidates accepted in the previous chunks
+                chunk = chunk[~self.is_close_to_points(xs[chunk], ys[chunk])]
+
+            # resolve in order the candidates closer between them in the chunk
+            dx = xs[chunk][:, None] - xs[chunk][None, :]
+            dy = ys[chunk][:, None] - ys[chunk][None, :]
+            close = np.triu(np.sqrt(dx * dx + dy * dy) < self.min_distance, k=1)
+            if close.any():
+                chunk_accepted = np.ones(len(chunk), dtype=bool)
+                for idx in range(len(chunk)):
+                    if chunk_accepted[idx]:
+                        chunk_accepted[idx + 1 :] &= ~close[idx, idx + 1 :]
+                chunk = chunk[chunk_accepted]
+
+            if max_accepted is not None:
+                chunk = chunk[: max_accepted - num_accepted]
+            self.add(xs[chunk], ys[chunk])
+            accepted[chunk] = True
+            num_accepted += len(chunk)
+
+        return accepted
+
+
+def draw_random_floats(size, rng=random):
+    """Draw an array of random floats in [0, 1) in one call, the values and the final state of the rng
+    are exactly the same as calling rng.random() the same number of times, because the Mersenne
+    Twister state of python random is transferred to numpy and back
+    """
+    version, internal_state, gauss_next = rng.getstate()
+    random_state = np.random.RandomState()
+    random_state.set_state(("MT19937", np.array(internal_state[:-1], dtype=np.uint32), internal_state[-1]))
+    random_floats = random_state.random_sample(size)
+    _, keys, pos = random_state.get_state(legacy=True)[:3]
+    rng.setstate((version, (*(int(key) for key in keys), int(pos)), gauss_next))
+    return random_floats
+
+
 def get_num_samples_by_area_based_proportion(srs_table, total_std_error):
     total_pixel_count = float(sum(mask(srs_table["pixel_count"], srs_table["On"])))
     ratio_pixel_count = [p_c / total_pixel_count for p_c in mask(srs_table["pixel_count"], srs_table["On"])]
@@ -227,8 +359,6 @@ def reload_StraRS_table():
         del sampling_design.srs_tables[sampling_design.QCBox_SamplingMap_StraRS.currentText()][srs_method]
     # delete pixel count
     if srs_method == "area based proportion":
-        from AcATaMa.utils.others_utils import storage_pixel_count_by_pixel_values
-
         layer = sampling_design.QCBox_SamplingMap_StraRS.currentLayer()
         band = int(sampling_design.QCBox_band_SamplingMap_StraRS.currentText())
         nodata = get_nodata_format(sampling_design.nodata_SamplingMap_StraRS.text())
@@ -238,6 +368,31 @@ def reload_StraRS_table():
     fill_stratified_sampling_table()
 
 
+def count_stratification_map_in_background(stratification_map):
+    """Count the pixels of the stratification map in background, together with the thematic map (used
+    later by the accuracy assessment and the sampling report) in one pass when both have the same pixel
+    grid, the stratified sampling table is filled when it finishes
+
+    Returns:
+        PixelCountTask: the task counting, or None if the stratification map was already counted
+    """
+    from AcATaMa.gui.acatama_dockwidget import AcATaMaDockWidget as AcATaMa
+
+    try:
+        thematic_map = (
+            AcATaMa.dockwidget.QCBox_ThematicMap.currentLayer(),
+            int(AcATaMa.dockwidget.QCBox_band_ThematicMap.currentText()),
+            get_nodata_format(AcATaMa.dockwidget.nodata_ThematicMap.text()),
+        )
+    except (AttributeError, ValueError):
+        # without a valid thematic map only the stratification map is counted
+        thematic_map = None
+    rasters = [stratification_map] if thematic_map is None else [stratification_map, thematic_map]
+    return count_pixels_in_background(
+        rasters, on_finished=lambda pixel_counts: fill_stratified_sampling_table() if pixel_counts else None
+    )
+
+
 def fill_stratified_sampling_table():
     from AcATaMa.gui.acatama_dockwidget import AcATaMaDockWidget as AcATaMa
 
@@ -264,6 +419,7 @@ def fill_stratified_sampling_table():
         sampling_design.widget_TotalExpectedSE.setVisible(True)
 
     srs_table = None
+    preview = False
     if (
         sampling_design.QCBox_SamplingMap_StraRS.currentText() in sampling_design.srs_tables
         and srs_method in sampling_design.srs_tables[sampling_design.QCBox_SamplingMap_StraRS.currentText()]
@@ -292,14 +448,31 @@ def fill_stratified_sampling_table():
             return
         srs_table["row_count"] = len(next(iter(srs_table["values_and_colors_table"].values())))
 
-        srs_table["pixel_count"] = list(
-            get_pixel_count_by_pixel_values(
-                sampling_design.QCBox_SamplingMap_StraRS.currentLayer(),
-                int(sampling_design.QCBox_band_SamplingMap_StraRS.currentText()),
-                srs_table["values_and_colors_table"]["Pixel Value"],
-                get_nodata_format(sampling_design.nodata_SamplingMap_StraRS.text()),
-            ).values()
+        stratification_map = (
+            sampling_design.QCBox_SamplingMap_StraRS.currentLayer(),
+            int(sampling_design.QCBox_band_SamplingMap_StraRS.currentText()),
+            get_nodata_format(sampling_design.nodata_SamplingMap_StraRS.text()),
         )
+        if count_stratification_map_in_background(stratification_map) is not None:
+            # meanwhile the pixels are counted in background, the table is a preview (not saved and
+            # disabled) with the approximate pixel count, it is filled again when the count finishes
+            preview = True
+            pixel_count = get_approximate_pixel_count_by_pixel_values(
+                stratification_map[0],
+                stratification_map[1],
+                srs_table["values_and_colors_table"]["Pixel Value"],
+                stratification_map[2],
+            )[0]
+        else:
+            pixel_count = get_pixel_count_by_pixel_values(
+                stratification_map[0],
+                stratification_map[1],
+                srs_table["values_and_colors_table"]["Pixel Value"],
+                stratification_map[2],
+            )
+        srs_table["pixel_count"] = [
+            pixel_count.get(pixel_value, 0) for pixel_value in srs_table["values_and_colors_table"]["Pixel Value"]
+        ]
 
         if srs_method == "fixed values":
             srs_table["header"] = ["Pix Val", "Color", "Num Samples", "On"]
@@ -321,12 +494,16 @@ def fill_stratified_sampling_table():
                     srs_table["num_samples"][idx] = str(minimum_samples_per_stratum)
 
         # save srs table
-        if sampling_design.QCBox_SamplingMap_StraRS.currentText() not in sampling_design.srs_tables:
-            sampling_design.srs_tables[sampling_design.QCBox_SamplingMap_StraRS.currentText()] = {}
-        sampling_design.srs_tables[sampling_design.QCBox_SamplingMap_StraRS.currentText()][srs_method] = srs_table
+        if not preview:
+            if sampling_design.QCBox_SamplingMap_StraRS.currentText() not in sampling_design.srs_tables:
+                sampling_design.srs_tables[sampling_design.QCBox_SamplingMap_StraRS.currentText()] = {}
+            sampling_design.srs_tables[sampling_design.QCBox_SamplingMap_StraRS.currentText()][srs_method] = srs_table
 
     # update content
     update_srs_table_content(srs_table)
+    sampling_design.QTableW_StraRS.setDisabled(preview)
+    if preview:
+        sampling_design.TotalNumSamples.setText(f"~{sampling_design.TotalNumSamples.text()}")
 
 
 def update_stratified_sampling_table(changes_from):
@@ -154,6 +154,8 @@ def get_save_file_name(parent, title, default_path, filter_str):
         extension = ".gpkg"
     elif "Shape files (*.shp)" in selected_filter:
         extension = ".shp"
+    elif "FlatGeobuf files (*.fgb)" in selected_filter:
+        extension = ".fgb"
     elif "CSV files (*.csv)" in selected_filter:
         extension = ".csv"
     elif "YAML files (*.yaml *.yml)" in selected_filter:
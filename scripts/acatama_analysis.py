@@ -0,0 +1,121 @@
+"""
+/***************************************************************************
+ AcATaMa
+                                 A QGIS plugin
+ AcATaMa is a Qgis plugin for Accuracy Assessment of Thematic Maps
+                              -------------------
+        copyright            : (C) 2017-2026 by Xavier C. Llano, SMByC
+        email                : xavier.corredor.llano@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+# This script computes the accuracy assessment of AcATaMa yml files, with the
+# labels of the response design and the estimator saved in them, without the
+# QGIS gui (no dock widget, no dialogs), for evaluating many projects in batch
+# on servers. Each yml file is processed in its own worker process and its
+# results are saved in csv (the same of the export in the accuracy assessment
+# window) and json files. It must be run with the python of QGIS.
+#
+# Example:
+# $ python acatama_analysis.py 01.yml 02.yml projects_dir --output-dir results --jobs 4
+#                               |                         |
+#                 (AcATaMa yml files or dirs)  (csv and json results for each yml file)
+
+import argparse
+import glob
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context
+
+from qgis.core import QgsApplication
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from AcATaMa.core.analysis_runner import run_analysis
+
+qgs_app = None
+
+
+def init_qgis():
+    """Start QGIS without display, once by process"""
+    global qgs_app
+    if qgs_app is None:
+        # QGIS with the gui enabled (for the layers and symbology) needs a qt platform on servers without display
+        os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+        qgs_app = QgsApplication([], True)
+        qgs_app.initQgis()
+
+
+def analysis_from_yml(yml_file_path, output_dir):
+    """Run the accuracy assessment of one project, the errors are returned so as not to stop the batch"""
+    init_qgis()
+    start = time.perf_counter()
+    try:
+        csv_file, _, results = run_analysis(yml_file_path, output_dir)
+    except Exception as err:
+        return yml_file_path, None, f"{err}\n{traceback.format_exc()}", time.perf_counter() - start
+    return yml_file_path, csv_file, results["samples_labeled"], time.perf_counter() - start
+
+
+def get_yml_files(inputs):
+    yml_files = []
+    for _input in inputs:
+        if os.path.isdir(_input):
+            yml_files += sorted(glob.glob(os.path.join(_input, "*.yml")) + glob.glob(os.path.join(_input, "*.yaml")))
+        elif os.path.isfile(_input):
+            yml_files.append(_input)
+    return [os.path.abspath(yml_file) for yml_file in yml_files]
+
+
+def script():
+    """Run as a script with arguments"""
+    parser = argparse.ArgumentParser(
+        prog="acatama_analysis", description="Compute the accuracy assessment of AcATaMa yml files"
+    )
+
+    parser.add_argument("inputs", type=str, nargs="+", help="AcATaMa yml files or directories with yml files")
+    parser.add_argument("--output-dir", type=str, help="output directory for the results, by default next to each yml")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count(), help="number of yml files processed in parallel")
+    args = parser.parse_args()
+
+    yml_files = get_yml_files(args.inputs)
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    print(f"\nCOMPUTING ACCURACY ASSESSMENTS: {len(yml_files)}")
+    if args.jobs == 1 or len(yml_files) <= 1:
+        results = [analysis_from_yml(yml_file, args.output_dir) for yml_file in yml_files]
+    else:
+        # each process starts its own QGIS and computes one project at a time
+        with ProcessPoolExecutor(
+            max_workers=min(args.jobs, len(yml_files)), mp_context=get_context("spawn"), initializer=init_qgis
+        ) as executor:
+            futures = [executor.submit(analysis_from_yml, yml_file, args.output_dir) for yml_file in yml_files]
+            results = [future.result() for future in as_completed(futures)]
+
+    failed = 0
+    for yml_file, csv_file, details, elapsed_time in sorted(results):
+        if csv_file is None:
+            failed += 1
+            print(f"  {yml_file}: FAILED ({elapsed_time:.1f} s)\n    {details}")
+        else:
+            print(f"  {csv_file}: {details} samples labeled ({elapsed_time:.1f} s)")
+    print(f"\nDONE: {len(results) - failed} of {len(results)} projects, {failed} failed\n")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    script()
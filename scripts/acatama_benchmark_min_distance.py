@@ -0,0 +1,110 @@
+"""
+/***************************************************************************
+ AcATaMa
+                                 A QGIS plugin
+ AcATaMa is a Qgis plugin for Accuracy Assessment of Thematic Maps
+                              -------------------
+        copyright            : (C) 2017-2026 by Xavier C. Llano, SMByC
+        email                : xavier.corredor.llano@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+# This script benchmarks the min distance check between the sampling points
+# using the QgsSpatialIndex (one nearest neighbor query per candidate) and the
+# numpy grid hash (batch of candidates), for the same random candidates, and
+# checks that both accept exactly the same points. It must be run with the
+# python of QGIS.
+#
+# Example:
+# $ python acatama_benchmark_min_distance.py --samples 50000 --min-distance 10 --extent 100000
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+from qgis.core import QgsFeature, QgsGeometry, QgsPointXY, QgsSpatialIndex
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from AcATaMa.utils.sampling_utils import MinDistanceGrid, check_min_distance
+
+
+def spatial_index_sampling(xs, ys, min_distance, total_of_samples):
+    index = QgsSpatialIndex()
+    points = {}
+    accepted = []
+    for idx, (x, y) in enumerate(zip(xs, ys, strict=True)):
+        point = QgsPointXY(x, y)
+        if not check_min_distance(point, index, min_distance, points):
+            continue
+        f = QgsFeature(len(accepted))
+        f.setGeometry(QgsGeometry.fromPointXY(point))
+        index.addFeature(f)
+        points[len(accepted)] = point
+        accepted.append(idx)
+        if len(accepted) == total_of_samples:
+            break
+    return accepted
+
+
+def grid_hash_sampling(xs, ys, min_distance, total_of_samples, batch_size):
+    grid = MinDistanceGrid(min_distance)
+    accepted = []
+    for start in range(0, len(xs), batch_size):
+        batch = grid.accept(
+            xs[start : start + batch_size],
+            ys[start : start + batch_size],
+            max_accepted=total_of_samples - len(accepted),
+        )
+        accepted.extend((np.flatnonzero(batch) + start).tolist())
+        if len(accepted) == total_of_samples:
+            break
+    return accepted
+
+
+def script():
+    """Run as a script with arguments"""
+    parser = argparse.ArgumentParser(
+        prog="acatama_benchmark_min_distance", description="Benchmark the min distance check of AcATaMa"
+    )
+
+    parser.add_argument("--samples", type=int, default=50000, help="total of samples to generate")
+    parser.add_argument("--min-distance", type=float, default=10, help="min distance between samples")
+    parser.add_argument("--extent", type=float, default=100000, help="size of the square extent")
+    parser.add_argument("--batch-size", type=int, default=8192, help="batch size of the candidates")
+    parser.add_argument("--seed", type=int, default=0, help="random seed of the candidates")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    num_candidates = args.samples * 4
+    xs = rng.uniform(0, args.extent, num_candidates)
+    ys = rng.uniform(0, args.extent, num_candidates)
+
+    start = time.perf_counter()
+    accepted_index = spatial_index_sampling(xs, ys, args.min_distance, args.samples)
+    time_index = time.perf_counter() - start
+
+    start = time.perf_counter()
+    accepted_grid = grid_hash_sampling(xs, ys, args.min_distance, args.samples, args.batch_size)
+    time_grid = time.perf_counter() - start
+
+    print(f"\nSAMPLES: {args.samples}  MIN DISTANCE: {args.min_distance}  EXTENT: {args.extent}")
+    print(f"QgsSpatialIndex: {time_index:.3f} s ({len(accepted_index)} samples)")
+    print(f"Grid hash:       {time_grid:.3f} s ({len(accepted_grid)} samples)")
+    print(f"Speedup:         {time_index / time_grid:.1f}x")
+    print(f"Same samples:    {accepted_index == accepted_grid}\n")
+
+
+if __name__ == "__main__":
+    script()
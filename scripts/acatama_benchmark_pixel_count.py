@@ -0,0 +1,173 @@
+"""
+/***************************************************************************
+ AcATaMa
+                                 A QGIS plugin
+ AcATaMa is a Qgis plugin for Accuracy Assessment of Thematic Maps
+                              -------------------
+        copyright            : (C) 2017-2026 by Xavier C. Llano, SMByC
+        email                : xavier.corredor.llano@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+# This script benchmarks the pixel count by pixel values of a thematic map with
+# the histogram kernel by blocks (np.bincount) sequential and with threads, the
+# np.count_nonzero by each class over the whole image (the former sequential
+# backend), the np.unique by chunks with dask (parallel backend) and the QGIS
+# native algorithm, and checks that all of them return the same pixel count.
+# Without an input image it generates a random thematic map. It must be run
+# with the python of QGIS.
+#
+# Example:
+# $ python acatama_benchmark_pixel_count.py --size 10000 --classes 20 --data-type Int16
+# $ python acatama_benchmark_pixel_count.py --input thematic_map.tif --band 1
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+from osgeo import gdal, gdal_array
+from qgis.core import QgsApplication, QgsRasterLayer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from AcATaMa.utils import others_utils
+from AcATaMa.utils.others_utils import (
+    dask_is_available,
+    get_histogram,
+    get_pixel_count_by_pixel_values_parallel,
+    get_pixel_count_by_pixel_values_qgis_native,
+    get_pixel_count_by_pixel_values_sequential,
+    get_pixel_count_by_pixel_values_threads,
+)
+
+
+def create_thematic_map(file_path, size, classes, data_type, seed):
+    """Random thematic map with the classes values spread in the range of the data type"""
+    rng = np.random.default_rng(seed)
+    numpy_type = gdal_array.GDALTypeCodeToNumericTypeCode(gdal.GetDataTypeByName(data_type))
+    max_value = min(np.iinfo(numpy_type).max, 10000)
+    class_values = np.sort(rng.choice(np.arange(1, max_value), classes, replace=False)).astype(numpy_type)
+    dataset = gdal.GetDriverByName("GTiff").Create(
+        file_path, size, size, 1, gdal.GetDataTypeByName(data_type), ["TILED=YES", "COMPRESS=DEFLATE"]
+    )
+    dataset.SetGeoTransform([0, 30, 0, size * 30, 0, -30])
+    band = dataset.GetRasterBand(1)
+    rows_by_block = max(1, 2**22 // size)
+    for yoff in range(0, size, rows_by_block):
+        ysize = min(rows_by_block, size - yoff)
+        band.WriteArray(class_values[rng.integers(0, classes, (ysize, size))], 0, yoff)
+    band.SetNoDataValue(0)
+    del band, dataset
+    return class_values.tolist()
+
+
+def count_nonzero_by_class(file_path, band, pixel_values):
+    """The former sequential backend, a full pass over the whole image by each class"""
+    dataset = gdal_array.LoadFile(file_path)
+    if len(dataset.shape) == 3:
+        dataset = dataset[band - 1]
+    return {pixel_value: int(np.count_nonzero(dataset == pixel_value)) for pixel_value in pixel_values}
+
+
+def benchmark(name, function, *args):
+    start = time.perf_counter()
+    pixel_count = function(*args)
+    elapsed_time = time.perf_counter() - start
+    print(f"{name:<38} {elapsed_time:8.3f} s")
+    return pixel_count
+
+
+def script():
+    """Run as a script with arguments"""
+    parser = argparse.ArgumentParser(
+        prog="acatama_benchmark_pixel_count", description="Benchmark the pixel count by pixel values of AcATaMa"
+    )
+
+    parser.add_argument("--input", type=str, help="thematic map, by default a random one is generated")
+    parser.add_argument("--band", type=int, default=1, help="band of the thematic map")
+    parser.add_argument("--size", type=int, default=10000, help="size in pixels of the random thematic map")
+    parser.add_argument("--classes", type=int, default=20, help="number of classes of the random thematic map")
+    parser.add_argument("--data-type", type=str, default="Byte", choices=["Byte", "UInt16", "Int16", "UInt32", "Int32"])
+    parser.add_argument("--seed", type=int, default=0, help="random seed of the random thematic map")
+    args = parser.parse_args()
+
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    qgs_app = QgsApplication([], True)
+    qgs_app.initQgis()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # the pixel counts computed are not saved in the cache of the user
+        others_utils.storage_pixel_count_by_pixel_values.cache_dir = tmp_dir
+
+        if args.input:
+            file_path = os.path.abspath(args.input)
+            pixel_values = None
+        else:
+            file_path = os.path.join(tmp_dir, "thematic_map.tif")
+            pixel_values = create_thematic_map(file_path, args.size, args.classes, args.data_type, args.seed)
+        layer = QgsRasterLayer(file_path, "thematic map")
+        if pixel_values is None:
+            pixel_values = others_utils.get_unique_pixel_values(layer, args.band)
+
+        print(f"\nTHEMATIC MAP: {layer.width()}x{layer.height()} pixels, {len(pixel_values)} classes")
+
+        # kernel over one block
+        gdal_file = gdal.Open(file_path)
+        block = gdal_file.GetRasterBand(args.band).ReadAsArray(0, 0, layer.width(), min(layer.height(), 2048))
+        del gdal_file
+        benchmark("Block: np.unique", np.unique, block, False, False, True)
+        benchmark("Block: histogram kernel (np.bincount)", get_histogram, block)
+
+        # backends over the whole image
+        results = {
+            "histogram kernel by blocks": benchmark(
+                "Histogram kernel by blocks", get_pixel_count_by_pixel_values_sequential, layer, args.band, pixel_values
+            ),
+            "np.count_nonzero by class": benchmark(
+                "np.count_nonzero by class", count_nonzero_by_class, file_path, args.band, pixel_values
+            ),
+        }
+        results["histogram kernel with threads"] = benchmark(
+            "Histogram kernel with threads", get_pixel_count_by_pixel_values_threads, layer, args.band, pixel_values
+        )
+        if dask_is_available():
+            results["np.unique by chunks (dask)"] = benchmark(
+                "np.unique by chunks (dask)",
+                get_pixel_count_by_pixel_values_parallel,
+                layer,
+                args.band,
+                list(pixel_values),
+            )
+        try:
+            from processing.core.Processing import Processing
+
+            Processing.initialize()
+            results["QGIS native"] = benchmark(
+                "QGIS native", get_pixel_count_by_pixel_values_qgis_native, layer, args.band, list(pixel_values)
+            )
+        except ImportError:
+            print("QGIS native: processing is not available")
+
+    # only the classes, the other backends count all values found
+    results = {
+        name: {pixel_value: pixel_count.get(pixel_value, 0) for pixel_value in pixel_values}
+        for name, pixel_count in results.items()
+    }
+    same_pixel_count = all(pixel_count == results["np.count_nonzero by class"] for pixel_count in results.values())
+    print(f"{'Same pixel count':<38} {same_pixel_count}\n")
+
+
+if __name__ == "__main__":
+    script()
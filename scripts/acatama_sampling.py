@@ -0,0 +1,156 @@
+"""
+/***************************************************************************
+ AcATaMa
+                                 A QGIS plugin
+ AcATaMa is a Qgis plugin for Accuracy Assessment of Thematic Maps
+                              -------------------
+        copyright            : (C) 2017-2026 by Xavier C. Llano, SMByC
+        email                : xavier.corredor.llano@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+# This script generates the sampling with the sampling design saved in AcATaMa
+# yml files, without the QGIS gui (no dock widget, no dialogs), for running
+# samplings in batch on servers. Each yml file generates one sampling file,
+# with the sampling type of the tab activated when it was saved or the one
+# given, and several yml files can be processed in parallel processes. It must
+# be run with the python of QGIS.
+#
+# Example:
+# $ python acatama_sampling.py config.yml -o sampling.gpkg
+# $ python acatama_sampling.py 01.yml 02.yml 03.yml --output-dir samplings --type stratified --jobs 3
+#                               |                  |
+#                     (AcATaMa yml files)  (one sampling file for each yml file)
+
+import argparse
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context
+
+from qgis.core import QgsApplication
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from AcATaMa.core.sampling_design import SAMPLING_ENGINES
+from AcATaMa.core.sampling_runner import SAMPLING_TYPES, HeadlessTask, load_config, run_sampling
+
+qgs_app = None
+
+
+def init_qgis():
+    """Start QGIS without display, once by process"""
+    global qgs_app
+    if qgs_app is None:
+        # QGIS with the gui enabled (for the layers and symbology) needs a qt platform on servers without display
+        os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+        qgs_app = QgsApplication([], True)
+        qgs_app.initQgis()
+
+
+def sampling_from_yml(yml_file_path, output_file, sampling_type, random_seed, sampling_engine, show_progress):
+    init_qgis()
+    yaml_config = load_config(yml_file_path)
+
+    def print_progress(value):
+        print(f"\r  {os.path.basename(output_file)}: {value:.0f}%", end="", flush=True)
+
+    start = time.perf_counter()
+    sampling, sampling_conf = run_sampling(
+        yaml_config,
+        output_file,
+        sampling_type=sampling_type,
+        yml_file_path=yml_file_path,
+        random_seed=random_seed,
+        sampling_engine=sampling_engine,
+        task=HeadlessTask(print_progress if show_progress else None),
+    )
+    if show_progress:
+        print()
+    total_of_samples = sampling_conf["total_of_samples"]
+    if isinstance(total_of_samples, list):
+        total_of_samples = sum(total_of_samples)
+    return output_file, sampling.samples_generated, total_of_samples, time.perf_counter() - start
+
+
+def get_output_file(yml_file_path, args):
+    if args.output:
+        return os.path.abspath(args.output)
+    yml_name = os.path.splitext(os.path.basename(yml_file_path))[0]
+    sampling_type = args.type or "sampling"
+    return os.path.abspath(os.path.join(args.output_dir, f"{yml_name} {sampling_type} sampling.{args.format}"))
+
+
+def get_yml_files(inputs):
+    """The yml files of the inputs (files or directories with yml files), and the inputs not found"""
+    yml_files = []
+    inputs_not_found = []
+    for _input in inputs:
+        if os.path.isdir(_input):
+            yml_files += sorted(glob.glob(os.path.join(_input, "*.yml")) + glob.glob(os.path.join(_input, "*.yaml")))
+        elif os.path.isfile(_input):
+            yml_files.append(_input)
+        else:
+            inputs_not_found.append(_input)
+    return [os.path.abspath(yml_file) for yml_file in yml_files], inputs_not_found
+
+
+def script():
+    """Run as a script with arguments"""
+    parser = argparse.ArgumentParser(
+        prog="acatama_sampling", description="Generate samplings with the sampling design of AcATaMa yml files"
+    )
+
+    parser.add_argument("inputs", type=str, nargs="+", help="AcATaMa yml files or directories with yml files")
+    parser.add_argument("-o", "--output", type=str, help="output sampling file, only for one yml file")
+    parser.add_argument("--output-dir", type=str, default=".", help="output directory for the sampling files")
+    parser.add_argument("--format", type=str, default="gpkg", choices=["gpkg", "shp", "fgb"], help="output format")
+    parser.add_argument("--type", type=str, choices=SAMPLING_TYPES, help="sampling type, by default the saved one")
+    parser.add_argument("--seed", type=int, help="random seed, by default the saved one (if any)")
+    parser.add_argument("--engine", type=str, choices=list(SAMPLING_ENGINES), help="engine of the random sampling")
+    parser.add_argument("--jobs", type=int, default=1, help="number of yml files processed in parallel")
+    args = parser.parse_args()
+
+    yml_files, inputs_not_found = get_yml_files(args.inputs)
+    if inputs_not_found:
+        parser.error(f"the inputs do not exist: {', '.join(inputs_not_found)}")
+    if not yml_files:
+        parser.error("no yml files found in the inputs")
+    if args.output and len(yml_files) > 1:
+        parser.error("the --output option is only for one yml file, use --output-dir")
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    print(f"\nGENERATING SAMPLINGS: {len(yml_files)}")
+    sampling_args = [
+        (yml_file, get_output_file(yml_file, args), args.type, args.seed, args.engine, args.jobs == 1)
+        for yml_file in yml_files
+    ]
+
+    results = []
+    if args.jobs == 1:
+        for sampling_arg in sampling_args:
+            results.append(sampling_from_yml(*sampling_arg))
+    else:
+        # each process starts its own QGIS
+        with ProcessPoolExecutor(max_workers=args.jobs, mp_context=get_context("spawn")) as executor:
+            futures = [executor.submit(sampling_from_yml, *sampling_arg) for sampling_arg in sampling_args]
+            results = [future.result() for future in as_completed(futures)]
+
+    for output_file, samples_generated, total_of_samples, elapsed_time in results:
+        print(f"  {output_file}: {samples_generated} of {total_of_samples} samples ({elapsed_time:.1f} s)")
+    print()
+
+
+if __name__ == "__main__":
+    script()
@@ -8,6 +8,7 @@ from qgis.testing import start_app
 from AcATaMa import classFactory
 from AcATaMa.core import config
 from AcATaMa.gui.acatama_dockwidget import AcATaMaDockWidget
+from AcATaMa.utils import others_utils
 
 pytest_plugins = ("pytest_qgis",)
 pytest.tests_data_dir = Path(__file__).parent.resolve() / "data"
@@ -39,6 +40,16 @@ def unwrap():
     yield unwrapper
 
 
+@pytest.fixture(autouse=True)
+def pixel_count_cache_dir(tmp_path, monkeypatch):
+    """The pixel counts saved on disk by the tests go to a temporary directory, not the QGIS profile"""
+    cache_dir = str(tmp_path / "pixel_count_cache")
+    monkeypatch.setattr(others_utils.storage_pixel_count_by_pixel_values, "cache_dir", cache_dir)
+    others_utils.storage_pixel_count_by_pixel_values.clear()
+    yield cache_dir
+    others_utils.storage_pixel_count_by_pixel_values.clear()
+
+
 @pytest.fixture
 def restore_config_file(monkeypatch):
     mock_iface = MagicMock()
@@ -0,0 +1,64 @@
+import json
+import os
+
+import pytest
+
+from AcATaMa.core.analysis_runner import load_analysis, run_analysis
+from AcATaMa.gui import accuracy_assessment_results
+from AcATaMa.utils.others_utils import storage_pixel_count_by_pixel_values
+
+
+def clean_raw_html(html):
+    return html.replace("\n", "").replace("\t", "").replace(" ", "")
+
+
+@pytest.mark.parametrize(
+    "yml_file_name, expected_html_file",
+    [
+        ("Simple exercise - 2019-2020 change - Tinigua.yaml", "accuracy_assessment_simple_revised.html"),
+        (
+            "Simple post-stratify exercise - 2019-2020 change - Tinigua.yaml",
+            "accuracy_assessment_simple_post_stratify_revised.html",
+        ),
+    ],
+)
+def test_headless_analysis_same_as_accuracy_assessment_window(yml_file_name, expected_html_file, plugin):
+    # Given: the response design and the estimator saved in the yml file, without restoring it in the gui
+    yml_file_path = str(pytest.tests_data_dir.parent.parent / "examples" / yml_file_name)
+
+    # When: the accuracy assessment is computed headless
+    analysis = load_analysis(yml_file_path)
+    thematic_map = analysis.thematic_map
+    # the thematic map was counted without the gui, the error matrix doesn't count it again
+    assert (thematic_map.qgs_layer, thematic_map.band, thematic_map.nodata) in storage_pixel_count_by_pixel_values
+    analysis.compute_error_matrix()
+
+    # Then: the results are the same of the accuracy assessment window
+    with open(pytest.tests_data_dir / "analysis" / expected_html_file) as f:
+        result_html_in_file = f.read()
+    assert clean_raw_html(accuracy_assessment_results.get_html(analysis)) == clean_raw_html(result_html_in_file)
+
+
+def test_headless_analysis_results_files(plugin, tmpdir):
+    # Given: an AcATaMa yml file with the response design
+    yml_file_path = str(
+        pytest.tests_data_dir.parent.parent / "examples" / "Simple exercise - 2019-2020 change - Tinigua.yaml"
+    )
+
+    # When: the accuracy assessment is run headless
+    csv_file, json_file, results = run_analysis(yml_file_path, str(tmpdir))
+
+    # Then: the results are saved in csv and json files
+    assert os.path.isfile(csv_file)
+    with open(json_file, encoding="utf-8") as f:
+        results_in_file = json.load(f)
+    assert results_in_file["samples_labeled"] == results["samples_labeled"] > 0
+    assert results_in_file["error_matrix"] == results["error_matrix"]
+    assert results_in_file["results"]
+
+    # When: the output dir doesn't exist
+    # Then: the error writing the results is raised, without the json file
+    output_dir = str(tmpdir.join("missing"))
+    with pytest.raises(FileNotFoundError):
+        run_analysis(yml_file_path, output_dir)
+    assert not os.path.exists(output_dir)
@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+from osgeo import gdal
+
+from AcATaMa.core.map import ComputedCache, Map, RasterBlockCache
+from AcATaMa.utils.others_utils import get_nodata_format
+
+
+def test_block_cache_reads_same_values_as_gdal():
+    # Given: a raster band and a block cache with room for only one block
+    dataset = gdal.Open(str(pytest.tests_data_dir / "test_layer_with_nodata.tif"))
+    band = dataset.GetRasterBand(1)
+    full_array = band.ReadAsArray()
+    block_cache = RasterBlockCache(band, memory_limit=0)
+
+    # When: random pixels are read through the cache
+    rng = np.random.default_rng(0)
+    cols = rng.integers(0, band.XSize, 2000)
+    rows = rng.integers(0, band.YSize, 2000)
+    values = block_cache.read_pixels(cols, rows)
+
+    # Then: the values are the same as the full read and the memory limit is kept
+    assert np.array_equal(values, full_array[rows, cols])
+    assert len(block_cache.blocks) == 1
+    assert block_cache.misses >= 1
+
+    # When: the same pixel is read twice
+    block_cache.read_pixel(0, 0)
+    hits = block_cache.hits
+    block_cache.read_pixel(0, 0)
+
+    # Then: the second read is a cache hit
+    assert block_cache.hits == hits + 1
+
+
+def test_pixel_centroids_same_as_get_pixel_centroid(plugin, restore_config_file):
+    # Given: the thematic map of the sampling test config
+    restore_config_file(pytest.tests_data_dir / "test_sampling.yaml")
+    thematic_map = Map(
+        file_selected_combo_box=plugin.dockwidget.QCBox_ThematicMap,
+        band=int(plugin.dockwidget.QCBox_band_ThematicMap.currentText()),
+        nodata=get_nodata_format(plugin.dockwidget.nodata_ThematicMap.text()),
+    )
+    extent = thematic_map.extent()
+    rng = np.random.default_rng(0)
+    xs = rng.uniform(extent.xMinimum(), extent.xMaximum(), 500)
+    ys = rng.uniform(extent.yMinimum(), extent.yMaximum(), 500)
+
+    # When: the centroids and values are computed vectorized
+    x_centroids, y_centroids = thematic_map.pixel_centroids(xs, ys)
+    values = thematic_map.read_values(xs, ys)
+
+    # Then: they are the same as computed point by point
+    for x, y, x_centroid, y_centroid, value in zip(xs, ys, x_centroids, y_centroids, values, strict=True):
+        assert thematic_map.get_pixel_centroid(x, y) == (x_centroid, y_centroid)
+        pixel_value = thematic_map.get_pixel_value_from_xy(x, y)
+        assert (pixel_value is None and np.isnan(value)) or pixel_value == value
+    # and the pixel of the centroids is the same pixel of the points
+    cols, rows = thematic_map.world_to_pixel(xs, ys)
+    x_corners, y_corners = thematic_map.pixel_to_world(cols, rows)
+    assert np.allclose(x_corners + thematic_map.geotransform[1] / 2, x_centroids)
+    assert np.allclose(y_corners + thematic_map.geotransform[5] / 2, y_centroids)
+
+
+def test_computed_cache_bounded_by_memory_and_source_version():
+    # Given: a cache with room for two arrays of 100 bytes
+    evicted = []
+    cache = ComputedCache(memory_limit=200, on_evict=evicted.append)
+    arrays = {name: np.zeros(100, dtype=np.uint8) for name in "abc"}
+
+    # When: three sources are computed, using the first one again before the third
+    cache.get("a", 1, lambda: arrays["a"])
+    cache.get("b", 1, lambda: arrays["b"])
+    assert cache.get("a", 1, lambda: pytest.fail("it must be cached")) is arrays["a"]
+    cache.get("c", 1, lambda: arrays["c"])
+
+    # Then: the least recently used is evicted to keep the memory limit
+    assert evicted == [arrays["b"]]
+    assert len(cache) == 2 and cache.memory_used == 200
+
+    # When: the source changed
+    new_array = np.ones(100, dtype=np.uint8)
+
+    # Then: the old version is evicted and computed again
+    assert cache.get("a", 2, lambda: new_array) is new_array
+    assert evicted == [arrays["b"], arrays["a"]]
+    assert len(cache) == 2 and cache.memory_used == 200
@@ -0,0 +1,23 @@
+import numpy as np
+
+from AcATaMa.core.neighbor_homogeneity import count_same_class_neighbors
+
+
+def test_count_same_class_neighbors_same_as_pixel_by_pixel():
+    # Given: a map with few classes and nodata, read by chunks with the halo rows
+    rng = np.random.default_rng(0)
+    values = rng.integers(1, 4, (40, 30)).astype(float)
+    values[rng.random(values.shape) > 0.9] = np.nan
+    radius = 2
+    padded = np.pad(values, radius, constant_values=np.nan)
+
+    # When: the counts are computed by chunks of 16 rows
+    counts = np.concatenate(
+        [count_same_class_neighbors(padded[yoff : yoff + 16 + 2 * radius, radius:-radius], radius) for yoff in (0, 16)]
+        + [count_same_class_neighbors(padded[32:, radius:-radius], radius)]
+    )
+
+    # Then: the counts are the same as counting the neighbors pixel by pixel, the pixel included
+    for row, col in np.ndindex(values.shape):
+        window = padded[row : row + 2 * radius + 1, col : col + 2 * radius + 1]
+        assert counts[row, col] == np.count_nonzero(window == values[row, col])
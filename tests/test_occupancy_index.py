@@ -0,0 +1,48 @@
+import numpy as np
+
+from AcATaMa.core.occupancy_index import OccupancyIndex
+
+
+class GridMap:
+    nodata = 0
+
+    def __init__(self, values):
+        self.values = values
+
+    def get_pixel_grid(self):
+        height, width = self.values.shape
+        return 0, width, -height, 0, 1, 1, width, height
+
+    def read_rows_by_chunks(self):
+        for yoff in range(0, self.values.shape[0], 7):
+            yield yoff, self.values[yoff : yoff + 7]
+
+    def valid_data_mask(self, values):
+        valid = ~np.isnan(values)
+        valid[valid] = np.trunc(values[valid]) != self.nodata
+        return valid
+
+
+def test_occupancy_index_counts_by_tile():
+    # Given: a sparse map with several classes and nodata, read by chunks not aligned to the tiles
+    rng = np.random.default_rng(0)
+    values = rng.integers(0, 4, (37, 53)).astype(float)
+    values[rng.random(values.shape) > 0.2] = np.nan
+    values[:20, :30] = np.nan
+
+    # When: the occupancy index is built
+    occupancy_index = OccupancyIndex.build(GridMap(values), tile_size=10)
+
+    # Then: it has the pixels of each class in each tile
+    assert (occupancy_index.tiles_x, occupancy_index.tiles_y) == (6, 4)
+    assert occupancy_index.class_values.tolist() == [1, 2, 3]
+    for tile_idx in range(occupancy_index.tiles_x * occupancy_index.tiles_y):
+        tile_row, tile_col = divmod(tile_idx, occupancy_index.tiles_x)
+        tile = values[tile_row * 10 : (tile_row + 1) * 10, tile_col * 10 : (tile_col + 1) * 10]
+        for class_idx, class_value in enumerate([1, 2, 3]):
+            assert occupancy_index.class_counts[tile_idx, class_idx] == np.count_nonzero(tile == class_value)
+    # and the tiles without data are known without reading them
+    tiles_with_data = occupancy_index.tiles_with_data().reshape(4, 6)
+    assert not tiles_with_data[:2, :3].any()
+    assert tiles_with_data.sum() == occupancy_index.tiles_with_data([1, 2, 3]).sum()
+    assert (occupancy_index.tiles_with_data([2]) <= occupancy_index.tiles_with_data()).all()
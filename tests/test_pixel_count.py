@@ -1,16 +1,24 @@
 import os
 
+import numpy as np
 import pytest
 from osgeo import gdal
 
 from AcATaMa.core.map import auto_symbology_classification_render
 from AcATaMa.utils import others_utils
 from AcATaMa.utils.others_utils import (
+    PixelCountStorage,
+    PixelCountTask,
+    count_pixels_in_one_pass,
+    get_approximate_pixel_count_by_pixel_values,
+    get_histogram,
     get_nodata_format,
     get_pixel_count_by_pixel_values,
+    get_pixel_count_by_pixel_values_in_one_pass,
     get_pixel_count_by_pixel_values_parallel,
     get_pixel_count_by_pixel_values_qgis_native,
     get_pixel_count_by_pixel_values_sequential,
+    get_pixel_count_by_pixel_values_threads,
 )
 from AcATaMa.utils.qgis_utils import load_layer
 
@@ -68,6 +76,30 @@ def test_pixel_count_without_dask_falls_back_to_sequential_when_native_fails(mon
     assert pixel_count == expected_pixel_count
 
 
+def test_pixel_count_with_the_threads_backend_selected(monkeypatch):
+    # Given: the threads backend selected, with dask available
+    layer = object()
+    expected_pixel_count = {1: 2}
+    others_utils.storage_pixel_count_by_pixel_values.clear()
+    monkeypatch.setattr(others_utils, "dask_is_available", lambda: True)
+    monkeypatch.setattr(
+        others_utils,
+        "get_pixel_count_by_pixel_values_parallel",
+        lambda _layer, _band, _pixel_values, _nodata: pytest.fail("Dask path must be skipped"),
+    )
+    monkeypatch.setattr(
+        others_utils,
+        "get_pixel_count_by_pixel_values_threads",
+        lambda _layer, _band, _pixel_values, _nodata: expected_pixel_count,
+    )
+
+    # When: pixel counts are requested through the dispatcher
+    pixel_count = others_utils.get_pixel_count_by_pixel_values(layer, band=1, backend="threads")
+
+    # Then: the threads result is returned
+    assert pixel_count == expected_pixel_count
+
+
 def test_pixel_count_without_nodata_sequential(plugin, restore_config_file):
     # restore
     input_yml_path = pytest.tests_data_dir / "test_pixel_count_acatama.yaml"
@@ -128,6 +160,36 @@ def test_pixel_count_without_nodata_parallel(plugin, restore_config_file):
     }
 
 
+def test_pixel_count_without_nodata_threads(plugin, restore_config_file):
+    # restore
+    input_yml_path = pytest.tests_data_dir / "test_pixel_count_acatama.yaml"
+    restore_config_file(input_yml_path)
+
+    pixel_count = get_pixel_count_by_pixel_values_threads(
+        plugin.dockwidget.QCBox_ThematicMap.currentLayer(), band=2, nodata=None, workers=4, max_pixels=1000
+    )
+
+    assert pixel_count == {
+        0: 3227,
+        34: 11,
+        35: 44,
+        36: 22,
+        37: 49,
+        38: 17,
+        40: 2,
+        42: 1,
+        43: 1,
+        44: 79,
+        45: 5,
+        46: 468,
+        47: 57,
+        49: 3,
+        51: 1,
+        52: 15,
+        53: 24,
+    }
+
+
 def test_pixel_count_without_nodata_qgis_native(plugin, restore_config_file):
     pytest.importorskip("processing")
     # restore
@@ -189,6 +251,21 @@ def test_pixel_count_with_nodata_parallel(plugin, restore_config_file):
     assert pixel_count == {1: 10423, 2: 418, 5: 8822}
 
 
+def test_pixel_count_with_nodata_threads(plugin, restore_config_file):
+    # restore
+    input_yml_path = pytest.tests_data_dir / "test_pixel_count_acatama_nodata.yaml"
+    restore_config_file(input_yml_path)
+    sampling_design = plugin.dockwidget.sampling_design_window
+
+    pixel_count = get_pixel_count_by_pixel_values_threads(
+        plugin.dockwidget.QCBox_ThematicMap.currentLayer(),
+        band=int(sampling_design.QCBox_band_SamplingMap_StraRS.currentText()),
+        nodata=get_nodata_format(sampling_design.nodata_SamplingMap_StraRS.text()),
+    )
+
+    assert pixel_count == {1: 10423, 2: 418, 5: 8822}
+
+
 def test_pixel_count_with_nodata_qgis_native(plugin, restore_config_file):
     pytest.importorskip("processing")
     # restore
@@ -216,3 +293,163 @@ def test_pixel_count_and_auto_symbology(plugin, tmpdir):
     pixel_count = get_pixel_count_by_pixel_values(layer, band=1, nodata=None)
 
     assert pixel_count == {-2147483647: 15785, 1: 10423, 2: 418, 5: 8822}
+
+
+def test_pixel_count_of_several_rasters_in_one_pass(plugin, restore_config_file):
+    # Given: the same band counted with and without nodata
+    input_yml_path = pytest.tests_data_dir / "test_pixel_count_acatama.yaml"
+    restore_config_file(input_yml_path)
+    layer = plugin.dockwidget.QCBox_ThematicMap.currentLayer()
+    pixel_count_by_pixel_values = get_pixel_count_by_pixel_values_sequential(layer, band=2, nodata=None)
+
+    # When: both are counted in one pass with the cross-tabulation between them
+    (pixel_count, pixel_count_with_nodata), crosstab = get_pixel_count_by_pixel_values_in_one_pass(
+        [(layer, 2, None), (layer, 2, 0)], crosstab=(0, 1), max_pixels=1000
+    )
+
+    # Then: the pixel count of each one is the same of counting them separately
+    assert pixel_count == pixel_count_by_pixel_values
+    assert pixel_count_with_nodata == {
+        value: count for value, count in pixel_count_by_pixel_values.items() if value != 0
+    }
+    # and the cross-tabulation of the same band is the diagonal without the nodata
+    assert crosstab == {(value, value): count for value, count in pixel_count_with_nodata.items() if count}
+
+
+def test_pixel_count_in_a_background_task(plugin, restore_config_file):
+    # Given: the pixel count of a thematic map in a background task
+    input_yml_path = pytest.tests_data_dir / "test_pixel_count_acatama.yaml"
+    restore_config_file(input_yml_path)
+    layer = plugin.dockwidget.QCBox_ThematicMap.currentLayer()
+    pixel_count_by_pixel_values = get_pixel_count_by_pixel_values_sequential(layer, band=2, nodata=None)
+    others_utils.storage_pixel_count_by_pixel_values.clear(on_disk=True)
+    results = []
+    task = PixelCountTask([(layer, 2, None)])
+    task.callbacks.append(results.append)
+
+    # When: the task runs and finishes
+    task.finished(task.run())
+
+    # Then: the pixel count is saved in the storage and passed to the callbacks
+    assert results == [[pixel_count_by_pixel_values]]
+    assert others_utils.storage_pixel_count_by_pixel_values[(layer, 2, None)] == pixel_count_by_pixel_values
+
+    # When: the task is canceled before counting
+    others_utils.storage_pixel_count_by_pixel_values.clear(on_disk=True)
+    task = PixelCountTask([(layer, 2, None)])
+    task.callbacks.append(results.append)
+    task.cancel()
+    task.finished(task.run())
+
+    # Then: nothing is saved and the callbacks get None
+    assert results[-1] is None
+    assert (layer, 2, None) not in others_utils.storage_pixel_count_by_pixel_values
+
+
+def test_approximate_pixel_count(plugin):
+    # Given: a thematic map without overviews
+    layer = load_layer(str(pytest.tests_data_dir / "test_layer_with_nodata.tif"))
+    nodata = -2147483647
+    exact_pixel_count = {1: 10423, 2: 418, 5: 8822}
+
+    # When: the image is small enough to be read completely
+    pixel_count, error_bound = get_approximate_pixel_count_by_pixel_values(layer, 1, [1, 2, 5], nodata)
+
+    # Then: the pixel count is exact
+    assert pixel_count == exact_pixel_count
+    assert error_bound == {1: 0, 2: 0, 5: 0}
+
+    # When: it is estimated from a subsample of the image
+    pixel_count, error_bound = get_approximate_pixel_count_by_pixel_values(layer, 1, [1, 2, 5], nodata, max_pixels=4096)
+
+    # Then: the estimation is close to the exact pixel count, with an error bound for each class
+    assert list(pixel_count) == [1, 2, 5]
+    for pixel_value in [1, 5]:
+        assert abs(pixel_count[pixel_value] - exact_pixel_count[pixel_value]) < 0.1 * exact_pixel_count[pixel_value]
+    assert all(error_bound[pixel_value] > 0 for pixel_value in [1, 2, 5])
+
+
+def test_pixel_count_storage_on_disk(plugin, tmpdir):
+    # Given: a pixel count saved in the storage for a layer file
+    layer_file = tmpdir.join("test_layer_with_nodata.tif")
+    gdal.Translate(str(layer_file), str(pytest.tests_data_dir / "test_layer_with_nodata.tif"))
+    layer = load_layer(str(layer_file))
+    cache_dir = str(tmpdir.join("pixel_count_cache"))
+    PixelCountStorage(cache_dir=cache_dir)[(layer, 1, None)] = {1: 10423, 2: 418, 5: 8822}
+
+    # When: the layer is loaded again in a new storage (e.g. after restarting QGIS)
+    layer_reloaded = load_layer(str(layer_file))
+    storage = PixelCountStorage(max_items_in_memory=1, cache_dir=cache_dir)
+
+    # Then: the pixel count is restored from disk
+    assert storage[(layer_reloaded, 1, None)] == {1: 10423, 2: 418, 5: 8822}
+    assert (layer_reloaded, 2, None) not in storage
+
+    # When: the file changes
+    stat = os.stat(str(layer_file))
+    os.utime(str(layer_file), ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    # Then: the pixel count saved is discarded
+    assert (layer_reloaded, 1, None) not in storage
+    assert not os.listdir(cache_dir)
+
+    # When: a pixel count is set only in memory (e.g. restored from a config file)
+    storage.set_in_memory((layer_reloaded, 1, None), {1: 1, 2: 2, 5: 5})
+
+    # Then: it is used but not saved on disk
+    assert storage[(layer_reloaded, 1, None)] == {1: 1, 2: 2, 5: 5}
+    assert not os.listdir(cache_dir)
+
+    # When: the storage is cleared also on disk
+    storage[(layer_reloaded, 2, None)] = {1: 10423}
+    storage.clear(on_disk=True)
+
+    # Then: the pixel counts are forgotten
+    assert (layer_reloaded, 2, None) not in storage
+    assert not os.listdir(cache_dir)
+
+
+@pytest.mark.parametrize("dtype", [np.uint8, np.int16, np.uint16, np.int32, np.uint32])
+@pytest.mark.parametrize("low, high", [(0, 50), (-100, 100), (-(2**31), 2**31 - 1)])
+def test_histogram_kernel_same_as_unique(dtype, low, high):
+    # Given: a block of pixel values in the range of the data type (small or sparse large values)
+    info = np.iinfo(dtype)
+    block = np.random.default_rng(0).integers(max(low, info.min), min(high, info.max), (64, 80), endpoint=True)
+    block = block.astype(dtype)
+
+    # When: the pixel values are counted with the histogram kernel
+    values, counts = get_histogram(block)
+
+    # Then: it is the same count of np.unique
+    unique_values, unique_counts = np.unique(block, return_counts=True)
+    assert values == unique_values.tolist()
+    assert counts == unique_counts.tolist()
+
+
+def test_crosstab_in_one_pass_same_as_unique_of_the_pairs(tmpdir):
+    # Given: a thematic map with negative values and a stratification map, both with nodata
+    rng = np.random.default_rng(0)
+    thematic_values = rng.integers(-3, 4, (70, 50)).astype(np.int16)
+    strata_values = rng.integers(0, 5, (70, 50)).astype(np.uint8)
+    rasters = []
+    for name, values, data_type, nodata in (
+        ("thematic.tif", thematic_values, gdal.GDT_Int16, -3),
+        ("strata.tif", strata_values, gdal.GDT_Byte, 0),
+    ):
+        dataset = gdal.GetDriverByName("GTiff").Create(str(tmpdir.join(name)), 50, 70, 1, data_type)
+        dataset.GetRasterBand(1).WriteArray(values)
+        del dataset
+        rasters.append((str(tmpdir.join(name)), 1, nodata, []))
+
+    # When: both are counted in one pass by blocks with the cross-tabulation between them
+    pixel_counts, crosstab = count_pixels_in_one_pass(rasters, crosstab=(0, 1), max_pixels=1000)
+
+    # Then: the cross-tabulation is the count of the pairs of values without the nodata of both
+    valid = (thematic_values != -3) & (strata_values != 0)
+    pairs, counts = np.unique(
+        np.stack([thematic_values[valid], strata_values[valid]], axis=1), axis=0, return_counts=True
+    )
+    assert crosstab == {(int(a), int(b)): int(count) for (a, b), count in zip(pairs, counts, strict=True)}
+    # and the marginals of the cross-tabulation are inside the pixel count of each raster
+    for (thematic_value, _), count in crosstab.items():
+        assert pixel_counts[0][thematic_value] >= count
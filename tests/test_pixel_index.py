@@ -0,0 +1,39 @@
+import numpy as np
+
+from AcATaMa.core.pixel_index import PixelIndex, get_runs_in_mask
+
+
+class GridMap:
+    def pixel_to_world(self, cols, rows):
+        return np.asarray(cols, dtype=float), -np.asarray(rows, dtype=float)
+
+
+def test_runs_in_mask():
+    # Given: a mask with several runs by row
+    mask = np.array([[1, 1, 0, 1], [0, 0, 0, 0], [0, 1, 1, 1]], dtype=bool)
+
+    # When: the runs are computed
+    rows, start_cols, lengths = get_runs_in_mask(mask)
+
+    # Then: the runs cover exactly the true pixels
+    assert rows.tolist() == [0, 0, 2]
+    assert start_cols.tolist() == [0, 3, 1]
+    assert lengths.tolist() == [2, 1, 3]
+
+
+def test_pixel_index_draws_only_in_eligible_pixels():
+    # Given: a pixel index built from a sparse mask
+    rng = np.random.default_rng(0)
+    mask = rng.random((50, 80)) > 0.97
+    rows, cols, lengths = get_runs_in_mask(mask)
+    pixel_index = PixelIndex(GridMap(), rows, cols, lengths)
+
+    # When: random points are drawn
+    xs, ys = pixel_index.draw(rng, 5000)
+
+    # Then: all points are inside eligible pixels and all eligible pixels can be drawn
+    assert pixel_index.total_pixels == mask.sum()
+    drawn = np.zeros_like(mask)
+    drawn[np.floor(-ys).astype(int), np.floor(xs).astype(int)] = True
+    assert not (drawn & ~mask).any()
+    assert (drawn == mask).all()
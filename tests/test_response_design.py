@@ -0,0 +1,58 @@
+import random
+
+import pytest
+from qgis.core import QgsVectorLayer
+
+from AcATaMa.core.response_design import ResponseDesign
+
+
+def test_response_design_points_same_as_features():
+    # Given: a sampling file with the id of the samples
+    sampling_layer = QgsVectorLayer(str(pytest.tests_data_dir / "stratified_random_sampling.gpkg"), "sampling", "ogr")
+    features = {
+        feature["id"]: (feature.geometry().asPoint().x(), feature.geometry().asPoint().y())
+        for feature in sampling_layer.getFeatures()
+    }
+
+    # When: the response design is created with the same global random state
+    random.seed(42)
+    shuffled_ids = list(features)
+    random.shuffle(shuffled_ids)
+    random.seed(42)
+    response_design = ResponseDesign(sampling_layer)
+
+    # Then: the points are read in bulk, in the same random order of the features
+    assert response_design.num_points == len(features)
+    assert response_design.points.sample_id.tolist() == shuffled_ids
+    for point in response_design.points:
+        assert (point.QgsPnt.x(), point.QgsPnt.y()) == features[point.sample_id]
+
+    # and the labels of the views are saved in the columns
+    response_design.current_sample_idx = 3
+    response_design.label_the_current_sample(2)
+    labeling_points = response_design.points.take([3, 0])
+    assert labeling_points[0].label_id == 2 and labeling_points[0].is_labeled
+    assert labeling_points[-1].label_id is None and not labeling_points[-1].is_labeled
+    assert response_design.total_labeled == 1
+
+
+def test_response_design_samples_indexed_by_id():
+    # Given: a response design over a sampling file
+    sampling_layer = QgsVectorLayer(str(pytest.tests_data_dir / "stratified_random_sampling.gpkg"), "sampling", "ogr")
+    response_design = ResponseDesign(sampling_layer)
+
+    # When: the points are reordered
+    response_design.points = response_design.points.take(list(range(response_design.num_points))[::-1])
+
+    # Then: the index by sample id follows the new order
+    for sample_idx, point in enumerate(response_design.points):
+        assert response_design.sample_idx_by_id[point.sample_id] == sample_idx
+
+    # and the next/previous samples not labeled skip the labeled ones
+    for sample_idx in (1, 2):
+        response_design.current_sample_idx = sample_idx
+        response_design.label_the_current_sample(1)
+    assert response_design.get_next_sample_not_labeled(0) == 3
+    assert response_design.get_previous_sample_not_labeled(3) == 0
+    assert response_design.get_next_sample_not_labeled(response_design.num_points - 1) is None
+    assert response_design.get_previous_sample_not_labeled(0) is None
@@ -0,0 +1,32 @@
+import random
+
+import numpy as np
+
+from AcATaMa.core.sample_set import SampleSet
+
+
+def test_sample_set_same_as_list_of_points():
+    # Given: samples added one by one and in batches, more than the initial capacity
+    rng = np.random.default_rng(0)
+    xs, ys = rng.random(1000), rng.random(1000)
+    strata = rng.integers(0, 3, 1000)
+    sample_set = SampleSet(capacity=16)
+    for x, y, stratum in zip(xs[:10].tolist(), ys[:10].tolist(), strata[:10].tolist(), strict=True):
+        sample_set.append(x, y, stratum)
+    sample_set.extend(xs[10:500], ys[10:500], strata[10:500])
+    sample_set.extend(xs[500:], ys[500:], 1)
+    points = [(x, y, stratum) for x, y, stratum in zip(xs, ys, strata, strict=True)]
+    points[500:] = [(x, y, 1) for x, y, _ in points[500:]]
+
+    # When: the samples are shuffled as the list of points with the same seed
+    sample_set.shuffle(random.Random(123))
+    random.Random(123).shuffle(points)
+
+    # Then: the samples are in the same order, with the ids renumbered from 1
+    assert len(sample_set) == 1000
+    assert sample_set.x.tolist() == [x for x, _, _ in points]
+    assert sample_set.y.tolist() == [y for _, y, _ in points]
+    assert sample_set.stratum.tolist() == [stratum for _, _, stratum in points]
+    assert sample_set.id.tolist() == list(range(1, 1001))
+    assert not sample_set.flags.any()
+    assert [(point.x(), point.y()) for point in sample_set.values()] == [(x, y) for x, y, _ in points]
@@ -1,12 +1,18 @@
 import random
+from concurrent.futures import ThreadPoolExecutor
 
 import fiona
+import numpy as np
 import pytest
+from osgeo import gdal, osr
+from qgis.core import QgsFeature, QgsGeometry, QgsRectangle, QgsVectorLayer
 from shapely.geometry import shape
 
+from AcATaMa.core.aoi_mask import get_aoi_mask
 from AcATaMa.core.map import Map
 from AcATaMa.core.sampling_design import Sampling
 from AcATaMa.utils.others_utils import get_nodata_format
+from AcATaMa.utils.sampling_utils import MinDistanceGrid, draw_random_floats
 
 
 def test_simple_post_stratified_random_sampling(plugin, restore_config_file, tmpdir):
@@ -416,3 +422,334 @@ def test_systematic_right_bottom_borders_with_offset(plugin, restore_config_file
     ):
         for s, t in zip(source, target, strict=False):
             assert shape(s["geometry"]).equals(shape(t["geometry"]))
+
+
+def test_draw_random_floats_same_as_python_random():
+    # Given two python random generators with the same seed
+    rng_a = random.Random(123)
+    rng_b = random.Random(123)
+
+    # When the floats are drawn in batch with one and one by one with the other
+    random_floats = draw_random_floats(1001, rng_a)
+    expected = [rng_b.random() for _ in range(1001)]
+
+    # Then the values and the state left are the same
+    assert random_floats.tolist() == expected
+    assert rng_a.random() == rng_b.random()
+
+
+def test_min_distance_grid_same_as_sequential_check():
+    # Given random candidates in batches and a min distance with many conflicts
+    rng = np.random.default_rng(0)
+    xs = rng.uniform(0, 1000, 6000)
+    ys = rng.uniform(0, 1000, 6000)
+    min_distance = 15
+    min_distance_grid = MinDistanceGrid(min_distance)
+
+    # When the candidates are accepted in batches with the grid hash
+    accepted = np.concatenate(
+        [min_distance_grid.accept(xs[i : i + 1000], ys[i : i + 1000]) for i in range(0, len(xs), 1000)]
+    )
+
+    # Then the accepted points are the same as checking one by one in order
+    expected = []
+    for idx, (x, y) in enumerate(zip(xs, ys, strict=True)):
+        if all((x - xs[j]) ** 2 + (y - ys[j]) ** 2 >= min_distance**2 for j in expected):
+            expected.append(idx)
+    assert np.flatnonzero(accepted).tolist() == expected
+    assert len(min_distance_grid) == len(expected)
+
+
+def test_systematic_grid_nodes_same_as_walking_the_grid():
+    # Given a start, a spacing and the limits of the grid in both directions
+    start, spacing, limit = 300085.73, 1000.3, 310000.0
+
+    # When the grid nodes are computed at once
+    x_nodes = Sampling.get_systematic_grid_nodes(start, spacing, limit)
+    y_nodes = Sampling.get_systematic_grid_nodes(start, -spacing, start - 8000)
+
+    # Then they are exactly the same as walking the grid adding the spacing
+    expected_x, x = [], start
+    while x <= limit:
+        expected_x.append(x)
+        x += spacing
+    expected_y, y = [], start
+    while y >= start - 8000:
+        expected_y.append(y)
+        y -= spacing
+    assert x_nodes.tolist() == expected_x
+    assert y_nodes.tolist() == expected_y
+
+
+def test_tiles_engine_same_sampling_for_any_number_of_workers(plugin, restore_config_file, tmpdir, monkeypatch):
+    # Given the simple post-stratified random sampling config with the parallel tiles engine
+    restore_config_file(pytest.tests_data_dir / "test_sampling.yaml")
+    sampling_design = plugin.dockwidget.sampling_design_window
+    thematic_map = Map(
+        file_selected_combo_box=plugin.dockwidget.QCBox_ThematicMap,
+        band=int(plugin.dockwidget.QCBox_band_ThematicMap.currentText()),
+        nodata=get_nodata_format(plugin.dockwidget.nodata_ThematicMap.text()),
+    )
+    post_stratification_map = Map(
+        file_selected_combo_box=sampling_design.QCBox_PostStratMap_SimpRS,
+        band=int(sampling_design.QCBox_band_PostStratMap_SimpRS.currentText()),
+        nodata=get_nodata_format(sampling_design.nodata_PostStratMap_SimpRS.text()),
+    )
+    sampling_conf = {
+        "total_of_samples": int(sampling_design.numberOfSamples_SimpRS.value()),
+        "min_distance": float(sampling_design.minDistance_SimpRS.value()),
+        "classes_selected": [int(p) for p in sampling_design.QPBtn_PostStratMapClasses_SimpRS.text().split(",")],
+        "neighbor_aggregation": None,
+        "random_seed": 123,
+        "sampling_engine": "tiles",
+    }
+    task = type("QgsTask", (object,), {"setProgress": lambda x: None, "isCanceled": lambda: False})
+    monkeypatch.setattr("AcATaMa.core.sampling_design.SAMPLING_TILE_SIZE", 64)
+
+    # When the sampling is generated with one and with several workers
+    samplings = []
+    for workers in (1, 4):
+        monkeypatch.setattr("AcATaMa.core.sampling_design.get_sampling_workers", lambda workers=workers: workers)
+        output_file = str(tmpdir.join(f"tiles_sampling_{workers}.gpkg"))
+        sampling = Sampling(
+            "simple", thematic_map, post_stratification_map=post_stratification_map, output_file=output_file
+        )
+        sampling.generate_sampling_points(task, dict(sampling_conf))
+        samplings.append([(point.x(), point.y()) for point in sampling.points.values()])
+
+    # Then the samplings are the same and complete
+    assert samplings[0] == samplings[1]
+    assert len(samplings[0]) == sampling_conf["total_of_samples"]
+
+
+def test_tiles_engine_same_sampling_skipping_tiles_without_data(plugin, restore_config_file, tmpdir, monkeypatch):
+    # Given the simple post-stratified random sampling config with the parallel tiles engine
+    restore_config_file(pytest.tests_data_dir / "test_sampling.yaml")
+    sampling_design = plugin.dockwidget.sampling_design_window
+    thematic_map = Map(
+        file_selected_combo_box=plugin.dockwidget.QCBox_ThematicMap,
+        band=int(plugin.dockwidget.QCBox_band_ThematicMap.currentText()),
+        nodata=get_nodata_format(plugin.dockwidget.nodata_ThematicMap.text()),
+    )
+    post_stratification_map = Map(
+        file_selected_combo_box=sampling_design.QCBox_PostStratMap_SimpRS,
+        band=int(sampling_design.QCBox_band_PostStratMap_SimpRS.currentText()),
+        nodata=get_nodata_format(sampling_design.nodata_PostStratMap_SimpRS.text()),
+    )
+    sampling_conf = {
+        "total_of_samples": int(sampling_design.numberOfSamples_SimpRS.value()),
+        "min_distance": float(sampling_design.minDistance_SimpRS.value()),
+        "classes_selected": [int(p) for p in sampling_design.QPBtn_PostStratMapClasses_SimpRS.text().split(",")],
+        "neighbor_aggregation": None,
+        "random_seed": 123,
+        "sampling_engine": "tiles",
+    }
+    task = type("QgsTask", (object,), {"setProgress": lambda x: None, "isCanceled": lambda: False})
+    monkeypatch.setattr("AcATaMa.core.sampling_design.SAMPLING_TILE_SIZE", 16)
+
+    def generate_sampling(name):
+        sampling = Sampling(
+            "simple",
+            thematic_map,
+            post_stratification_map=post_stratification_map,
+            output_file=str(tmpdir.join(name + ".gpkg")),
+        )
+        sampling.generate_sampling_points(task, dict(sampling_conf))
+        return [(point.x(), point.y()) for point in sampling.points.values()]
+
+    # When the sampling is generated skipping the tiles without data and drawing in all tiles
+    sampling_skipping_tiles = generate_sampling("skipping_tiles")
+    get_tiles_with_data = Sampling.get_tiles_with_data
+    tiles_skipped = []
+
+    def get_all_tiles(self, samples_remaining):
+        tiles_with_data = get_tiles_with_data(self, samples_remaining)
+        tiles_skipped.append(int((~tiles_with_data).sum()))
+        return np.ones_like(tiles_with_data)
+
+    monkeypatch.setattr(Sampling, "get_tiles_with_data", get_all_tiles)
+    sampling_all_tiles = generate_sampling("all_tiles")
+
+    # Then some tiles are skipped and the samplings are the same
+    assert max(tiles_skipped) > 0
+    assert sampling_skipping_tiles == sampling_all_tiles
+    assert len(sampling_skipping_tiles) == sampling_conf["total_of_samples"]
+
+
+@pytest.mark.parametrize("sampling_engine", ["rejection", "pixel_index", "tiles"])
+def test_simple_random_sampling_inside_area_of_interest(sampling_engine, plugin, restore_config_file, tmpdir):
+    # Given the thematic map and an area of interest with two polygons, filtered to the left half of the map
+    restore_config_file(pytest.tests_data_dir / "test_sampling.yaml")
+    sampling_design = plugin.dockwidget.sampling_design_window
+    thematic_map = Map(
+        file_selected_combo_box=plugin.dockwidget.QCBox_ThematicMap,
+        band=int(plugin.dockwidget.QCBox_band_ThematicMap.currentText()),
+        nodata=get_nodata_format(plugin.dockwidget.nodata_ThematicMap.text()),
+    )
+    x_min, x_max, y_min, y_max, x_res, _, _, _ = thematic_map.get_pixel_grid()
+    x_mid = (x_min + x_max) / 2
+    crs = thematic_map.qgs_layer.crs().authid()
+    aoi_layer = QgsVectorLayer(f"Polygon?crs={crs}&field=zone:string", "aoi", "memory")
+    for zone, rectangle in (
+        ("left", QgsRectangle(x_min, y_min, x_mid, y_max)),
+        ("right", QgsRectangle(x_mid, y_min, x_max, y_max)),
+    ):
+        feature = QgsFeature(aoi_layer.fields())
+        feature.setGeometry(QgsGeometry.fromRect(rectangle))
+        feature.setAttribute("zone", zone)
+        aoi_layer.dataProvider().addFeature(feature)
+    aoi_mask = get_aoi_mask(aoi_layer, thematic_map, "\"zone\" = 'left'")
+    sampling_conf = {
+        "total_of_samples": int(sampling_design.numberOfSamples_SimpRS.value()),
+        "min_distance": float(sampling_design.minDistance_SimpRS.value()),
+        "classes_selected": None,
+        "neighbor_aggregation": None,
+        "random_seed": 123,
+        "sampling_engine": sampling_engine,
+    }
+    task = type("QgsTask", (object,), {"setProgress": lambda x: None, "isCanceled": lambda: False})
+
+    # When the sampling is generated with the area of interest
+    sampling = Sampling("simple", thematic_map, output_file=str(tmpdir.join("aoi_sampling.gpkg")), aoi_mask=aoi_mask)
+    sampling.generate_sampling_points(task, sampling_conf)
+
+    # Then all samples are in the pixels with the center inside the filtered polygon
+    assert get_aoi_mask(aoi_layer, thematic_map, "\"zone\" = 'left'") is aoi_mask
+    assert len(sampling.points) == sampling_conf["total_of_samples"]
+    assert all(point.x() < x_mid + x_res for point in sampling.points.values())
+
+
+def test_concurrent_samplings_same_as_serial(plugin, restore_config_file, tmpdir):
+    # Given the simple post-stratified random sampling config and two seeds
+    restore_config_file(pytest.tests_data_dir / "test_sampling.yaml")
+    sampling_design = plugin.dockwidget.sampling_design_window
+    thematic_map = Map(
+        file_selected_combo_box=plugin.dockwidget.QCBox_ThematicMap,
+        band=int(plugin.dockwidget.QCBox_band_ThematicMap.currentText()),
+        nodata=get_nodata_format(plugin.dockwidget.nodata_ThematicMap.text()),
+    )
+    task = type("QgsTask", (object,), {"setProgress": lambda x: None, "isCanceled": lambda: False})
+
+    def run_sampling(random_seed, name):
+        sampling = Sampling("simple", thematic_map.clone(), output_file=str(tmpdir.join(name + ".gpkg")))
+        sampling_conf = {
+            "total_of_samples": int(sampling_design.numberOfSamples_SimpRS.value()),
+            "min_distance": float(sampling_design.minDistance_SimpRS.value()),
+            "classes_selected": None,
+            "neighbor_aggregation": None,
+            "random_seed": random_seed,
+        }
+        sampling.generate_sampling_points(task, sampling_conf)
+        return [(point.x(), point.y()) for point in sampling.points.values()]
+
+    # When they are generated one after the other and at the same time in two threads
+    serial = [run_sampling(1, "serial_1"), run_sampling(2, "serial_2")]
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        concurrent = list(executor.map(run_sampling, (1, 2), ("concurrent_1", "concurrent_2")))
+
+    # Then the samplings are the same, each sampling has its own random generator
+    assert concurrent == serial
+
+
+def create_raster(file_path, values, block_y_size, nodata=None):
+    """Byte raster in EPSG:32618 with 30m pixels and the rows by gdal block given"""
+    height, width = values.shape
+    options = [f"BLOCKYSIZE={block_y_size}"] if block_y_size < 16 else ["TILED=YES", f"BLOCKYSIZE={block_y_size}"]
+    dataset = gdal.GetDriverByName("GTiff").Create(str(file_path), width, height, 1, gdal.GDT_Byte, options)
+    dataset.SetGeoTransform([0, 30, 0, height * 30, 0, -30])
+    srs = osr.SpatialReference()
+    srs.ImportFromEPSG(32618)
+    dataset.SetProjection(srs.ExportToWkt())
+    band = dataset.GetRasterBand(1)
+    band.WriteArray(values)
+    if nodata is not None:
+        band.SetNoDataValue(nodata)
+    del band, dataset
+    return str(file_path)
+
+
+def test_pixel_index_engine_with_aligned_maps_of_different_block_sizes(plugin, tmpdir):
+    # Given a striped thematic map and a tiled post-stratification map with the same pixel grid, the
+    # chunks read by rows of each map have different heights (4194 and 4096 rows for width 1000)
+    thematic_values = np.ones((5000, 1000), dtype=np.uint8)
+    post_stratification_values = np.full((5000, 1000), 2, dtype=np.uint8)
+    post_stratification_values[4150:4200, 100:900] = 1
+    thematic_map = Map.from_file(create_raster(tmpdir.join("thematic.tif"), thematic_values, 1))
+    post_stratification_map = Map.from_file(
+        create_raster(tmpdir.join("post_stratification.tif"), post_stratification_values, 256)
+    )
+    assert thematic_map.is_aligned_with(post_stratification_map)
+    sampling_conf = {
+        "total_of_samples": 200,
+        "min_distance": 0,
+        "classes_selected": [1],
+        "neighbor_aggregation": None,
+        "random_seed": 123,
+        "sampling_engine": "pixel_index",
+    }
+    task = type("QgsTask", (object,), {"setProgress": lambda x: None, "isCanceled": lambda: False})
+
+    # When the sampling is generated with the pixel index engine
+    sampling = Sampling(
+        "simple",
+        thematic_map,
+        post_stratification_map=post_stratification_map,
+        output_file=str(tmpdir.join("sampling.gpkg")),
+    )
+    sampling.generate_sampling_points(task, sampling_conf)
+
+    # Then all samples are in the pixels of the class selected of the post-stratification map
+    assert sampling.sampling_engine == "pixel_index"
+    assert len(sampling.points) == sampling_conf["total_of_samples"]
+    cols, rows = thematic_map.world_to_pixel(sampling.points.x, sampling.points.y)
+    assert (post_stratification_values[rows, cols] == 1).all()
+
+
+def test_stratified_pixel_index_engine(plugin, tmpdir):
+    # Given a tiled sampling map with three strata and a striped thematic map with nodata in a band of rows
+    rng = np.random.default_rng(0)
+    sampling_map_values = rng.integers(1, 4, (5000, 1000)).astype(np.uint8)
+    sampling_map_values[:, :100] = 0
+    thematic_values = rng.integers(1, 6, (5000, 1000)).astype(np.uint8)
+    thematic_values[4000:4500] = 0
+    sampling_map = Map.from_file(create_raster(tmpdir.join("sampling_map.tif"), sampling_map_values, 256), nodata=0)
+    thematic_map = Map.from_file(create_raster(tmpdir.join("thematic.tif"), thematic_values, 1, nodata=0), nodata=0)
+    classes_for_sampling = [1, 2, 3]
+    task = type("QgsTask", (object,), {"setProgress": lambda x: None, "isCanceled": lambda: False})
+
+    def generate_sampling(name, random_seed):
+        sampling = Sampling(
+            "stratified",
+            thematic_map,
+            sampling_map=sampling_map,
+            sampling_method="fixed values",
+            output_file=str(tmpdir.join(name + ".gpkg")),
+        )
+        sampling_conf = {
+            "total_of_samples": [30, 0, 70],
+            "min_distance": 0,
+            "classes_selected": classes_for_sampling,
+            "neighbor_aggregation": None,
+            "random_seed": random_seed,
+            "sampling_engine": "pixel_index",
+        }
+        sampling.generate_sampling_points(task, sampling_conf)
+        return sampling
+
+    # When the sampling is generated twice with the same seed and once with another seed
+    sampling = generate_sampling("sampling", 123)
+    same_seed = generate_sampling("same_seed", 123)
+    other_seed = generate_sampling("other_seed", 321)
+
+    # Then each stratum has exactly its samples, inside the stratum and in valid data of the thematic map
+    assert sampling.sampling_engine == "pixel_index"
+    assert sampling.samples_in_strata == [30, 0, 70]
+    assert np.bincount(sampling.points.stratum, minlength=3).tolist() == [30, 0, 70]
+    cols, rows = sampling_map.world_to_pixel(sampling.points.x, sampling.points.y)
+    strata_values = np.array(classes_for_sampling)[sampling.points.stratum]
+    assert (sampling_map_values[rows, cols] == strata_values).all()
+    assert (thematic_values[rows, cols] != 0).all()
+    # and the sampling is reproducible by the seed
+    assert sampling.points.x.tolist() == same_seed.points.x.tolist()
+    assert sampling.points.y.tolist() == same_seed.points.y.tolist()
+    assert sampling.points.x.tolist() != other_seed.points.x.tolist()
@@ -0,0 +1,60 @@
+import time
+
+from AcATaMa.core.sampling_queue import SamplingJob, SamplingJobQueue
+
+
+def wait_until_canceled(task, sampling_conf):
+    while not task.isCanceled():
+        time.sleep(0.01)
+    return None, sampling_conf
+
+
+def test_sampling_job_queue_cancel_jobs(plugin):
+    # Given: a queue that runs one job at the same time
+    sampling_job_queue = SamplingJobQueue(max_parallel_jobs=1)
+    jobs_updated = []
+    sampling_job_queue.job_updated.connect(jobs_updated.append)
+
+    # When: two jobs are added
+    job_1 = sampling_job_queue.add_job("job 1", wait_until_canceled, {}, lambda exception, result: None)
+    job_2 = sampling_job_queue.add_job("job 2", wait_until_canceled, {}, lambda exception, result: None)
+
+    # Then: the first one is running and the second one waits in the queue
+    assert job_1.status == SamplingJob.RUNNING
+    assert job_2.status == SamplingJob.QUEUED
+    assert list(sampling_job_queue.queued_jobs) == [job_2]
+
+    # When: the queued job is canceled
+    sampling_job_queue.cancel_job(job_2.job_id)
+
+    # Then: it is removed from the queue and never runs
+    assert job_2.status == SamplingJob.CANCELED
+    assert job_2.task is None
+    assert not sampling_job_queue.queued_jobs
+    assert job_2 in jobs_updated
+
+    # When: the running job is canceled
+    sampling_job_queue.cancel_job(job_1.job_id)
+    job_1.task.waitForFinished()
+
+    # Then: its task is canceled
+    assert job_1.task.isCanceled()
+
+
+def test_sampling_job_queue_cancel_all_jobs_without_report(plugin):
+    # Given: a running job and a queued job that report their samples
+    sampling_job_queue = SamplingJobQueue(max_parallel_jobs=1)
+    reported = []
+    job_1 = sampling_job_queue.add_job("job 1", wait_until_canceled, {}, lambda *args: reported.append(args))
+    job_2 = sampling_job_queue.add_job("job 2", wait_until_canceled, {}, lambda *args: reported.append(args))
+
+    # When: all jobs are canceled without report (e.g. the plugin is closed)
+    sampling_job_queue.cancel_all_jobs(report=False)
+    job_1.task.waitForFinished()
+
+    # Then: both are canceled and the running one doesn't report when it finishes
+    assert job_1.task.isCanceled()
+    assert job_2.status == SamplingJob.CANCELED
+    sampling_job_queue.job_finished(job_1, None, (None, {}))
+    assert job_1.status == SamplingJob.CANCELED
+    assert not reported
@@ -0,0 +1,31 @@
+import fiona
+import pytest
+from shapely.geometry import shape
+
+from AcATaMa.core.sampling_runner import load_config, run_sampling
+
+
+@pytest.mark.parametrize(
+    "sampling_type, expected_sampling_file",
+    [
+        ("simple", "simple_post_stratified_random_sampling.gpkg"),
+        ("stratified", "stratified_random_sampling.gpkg"),
+    ],
+)
+def test_headless_sampling_same_as_sampling_design_window(sampling_type, expected_sampling_file, plugin, tmpdir):
+    # Given: the sampling design saved in the yml file, without restoring it in the gui
+    yml_file_path = str(pytest.tests_data_dir / "test_sampling.yaml")
+    yaml_config = load_config(yml_file_path)
+    output_file = str(tmpdir.join(f"test_headless_{sampling_type}_sampling.gpkg"))
+
+    # When: the sampling is generated headless
+    sampling, _ = run_sampling(yaml_config, output_file, sampling_type=sampling_type, yml_file_path=yml_file_path)
+
+    # Then: it is the same sampling generated from the sampling design window
+    assert sampling.samples_generated > 0
+    with (
+        fiona.open(pytest.tests_data_dir / expected_sampling_file) as source,
+        fiona.open(output_file) as target,
+    ):
+        for s, t in zip(source, target, strict=False):
+            assert shape(s["geometry"]).equals(shape(t["geometry"]))
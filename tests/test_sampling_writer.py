@@ -0,0 +1,34 @@
+import fiona
+import numpy as np
+import pytest
+from osgeo import ogr
+from qgis.core import QgsCoordinateReferenceSystem
+
+from AcATaMa.core.sampling_writer import SamplingFileWriter
+
+
+@pytest.mark.parametrize("extension", [".gpkg", ".shp", ".fgb"])
+def test_sampling_file_writer_in_batches(extension, tmpdir):
+    # Given: random points and a writer with small batches
+    rng = np.random.default_rng(0)
+    xs = rng.uniform(300000, 310000, 2500)
+    ys = rng.uniform(1000000, 1010000, 2500)
+    output_file = str(tmpdir.join("sampling" + extension))
+
+    # When: the points are written in two calls
+    with SamplingFileWriter(output_file, QgsCoordinateReferenceSystem("EPSG:32618")) as writer:
+        writer.batch_size = 1000
+        writer.add_points(xs[:2000], ys[:2000])
+        writer.add_points(xs[2000:], ys[2000:])
+
+    # Then: all points are saved in order with consecutive ids
+    with fiona.open(output_file) as target:
+        features = list(target)
+        assert target.crs.to_epsg() == 32618
+    assert [feature["properties"]["id"] for feature in features] == list(range(1, 2501))
+    assert np.allclose([feature["geometry"]["coordinates"] for feature in features], np.column_stack((xs, ys)))
+
+    # and the spatial index is built for the geopackage
+    if extension == ".gpkg":
+        dataset = ogr.Open(output_file)
+        assert dataset.GetLayer(0).TestCapability(ogr.OLCFastSpatialFilter)